@@ -0,0 +1,230 @@
+"""
+Run-scoped, content-addressed store for generated artifacts, and atomic file writes.
+
+Every write goes to a unique temp file in the target's directory and is renamed over the
+target with os.replace, so readers never see a partial file and concurrent writers never
+share a temp file. When a run is open (open_run, like metrics.RunMetrics it becomes the
+current run for the task and the tasks it starts), write_output also stores the bytes
+once under ARTIFACT_ROOT/objects/<sha256[:2]>/<sha256>, so identical artifacts from any
+number of runs share one object, and records name -> digest in the run's index,
+ARTIFACT_ROOT/runs/<run_id>/index.json. The plain output files (ui_output/, src/<Project>/,
+debug_output/) are still written as the latest view; the store keeps every run's copy.
+
+    python artifact_store.py list                 runs, newest first
+    python artifact_store.py export RUN_ID DIR    copy a run's artifacts back out by name
+
+Settings:
+    ARTIFACT_STORE  "0" disables the store; outputs are still written atomically (default "1")
+    ARTIFACT_ROOT   store directory (default artifacts)
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+import contextvars
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import metrics
+
+logger = logging.getLogger("artifact-store")
+
+ARTIFACT_STORE_ENABLED = os.getenv("ARTIFACT_STORE", "1").strip().lower() in ("1", "true", "yes")
+ARTIFACT_ROOT = Path(os.getenv("ARTIFACT_ROOT", "artifacts"))
+# The index is rewritten at most this often while a run is writing, and always on close.
+INDEX_FLUSH_S = 1.0
+
+_current: contextvars.ContextVar[Optional["RunArtifacts"]] = contextvars.ContextVar("current_artifacts",
+                                                                                    default=None)
+
+
+def _as_bytes(data: Union[str, bytes]) -> bytes:
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+def atomic_write_bytes(path: Path, data: bytes):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path: Path, text: str):
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+
+def json_bytes(data: Any) -> bytes:
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+class ArtifactStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def put_object(self, data: bytes) -> str:
+        """Store data under its sha256 and return the digest; content already stored is not rewritten."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if path.exists():
+            metrics.count("artifacts_deduplicated")
+        else:
+            atomic_write_bytes(path, data)
+            metrics.count("artifacts_stored")
+        return digest
+
+    def run_dir(self, run_id: str) -> Path:
+        return self.root / "runs" / run_id
+
+    def read_index(self, run_id: str) -> Dict[str, Any]:
+        with open(self.run_dir(run_id) / "index.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def runs(self) -> List[Dict[str, Any]]:
+        found = []
+        for path in (self.root / "runs").glob("*/index.json"):
+            try:
+                found.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return sorted(found, key=lambda r: r.get("started", 0), reverse=True)
+
+    def export(self, run_id: str, dest: Path) -> int:
+        """Copy a run's artifacts to dest/<name>; returns how many were written."""
+        index = self.read_index(run_id)
+        for name, entry in index["artifacts"].items():
+            atomic_write_bytes(Path(dest) / name, self.object_path(entry["sha256"]).read_bytes())
+        return len(index["artifacts"])
+
+
+class RunArtifacts:
+    """The artifacts of one run. Open it with open_run; close() writes the final index."""
+
+    def __init__(self, store: ArtifactStore, component: str, run_id: Optional[str] = None,
+                 base_dir: Optional[Path] = None, **labels: Any):
+        self.store = store
+        self.component = component
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{component}-{uuid.uuid4().hex[:8]}"
+        self.base_dir = Path(base_dir).resolve() if base_dir is not None else None
+        self.labels = labels
+        self.started = time.time()
+        self.status: Optional[str] = None
+        self.artifacts: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flushed = 0.0
+        self._token = _current.set(self)
+
+    def name_for(self, path: Path) -> str:
+        """Artifact name for an output file: its path under base_dir, else its file name."""
+        if self.base_dir is not None:
+            try:
+                return Path(path).resolve().relative_to(self.base_dir).as_posix()
+            except ValueError:
+                pass
+        return Path(path).name
+
+    def put(self, name: str, data: Union[str, bytes], path: Optional[Path] = None) -> str:
+        data = _as_bytes(data)
+        digest = self.store.put_object(data)
+        with self._lock:
+            previous = self.artifacts.get(name)
+            if previous is not None and previous["sha256"] == digest:
+                return digest
+            self.artifacts[name] = {"sha256": digest, "bytes": len(data), "created": round(time.time(), 3),
+                                    "path": str(path) if path is not None else None}
+            if time.monotonic() - self._flushed >= INDEX_FLUSH_S:
+                self._write_index()
+        return digest
+
+    def get(self, name: str) -> bytes:
+        return self.store.object_path(self.artifacts[name]["sha256"]).read_bytes()
+
+    def index(self) -> Dict[str, Any]:
+        return {"run_id": self.run_id, "component": self.component, "labels": self.labels,
+                "started": round(self.started, 3), "status": self.status,
+                "artifacts": dict(sorted(self.artifacts.items()))}
+
+    def _write_index(self):
+        atomic_write_bytes(self.store.run_dir(self.run_id) / "index.json", json_bytes(self.index()))
+        self._flushed = time.monotonic()
+
+    def close(self, status: str = "ok"):
+        if self.status is not None:
+            return
+        self.status = status
+        with self._lock:
+            self._write_index()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Closed from another context (e.g. a done-callback); leave that context's value alone.
+            pass
+        logger.info("Run %s: %d artifacts (%s)", self.run_id, len(self.artifacts), status)
+
+
+def open_run(component: str, run_id: Optional[str] = None, base_dir: Optional[Path] = None,
+             **labels: Any) -> Optional[RunArtifacts]:
+    """Start a run's artifact index, or return None when ARTIFACT_STORE is off."""
+    if not ARTIFACT_STORE_ENABLED:
+        return None
+    return RunArtifacts(ArtifactStore(ARTIFACT_ROOT), component, run_id=run_id, base_dir=base_dir, **labels)
+
+
+def current_run() -> Optional[RunArtifacts]:
+    return _current.get()
+
+
+def write_output(path: Path, data: Union[str, bytes], name: Optional[str] = None):
+    """Atomically write an output file and record it in the current run, if one is open."""
+    data = _as_bytes(data)
+    atomic_write_bytes(path, data)
+    run = current_run()
+    if run is not None:
+        run.put(name or run.name_for(path), data, path=path)
+
+
+def write_json_output(path: Path, data: Any, name: Optional[str] = None):
+    write_output(path, json_bytes(data), name=name)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Inspect the artifact store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="runs, newest first")
+    export = sub.add_parser("export", help="copy a run's artifacts to a directory")
+    export.add_argument("run_id")
+    export.add_argument("dest")
+    args = parser.parse_args(argv)
+
+    store = ArtifactStore(ARTIFACT_ROOT)
+    if args.command == "list":
+        for run in store.runs():
+            print(f"{run['run_id']}  {run.get('status') or 'open':>7}  {len(run['artifacts']):>5} artifacts")
+    else:
+        try:
+            n = store.export(args.run_id, Path(args.dest))
+        except FileNotFoundError:
+            print(f"No run {args.run_id} under {ARTIFACT_ROOT}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Exported {n} artifacts to {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
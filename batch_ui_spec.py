@@ -0,0 +1,207 @@
+"""
+Headless batch runner for content_writer01.generate_ui_spec.
+
+Runs many (system, requirements) pairs concurrently on asyncio, each job writing to its
+own output directory, and prints a throughput/latency summary at the end.
+
+Usage:
+    python batch_ui_spec.py --input-dir json_file --output-root batch_output --concurrency 8
+    python batch_ui_spec.py --manifest jobs.json
+
+A manifest is a JSON list (or {"jobs": [...]}) of objects with "system" and
+"requirements" paths and an optional "name"; relative paths are resolved against the
+manifest's directory.
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import content_writer01
+from content_writer01 import generate_ui_spec, atomic_write_json, UISpecGenerationError
+from metrics import percentile
+
+logger = logging.getLogger("ui-generator-batch")
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_OUTPUT_ROOT = Path(os.getenv("BATCH_OUTPUT_ROOT", "batch_output"))
+
+_ROLE_TOKENS = {"system", "design", "designer", "requirement", "requirements", "maker", "output"}
+
+
+def _role_of(path: Path) -> str:
+    return "system" if "system" in path.stem.lower() else "requirements"
+
+
+def _pair_key(path: Path) -> str:
+    tokens = [t for t in re.split(r"[_\-\s]+", path.stem.lower()) if t and t not in _ROLE_TOKENS]
+    return "_".join(tokens)
+
+
+def _job_name(system: Path, key: str, used: set) -> str:
+    base = re.sub(r"[^A-Za-z0-9_\-]+", "_", key or system.stem) or "job"
+    name, n = base, 1
+    while name in used:
+        n += 1
+        name = f"{base}_{n}"
+    used.add(name)
+    return name
+
+
+def jobs_from_directory(input_dir: Path) -> List[Dict[str, Any]]:
+    """
+    Pair system/requirements JSON files found in input_dir.
+    Files whose name contains "system" are system designs, everything else is a
+    requirements file. Pairs are matched on the name with role words removed
+    (ecommerse.json <-> ecommerse_system_design.json); leftovers are paired in
+    sorted order, which lines up timestamped exports from the same run.
+    """
+    systems: Dict[str, List[Path]] = {}
+    reqs: Dict[str, List[Path]] = {}
+    for path in sorted(Path(input_dir).glob("*.json")):
+        bucket = systems if _role_of(path) == "system" else reqs
+        bucket.setdefault(_pair_key(path), []).append(path)
+
+    pairs = []
+    left_systems: List[Path] = []
+    left_reqs: List[Path] = []
+    for key in sorted(set(systems) | set(reqs)):
+        s_list, r_list = systems.get(key, []), reqs.get(key, [])
+        n = min(len(s_list), len(r_list)) if key else 0
+        pairs.extend((key, s, r) for s, r in zip(s_list[:n], r_list[:n]))
+        left_systems.extend(s_list[n:])
+        left_reqs.extend(r_list[n:])
+
+    left_systems.sort()
+    left_reqs.sort()
+    for s, r in zip(left_systems, left_reqs):
+        pairs.append((_pair_key(s), s, r))
+    for p in left_systems[len(left_reqs):] + left_reqs[len(left_systems):]:
+        logger.warning("No matching input found for %s, skipping", p)
+
+    used: set = set()
+    return [
+        {"name": _job_name(s, key, used), "system": str(s), "requirements": str(r)}
+        for key, s, r in pairs
+    ]
+
+
+def jobs_from_manifest(manifest_path: Path) -> List[Dict[str, Any]]:
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("jobs", []) if isinstance(data, dict) else data
+    base = Path(manifest_path).parent
+    used: set = set()
+    jobs = []
+    for entry in entries:
+        system = base / entry["system"]
+        requirements = base / entry["requirements"]
+        name = _job_name(system, entry.get("name") or _pair_key(system), used)
+        jobs.append({"name": name, "system": str(system), "requirements": str(requirements)})
+    return jobs
+
+
+async def _run_job(job: Dict[str, Any], output_root: Path, sem: asyncio.Semaphore, model,
+                   generate=generate_ui_spec) -> Dict[str, Any]:
+    async with sem:
+        job_dir = output_root / job["name"]
+        started = time.perf_counter()
+        result = dict(job, output_dir=str(job_dir))
+        try:
+            generated = await generate(job["system"], job["requirements"], output_dir=job_dir, model=model)
+            result.update(status="succeeded", output=str(generated))
+        except UISpecGenerationError as e:
+            result.update(status="failed", error=str(e))
+        except Exception as e:
+            logger.exception("Job %s crashed: %s", job["name"], e)
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+        result["latency_s"] = round(time.perf_counter() - started, 3)
+        logger.info("Job %s %s in %.2fs", job["name"], result["status"], result["latency_s"])
+        return result
+
+
+async def run_batch(jobs: List[Dict[str, Any]], output_root: Path = BATCH_OUTPUT_ROOT,
+                    concurrency: int = BATCH_CONCURRENCY, model=None, sharded: bool = False) -> Dict[str, Any]:
+    """
+    Run all jobs with at most `concurrency` in flight and return the batch summary.
+    sharded=True generates each job with sharded_ui_spec.generate_ui_spec_sharded.
+    """
+    output_root = Path(output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    if model is None and jobs:
+        model = content_writer01.create_model()
+    sem = asyncio.Semaphore(max(1, concurrency))
+    generate = generate_ui_spec
+    if sharded:
+        from sharded_ui_spec import generate_ui_spec_sharded as generate
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_run_job(job, output_root, sem, model, generate) for job in jobs))
+    wall = time.perf_counter() - started
+
+    latencies = [r["latency_s"] for r in results]
+    succeeded = sum(1 for r in results if r["status"] == "succeeded")
+    summary = {
+        "jobs": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "concurrency": concurrency,
+        "sharded": sharded,
+        "wall_time_s": round(wall, 3),
+        "throughput_jobs_per_min": round(len(results) / wall * 60, 2) if wall > 0 else None,
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+        },
+        "results": results,
+    }
+    atomic_write_json(output_root / "batch_summary.json", summary)
+    return summary
+
+
+def print_summary(summary: Dict[str, Any]):
+    lat = summary["latency_s"]
+    print(f"Jobs: {summary['jobs']}  succeeded: {summary['succeeded']}  failed: {summary['failed']}")
+    print(f"Wall time: {summary['wall_time_s']}s  throughput: {summary['throughput_jobs_per_min']} jobs/min"
+          f"  (concurrency={summary['concurrency']})")
+    print(f"Latency p50={lat['p50']}s p95={lat['p95']}s max={lat['max']}s")
+    for r in summary["results"]:
+        if r["status"] != "succeeded":
+            print(f"  FAILED {r['name']}: {r.get('error')}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate ui_spec files for many input pairs at once.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--input-dir", type=Path, help="directory of system/requirements JSON pairs")
+    src.add_argument("--manifest", type=Path, help="JSON manifest of jobs")
+    parser.add_argument("--output-root", type=Path, default=BATCH_OUTPUT_ROOT)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--sharded", action="store_true", help="generate each spec as parallel section shards")
+    args = parser.parse_args(argv)
+
+    jobs = jobs_from_manifest(args.manifest) if args.manifest else jobs_from_directory(args.input_dir)
+    if not jobs:
+        logger.error("No jobs found. Exiting.")
+        sys.exit(1)
+    logger.info("Running %d jobs with concurrency %d", len(jobs), args.concurrency)
+
+    try:
+        summary = asyncio.run(run_batch(jobs, args.output_root, args.concurrency, sharded=args.sharded))
+    except KeyboardInterrupt:
+        logger.info("Interrupted by user.")
+        sys.exit(130)
+    print_summary(summary)
+    sys.exit(0 if summary["failed"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: cold start of the entry-point scripts, with a budget check.
+
+Each scenario runs in a fresh interpreter (python -X importtime) from the repo root:
+
+    import        import content_writer01, content_to_code and debug_code
+    validate      validate-only path: import content_writer01 and validate the sample ui_spec
+    cached-hit    gemini backend answering a prompt that is already in the response cache
+
+Reported per scenario: best wall time over --repeat runs, total import time from
+-X importtime, the slowest top-level imports, and any heavy module that got imported
+anyway (provider SDKs, langchain, tkinter, jsonschema, json5). The exit status is 1 when
+a scenario exceeds its budget or loads a heavy module, so this can guard CI.
+
+Usage (from the repo root):
+    python -m benchmarks.cold_start --repeat 5 --budget-ms 400
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+HEAVY_MODULES = ["langchain", "langchain_core", "langchain_google_genai", "google.generativeai",
+                 "tkinter", "jsonschema", "json5"]
+
+CACHED_PROMPT = "cold-start benchmark prompt"
+CACHED_MODEL = "gemini-1.5-flash"
+
+REPORT = f"import sys, json; print('HEAVY=' + json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+
+SCENARIOS: Dict[str, str] = {
+    "import": "import content_writer01, content_to_code, debug_code",
+    "validate": (
+        "from content_writer01 import read_json_file, validate_ui_spec\n"
+        "assert validate_ui_spec(read_json_file('ui_output/generated_ui_spec.json')['ui_spec']) is None"
+    ),
+    "cached-hit": (
+        "from llm_backend import create_backend\n"
+        f"assert create_backend('gemini', model_name={CACHED_MODEL!r}, temperature=0.3).invoke({CACHED_PROMPT!r})"
+    ),
+}
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def prime_cache(cache_dir: Path):
+    """Store a response for CACHED_PROMPT the way CachedBackend would."""
+    from response_cache import ResponseCache
+    cache = ResponseCache(cache_dir)
+    key = cache.make_key(CACHED_PROMPT, CACHED_MODEL, 0.3)
+    cache.put(key, '{"ui_spec": {}}', model=CACHED_MODEL, temperature=0.3)
+
+
+def run_once(code: str, env: Dict[str, str]) -> Tuple[float, int, List[Tuple[int, str]], List[str]]:
+    """Returns (wall_s, total_import_us, top-level imports by cumulative us, heavy modules loaded)."""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code + "\n" + REPORT],
+                          capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    top = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m and len(m.group(3)) == 1:
+            top.append((int(m.group(2)), m.group(4)))
+    heavy_line = next(line for line in proc.stdout.splitlines() if line.startswith("HEAVY="))
+    return wall, sum(us for us, _ in top), sorted(top, reverse=True), json.loads(heavy_line[len("HEAVY="):])
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=400.0, help="max best-of wall time per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    args = parser.parse_args(argv)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        prime_cache(Path(tmp))
+        env = dict(os.environ, LLM_BACKEND="gemini", GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "unused"),
+                   LLM_CACHE="1", LLM_CACHE_BYPASS="0", LLM_CACHE_DIR=tmp, LLM_CACHE_TTL="0", HEADLESS="1",
+                   PYTHONPATH=os.getcwd())
+        env.pop("LLM_RECORD_PATH", None)
+        print(f"{'scenario':>11} {'wall_ms':>8} {'imports_ms':>10}  slowest imports")
+        for name in args.scenarios.split(","):
+            runs = [run_once(SCENARIOS[name], env) for _ in range(args.repeat)]
+            wall, import_us, top, heavy = min(runs, key=lambda r: r[0])
+            slowest = ", ".join(f"{mod} {us / 1000:.0f}ms" for us, mod in top[:4])
+            print(f"{name:>11} {wall * 1000:>8.1f} {import_us / 1000:>10.1f}  {slowest}")
+            if heavy:
+                failures.append(f"{name}: imported {', '.join(heavy)}")
+            if wall * 1000 > args.budget_ms:
+                failures.append(f"{name}: {wall * 1000:.0f}ms exceeds the {args.budget_ms:.0f}ms budget")
+    for failure in failures:
+        print("FAIL", failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Microbenchmark: content_writer01.extract_json_from_text vs the previous implementation.
+
+The sample model output (ui_output/generated_ui_spec_raw.txt) is scaled up by repeating
+its pages/components until it reaches each target size, then wrapped three ways:
+
+    fenced    ```json ... ``` only (the old code's json.loads fast path)
+    prose     prose before and after the fence, forcing the old brace scan + json5
+    trailing  trailing commas, which the old version could only recover with json5
+
+Usage (from the repo root):
+    python -m benchmarks.extract_json --sizes 0.5,1,4 --repeat 3
+"""
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import json5
+
+from content_writer01 import extract_json_from_text
+
+SAMPLE_RAW = Path("ui_output/generated_ui_spec_raw.txt")
+
+
+def legacy_extract_json_from_text(text: str) -> Optional[Dict]:
+    """extract_json_from_text as it was before the single-pass rewrite."""
+    cleaned = text.strip()
+    cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned, flags=re.IGNORECASE | re.MULTILINE)
+    cleaned = re.sub(r"\s*```$", "", cleaned, flags=re.MULTILINE)
+    try:
+        return json.loads(cleaned)
+    except Exception:
+        pass
+    braces = []
+    start = None
+    largest = None
+    for i, ch in enumerate(text):
+        if ch == "{":
+            braces.append(i)
+            if start is None:
+                start = i
+        elif ch == "}":
+            if braces:
+                braces.pop()
+                if not braces and start is not None:
+                    candidate = text[start:i+1]
+                    largest = candidate
+                    start = None
+    if largest:
+        try:
+            return json5.loads(largest)
+        except Exception:
+            try:
+                return json.loads(largest)
+            except Exception:
+                return None
+    try:
+        return json5.loads(text)
+    except Exception:
+        return None
+
+
+def scaled_spec(target_bytes: int) -> Dict:
+    spec = extract_json_from_text(SAMPLE_RAW.read_text(encoding="utf-8"))
+    ui = spec["ui_spec"]
+    pages, components = list(ui.get("pages", [])), list(ui.get("components", []))
+    base = len(json.dumps(spec, indent=2))
+    per_copy = max(1, len(json.dumps({"p": pages, "c": components}, indent=2)))
+    copies = max(1, -(-(target_bytes - base) // per_copy) + 1)
+    ui["pages"] = pages * copies
+    ui["components"] = components * copies
+    return spec
+
+
+def variants(spec: Dict) -> Dict[str, str]:
+    body = json.dumps(spec, indent=2, ensure_ascii=False)
+    trailing = re.sub(r"(\n\s*)([}\]])", r",\1\2", body)
+    return {
+        "fenced": f"```json\n{body}\n```",
+        "prose": f"Here is the ui_spec you asked for {{as JSON}}:\n```json\n{body}\n```\nLet me know if you need changes.",
+        "trailing": f"```json\n{trailing}\n```",
+    }
+
+
+def time_call(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="0.5,1,4", help="comma-separated output sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy-json5", action="store_true",
+                        help="skip old-version cases that end in json5 (very slow on large inputs)")
+    args = parser.parse_args(argv)
+
+    print(f"{'size_mb':>8} {'case':>9} {'legacy_s':>10} {'new_s':>9} {'speedup':>8}")
+    for size in (float(x) for x in args.sizes.split(",")):
+        spec = scaled_spec(int(size * 1024 * 1024))
+        for case, text in variants(spec).items():
+            new_s = time_call(extract_json_from_text, text, args.repeat)
+            result = extract_json_from_text(text)
+            if result is None or len(result["ui_spec"]["pages"]) != len(spec["ui_spec"]["pages"]):
+                print(f"new extractor returned a wrong result for {case} @ {size}MB", file=sys.stderr)
+                sys.exit(1)
+            if args.skip_legacy_json5 and case != "fenced":
+                legacy = "-"
+                speedup = "-"
+            else:
+                legacy_s = time_call(legacy_extract_json_from_text, text, 1)
+                legacy = f"{legacy_s:.4f}"
+                speedup = f"{legacy_s / new_s:.1f}x" if new_s else "inf"
+            print(f"{len(text) / 1024 / 1024:>8.2f} {case:>9} {legacy:>10} {new_s:>9.4f} {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
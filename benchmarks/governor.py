@@ -0,0 +1,310 @@
+"""
+Benchmark/check: llm_governor against a local fake model endpoint.
+
+A ThreadingHTTPServer on 127.0.0.1 plays the provider. It enforces its own request limit
+per time window (429 with Retry-After beyond it), and can also answer with random 429s,
+503s or by hanging past the client timeout. Many concurrent jobs call it through a
+GovernedBackend, one scenario at a time:
+
+    rate-limit  server allows 10 requests per 1s window; the governor (8/s, 0.25s burst)
+                should stay under it
+    flaky       20% random 429s (Retry-After 0.2s), 10% timeouts; every job should succeed
+    outage      every request 503s; the breaker should open and stop hammering the server
+    probe-exits no server: a scripted backend opens the breaker, then its half-open probe
+                ends with a non-transient error, a cancellation or a cancelled stream; the
+                next call must be let through as a new probe instead of the circuit
+                staying half-open for good
+
+Reported per scenario: jobs succeeded/failed, what the server answered, the governor's
+retries / throttling / breaker trips and wall time. The exit status is 1 when a scenario's
+check fails.
+
+Usage (from the repo root):
+    python -m benchmarks.governor --jobs 40
+"""
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from llm_backend import BackendError, LLMBackend
+from llm_governor import CircuitOpenError, GovernedBackend, Governor, TransientBackendError, TRANSIENT_STATUS
+
+CLIENT_TIMEOUT = 0.5
+
+
+class FakeEndpoint:
+    """Fake provider: at most `limit` requests per `window_s` plus injected 429 / 503 / hang responses."""
+
+    def __init__(self, limit: int = 0, window_s: float = 60.0, p429: float = 0, p503: float = 0,
+                 ptimeout: float = 0, retry_after: float = 1.0, seed: int = 0):
+        self.limit = limit
+        self.window_s = window_s
+        self.p429, self.p503, self.ptimeout = p429, p503, ptimeout
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.accepted: List[float] = []
+        self.answers: Dict[str, int] = {"200": 0, "429": 0, "503": 0, "timeout": 0}
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, headers = endpoint.decide()
+                if status == "timeout":
+                    time.sleep(CLIENT_TIMEOUT * 3)
+                    return
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if status == 200:
+                    prompt = json.loads(body)["prompt"]
+                    self.wfile.write(json.dumps({"text": f"echo:{prompt}"}).encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/generate"
+
+    def decide(self):
+        with self.lock:
+            now = time.monotonic()
+            roll = self.rng.random()
+            if roll < self.ptimeout:
+                outcome = ("timeout", {})
+            elif roll < self.ptimeout + self.p503:
+                outcome = (503, {})
+            elif roll < self.ptimeout + self.p503 + self.p429:
+                outcome = (429, {"Retry-After": str(self.retry_after)})
+            elif self.limit and sum(1 for t in self.accepted if now - t < self.window_s) >= self.limit:
+                outcome = (429, {"Retry-After": str(self.retry_after)})
+            else:
+                self.accepted.append(now)
+                outcome = (200, {"Content-Type": "application/json"})
+            self.answers[str(outcome[0])] += 1
+            return outcome
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HTTPBackend(LLMBackend):
+    """Minimal JSON-over-HTTP backend, mapping HTTP failures the way a provider SDK would."""
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: float = CLIENT_TIMEOUT):
+        super().__init__("fake-model")
+        self.url = url
+        self.timeout = timeout
+
+    def invoke(self, prompt: Any) -> str:
+        req = urllib.request.Request(self.url, data=json.dumps({"prompt": str(prompt)}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())["text"]
+        except urllib.error.HTTPError as e:
+            if e.code in TRANSIENT_STATUS:
+                raise TransientBackendError(f"HTTP {e.code}", status=e.code,
+                                            retry_after=float(e.headers.get("Retry-After") or 0) or None)
+            raise BackendError(f"HTTP {e.code}")
+        except (socket.timeout, TimeoutError):
+            raise TimeoutError(f"no response within {self.timeout}s")
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, (socket.timeout, TimeoutError)):
+                raise TimeoutError(f"no response within {self.timeout}s")
+            raise ConnectionError(str(e.reason))
+
+
+class ScriptedBackend(LLMBackend):
+    """Answers each call with the next scripted outcome: a string, an exception, or "hang"."""
+
+    name = "scripted"
+
+    def __init__(self, script: List[Any]):
+        super().__init__("fake-model")
+        self.script = list(script)
+
+    def _next(self) -> Any:
+        outcome = self.script.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def invoke(self, prompt: Any) -> str:
+        return self._next()
+
+    async def ainvoke(self, prompt: Any) -> str:
+        if self.script[0] == "hang":
+            self.script.pop(0)
+            await asyncio.Event().wait()
+        return self._next()
+
+    async def astream(self, prompt: Any) -> AsyncIterator[str]:
+        yield await self.ainvoke(prompt)
+
+
+PROBE_RESET_S = 0.05
+
+
+async def _probe_exit(exit_how: str) -> Optional[str]:
+    """Open the breaker, end the probe the given way, and check the next call gets through."""
+    unavailable = TransientBackendError("HTTP 503", status=503)
+    probe = ValueError("bad request") if exit_how == "error" else "hang"
+    governor = Governor(max_retries=0, breaker_threshold=2, breaker_reset=PROBE_RESET_S)
+    backend = GovernedBackend(ScriptedBackend([unavailable, unavailable, probe, "ok"]), governor)
+    for _ in range(2):
+        try:
+            await backend.ainvoke("x")
+        except TransientBackendError:
+            pass
+    if governor.breaker.state != "open":
+        return f"the breaker is {governor.breaker.state} after 2 failures"
+    await asyncio.sleep(PROBE_RESET_S * 1.5)
+
+    if exit_how == "error":
+        try:
+            backend.invoke("x")
+        except ValueError:
+            pass
+    else:
+        async def consume():
+            if exit_how == "cancel":
+                await backend.ainvoke("x")
+            else:
+                async for _ in backend.astream("x"):
+                    pass
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    try:
+        text = await backend.ainvoke("x")
+    except CircuitOpenError:
+        return f"a probe ended by {exit_how} left the breaker {governor.breaker.state} for good"
+    if text != "ok" or governor.breaker.state != "closed":
+        return f"the call after the probe returned {text!r}, breaker {governor.breaker.state}"
+    return None
+
+
+def check_probe_exits() -> Optional[str]:
+    problems = [p for p in (asyncio.run(_probe_exit(how)) for how in ("error", "cancel", "stream")) if p]
+    return "; ".join(problems) or None
+
+
+CHECKS = {"probe-exits": check_probe_exits}
+
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "rate-limit": {"server": {"limit": 10, "window_s": 1.0, "retry_after": 0.5},
+                   "governor": {"rpm": 480, "burst_s": 0.25, "max_retries": 6, "backoff_base": 0.1,
+                                "breaker_threshold": 20}},
+    "flaky": {"server": {"p429": 0.2, "ptimeout": 0.1, "retry_after": 0.2},
+              "governor": {"max_retries": 8, "backoff_base": 0.05, "backoff_max": 1.0, "breaker_threshold": 20}},
+    "outage": {"server": {"p503": 1.0},
+               "governor": {"max_retries": 3, "backoff_base": 0.05, "breaker_threshold": 5, "breaker_reset": 60}},
+}
+
+
+async def run_scenario(name: str, jobs: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    config = SCENARIOS[name]
+    with FakeEndpoint(seed=seed, **config["server"]) as endpoint:
+        governor = Governor(seed=seed, **config["governor"])
+        backend = GovernedBackend(HTTPBackend(endpoint.url), governor)
+        sem = asyncio.Semaphore(concurrency)
+        outcomes: Dict[str, int] = {"ok": 0, "circuit_open": 0, "error": 0}
+
+        async def job(i: int):
+            async with sem:
+                try:
+                    text = await backend.ainvoke(f"job {i}")
+                    assert text == f"echo:job {i}"
+                    outcomes["ok"] += 1
+                except CircuitOpenError:
+                    outcomes["circuit_open"] += 1
+                except Exception:
+                    outcomes["error"] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(job(i) for i in range(jobs)))
+        wall = time.perf_counter() - started
+        server = config["server"]
+        limit_rps = server["limit"] / server["window_s"] if server.get("limit") else None
+        return {"scenario": name, "wall_s": round(wall, 2), "jobs": outcomes, "server": dict(endpoint.answers),
+                "server_rps": round(len(endpoint.accepted) / wall, 1) if wall else None,
+                "server_rps_limit": limit_rps, "governor": governor.snapshot()}
+
+
+def check(result: Dict[str, Any], jobs: int) -> Optional[str]:
+    name, outcomes, server, gov = result["scenario"], result["jobs"], result["server"], result["governor"]
+    if name == "rate-limit":
+        if outcomes["ok"] != jobs:
+            return f"{jobs - outcomes['ok']} jobs failed"
+        if server["429"] > jobs * 0.1:
+            return f"the server rate-limited {server['429']} requests; the bucket should prevent most of them"
+    elif name == "flaky":
+        if outcomes["ok"] != jobs:
+            return f"{jobs - outcomes['ok']} jobs failed despite retries"
+    elif name == "outage":
+        if gov["breaker_trips"] < 1 or outcomes["ok"]:
+            return "the circuit breaker never opened"
+        calls = sum(server.values())
+        if calls >= jobs:
+            return f"the server still received {calls} requests for {jobs} jobs"
+    return None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", default=",".join(list(SCENARIOS) + list(CHECKS)))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    failures = []
+    for name in args.scenarios.split(","):
+        if name in CHECKS:
+            problem = CHECKS[name]()
+            print(f"{name:>10}: {'FAIL' if problem else 'ok'}")
+            if problem:
+                failures.append(f"{name}: {problem}")
+            continue
+        result = asyncio.run(run_scenario(name, args.jobs, args.concurrency, args.seed))
+        gov = result["governor"]
+        print(f"{name:>10}: {result['wall_s']}s jobs={result['jobs']} server={result['server']} "
+              f"rps={result['server_rps']} (limit {result['server_rps_limit']})")
+        print(f"{'':>10}  retries={gov['retries']:g} rate_limited={gov['rate_limited']:g} "
+              f"throttle_wait_s={gov['throttle_wait_s']} breaker={gov['breaker']} trips={gov['breaker_trips']} "
+              f"rejected={gov['circuit_rejections']:g}")
+        problem = check(result, args.jobs)
+        if problem:
+            failures.append(f"{name}: {problem}")
+    for failure in failures:
+        print("FAIL", failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark/check: which units chunked code generation regenerates after a spec edit.
+
+A synthetic spec has --chains independent chains of --depth components, where each
+component's spec mentions the one below it (Chain0Part2 uses Chain0Part1, ...), and one
+page per chain using the chain's top component. Every unit is recorded as generated (its
+files exist, build_record has an entry), then the bottom component of chain 0 is edited
+and content_to_code.diff_units decides what to regenerate. Only chain 0's components, its
+page and App may be dirty, and all of them must be: a component importing a changed
+component can carry a stale import or prop contract just like a page.
+
+Reported: the dirty count against the expected count, and the time of plan_files and
+diff_units. The exit status is 1 when the dirty set is wrong, or when an unchanged spec
+leaves anything dirty.
+
+Usage (from the repo root):
+    python -m benchmarks.incremental_codegen --chains 200 --depth 10
+"""
+import sys
+import copy
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import content_to_code
+
+
+def chain_spec(chains: int, depth: int) -> Dict[str, Any]:
+    components = []
+    for c in range(chains):
+        for d in range(1, depth + 1):
+            below = f" Renders Chain{c}Part{d - 1} for each item." if d > 1 else ""
+            components.append({"name": f"Chain{c}Part{d}", "description": f"Level {d} of chain {c}.{below}"})
+    pages = [{"name": f"Chain{c}Page", "sections": [f"Chain{c}Part{depth}"]} for c in range(chains)]
+    return {"ui_spec": {"project": {"name": "Chains"}, "components": components, "pages": pages}}
+
+
+def expected_dirty(chains: int, depth: int) -> set:
+    return {f"Chain0Part{d}" for d in range(1, depth + 1)} | {"Chain0Page", "App"}
+
+
+def run(chains: int, depth: int) -> Dict[str, Any]:
+    profile = dict(content_to_code.DEFAULT_PROFILE)
+    spec = chain_spec(chains, depth)
+    units = content_to_code.plan_files(spec, profile)
+    with tempfile.TemporaryDirectory(prefix="incremental_codegen_") as tmp:
+        output_dir = Path(tmp)
+        for unit in units:
+            for name in unit["files"]:
+                (output_dir / name).parent.mkdir(parents=True, exist_ok=True)
+                (output_dir / name).write_text("", encoding="utf-8")
+        record = content_to_code.build_record(units, {}, {u["name"] for u in units}, [], profile)
+        unchanged, _, _ = content_to_code.diff_units(units, record, output_dir, profile)
+
+        edited = copy.deepcopy(spec)
+        edited["ui_spec"]["components"][0]["description"] += " Now with a loading state."
+        started = time.perf_counter()
+        edited_units = content_to_code.plan_files(edited, profile)
+        planned = time.perf_counter()
+        dirty, reasons, stale = content_to_code.diff_units(edited_units, record, output_dir, profile)
+        diffed = time.perf_counter()
+    return {"units": len(units), "unchanged_dirty": sorted(unchanged), "dirty": dirty, "reasons": reasons,
+            "stale": stale, "plan_s": planned - started, "diff_s": diffed - planned}
+
+
+def check(result: Dict[str, Any], chains: int, depth: int) -> Optional[str]:
+    if result["unchanged_dirty"]:
+        return f"an unchanged spec left {len(result['unchanged_dirty'])} units dirty: {result['unchanged_dirty'][:5]}"
+    expected = expected_dirty(chains, depth)
+    missing, extra = sorted(expected - result["dirty"]), sorted(result["dirty"] - expected)
+    if missing or extra:
+        return f"dirty set wrong: missing {missing[:5]}, unexpected {extra[:5]}"
+    if result["stale"]:
+        return f"no file should be stale, got {result['stale'][:5]}"
+    return None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chains", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    result = run(args.chains, args.depth)
+    print(f"units={result['units']} dirty={len(result['dirty'])} (expected {len(expected_dirty(args.chains, args.depth))}) "
+          f"plan={result['plan_s'] * 1000:.1f}ms diff={result['diff_s'] * 1000:.1f}ms")
+    top = f"Chain0Part{args.depth}"
+    print(f"  {top}: {result['reasons'].get(top)}; Chain0Page: {result['reasons'].get('Chain0Page')}")
+    problem = check(result, args.chains, args.depth)
+    if problem:
+        print("FAIL", problem, file=sys.stderr)
+    sys.exit(1 if problem else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark/check: peak memory of reading very large system/requirements inputs.
+
+Large exports are generated from the sample pair in json_file/: the prompt-relevant
+sections are repeated --relevant-scale times and each file gets --mb MB of bulk the prompts
+never use (event logs, raw transcripts). The job's input handling, i.e. reading both files,
+building the master prompt and preparing --attempts - 1 refinement prompts, then runs in
+a fresh subprocess per mode, so ru_maxrss is that mode's own peak:
+
+    baseline   imports only (interpreter + modules)
+    full       json.load of both files, inputs re-dumped with indent=2 for every
+               refinement prompt (how generate_ui_spec handled inputs before streaming)
+    streamed   read_input_json (only INPUT_SECTION_KEYS are built; INPUT_STREAM_MIN_MB is
+               set to 0 so it streams at any --mb) and one inputs_text reused by every prompt
+
+Reported per mode: peak RSS, peak above baseline and wall time. With --max-streamed-mb the
+exit status is 1 when the streamed mode's peak above baseline exceeds it.
+
+Usage (from the repo root):
+    python -m benchmarks.input_ingestion --mb 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.spec_pipeline import SAMPLE_PAIRS, scale_json
+
+MODES = ["baseline", "full", "streamed"]
+_BULK = "__BULK__"
+
+
+def write_large_input(sample: str, out: Path, mb: float, relevant_scale: int, seed: int):
+    """The sample scaled by relevant_scale, plus about mb MB of irrelevant records, written without holding them."""
+    doc = scale_json(json.loads(Path(sample).read_text(encoding="utf-8")), relevant_scale)
+    doc.setdefault("output", {})
+    if not isinstance(doc["output"], dict):
+        doc["output"] = {"value": doc["output"]}
+    doc["output"]["raw_events"] = _BULK
+    head, tail = json.dumps(doc).split(json.dumps(_BULK))
+    target = int(mb * 1e6)
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(head + "[")
+        written, i = 0, 0
+        while written < target:
+            record = json.dumps({"id": i, "type": "trace", "seed": seed, "message": f"event {i} " + "x" * 400,
+                                 "payload": {"values": list(range(i % 20)), "ok": True, "ref": None}})
+            f.write(("," if i else "") + record)
+            written += len(record) + 1
+            i += 1
+        f.write("]" + tail)
+
+
+def run_mode(mode: str, system_file: str, require_file: str, attempts: int) -> Dict[str, Any]:
+    """Child process body: one mode's input handling, returning its peak RSS and time."""
+    import logging
+    logging.disable(logging.INFO)
+    import content_writer01 as cw
+
+    started = time.perf_counter()
+    prompts, prompt = 0, ""
+    if mode == "full":
+        system_json, req_json = cw.read_json_file(system_file), cw.read_json_file(require_file)
+        prompt = cw.build_master_prompt(system_json, req_json, summarize_inputs=cw.SUMMARIZE_INPUTS)
+        prompts += 1
+        for _ in range(attempts - 1):
+            prompt = f"{json.dumps(system_json, indent=2)}\n{json.dumps(req_json, indent=2)}"
+            prompts += 1
+    elif mode == "streamed":
+        system_json, req_json = cw.read_input_json(system_file), cw.read_input_json(require_file)
+        inputs_text = cw.build_inputs_text(system_json, req_json, summarize_inputs=cw.SUMMARIZE_INPUTS)
+        prompt = cw.build_master_prompt(system_json, req_json, inputs_text=inputs_text)
+        prompts += 1
+        for _ in range(attempts - 1):
+            prompt = "{inputs}\n".replace("{inputs}", inputs_text, 1)
+            prompts += 1
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in KiB on Linux.
+    return {"mode": mode, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "wall_s": round(elapsed, 2), "prompts": prompts, "last_prompt_chars": len(prompt)}
+
+
+def measure(mode: str, system_file: Path, require_file: Path, attempts: int) -> Dict[str, Any]:
+    env = dict(os.environ, INPUT_STREAM_MIN_MB="0") if mode == "streamed" else None
+    out = subprocess.run([sys.executable, "-m", "benchmarks.input_ingestion", "--child", mode,
+                          str(system_file), str(require_file), "--attempts", str(attempts)],
+                         capture_output=True, text=True, check=True, env=env)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mb", type=float, default=200, help="irrelevant bulk per input file, in MB")
+    parser.add_argument("--relevant-scale", type=int, default=20, help="repeat the prompt-relevant sections")
+    parser.add_argument("--attempts", type=int, default=3, help="prompts built per job (master + refinements)")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--max-streamed-mb", type=float, help="fail when streamed peak above baseline exceeds this")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("files", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, *args.files, attempts=args.attempts)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system_file, require_file = Path(tmp) / "system.json", Path(tmp) / "requirements.json"
+        for i, (sample, path) in enumerate(zip(SAMPLE_PAIRS[0], (system_file, require_file))):
+            write_large_input(sample, path, args.mb, args.relevant_scale, seed=i)
+        size_mb = (system_file.stat().st_size + require_file.stat().st_size) / 1e6
+        print(f"inputs: {size_mb:.0f} MB in two files, {args.attempts} prompts per job")
+
+        results = {}
+        print(f"{'mode':>9} {'peak_rss_mb':>12} {'above_base':>11} {'wall_s':>8}")
+        for mode in args.modes.split(","):
+            row = results[mode] = measure(mode, system_file, require_file, args.attempts)
+            base = results.get("baseline", {}).get("peak_rss_mb", 0.0)
+            row["above_baseline_mb"] = row["peak_rss_mb"] - base
+            print(f"{mode:>9} {row['peak_rss_mb']:>12.1f} {row['above_baseline_mb']:>11.1f} {row['wall_s']:>8.2f}",
+                  flush=True)
+
+    streamed = results.get("streamed")
+    if args.max_streamed_mb is not None and streamed and streamed["above_baseline_mb"] > args.max_streamed_mb:
+        print(f"FAIL streamed peak {streamed['above_baseline_mb']:.1f} MB above baseline exceeds "
+              f"{args.max_streamed_mb} MB", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmark: the spec-generation pipeline on the bundled sample inputs, scaled 1x..1000x.
+
+The sample pairs in json_file/ (ecommerse*.json and the requirement_maker_output_* /
+system_designer_output_* pair) are scaled by repeating every list in them `scale` times
+(each copy marked, so prompt_budget can't de-duplicate it away), and the recorded model
+output in ui_output/generated_ui_spec_raw.txt is scaled the same way (pages and
+components renamed per copy). Every model call is answered by a StubBackend replaying
+recorded responses, so only our own code is measured:
+
+    prompt     build_master_prompt for every sample pair
+    extract    extract_json_from_text on the recorded response
+    validate   collect_validation_errors on the parsed ui_spec
+    ui_spec    generate_ui_spec end to end (read inputs, prompt, replay, parse, validate, write)
+    codegen    content_to_code.plan_files + generate_code_chunked, one replayed response per unit
+
+Reported per stage and scale: p50/p95 wall time over --repeat runs, throughput (input MB/s,
+or units/s for codegen) and peak traced memory (one extra run under tracemalloc).
+--save writes the results as a baseline; --check compares against one and exits 1 when a
+p50 or peak-memory figure regressed by more than --tolerance.
+
+benchmarks/spec_pipeline_baseline.json is the committed baseline (default scales and
+--repeat). Timings depend on the machine: when checking on different hardware, save a
+local baseline from the base revision first and check against that instead.
+
+Usage (from the repo root):
+    python -m benchmarks.spec_pipeline --check benchmarks/spec_pipeline_baseline.json --tolerance 0.5
+    python -m benchmarks.spec_pipeline --save benchmarks/spec_pipeline_baseline.json    (refresh the baseline)
+"""
+import io
+import sys
+import json
+import time
+import asyncio
+import contextlib
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+import artifact_store
+import example_index
+import content_to_code
+from content_writer01 import (
+    build_master_prompt,
+    collect_validation_errors,
+    extract_json_from_text,
+    generate_ui_spec,
+)
+from llm_backend import StubBackend, prompt_sha256
+
+SAMPLE_PAIRS = [
+    ("json_file/ecommerse_system_design.json", "json_file/ecommerse.json"),
+    ("json_file/system_designer_output_20250828_150437.json", "json_file/requirement_maker_output_20250828_150428.json"),
+]
+SAMPLE_RAW = Path("ui_output/generated_ui_spec_raw.txt")
+STAGES = ["prompt", "extract", "validate", "ui_spec", "codegen"]
+# Differences below this many seconds / MB are noise, never regressions.
+MIN_DELTA_S = 0.01
+MIN_DELTA_MB = 0.5
+
+
+def scale_json(node: Any, scale: int) -> Any:
+    """Repeat the items of every outermost list `scale` times; copies are marked so they stay distinct."""
+    if isinstance(node, dict):
+        return {k: scale_json(v, scale) for k, v in node.items()}
+    if isinstance(node, list) and scale > 1:
+        out = list(node)
+        for i in range(1, scale):
+            for item in node:
+                if isinstance(item, dict):
+                    out.append(dict(item, _copy=i))
+                elif isinstance(item, str):
+                    out.append(f"{item} (copy {i})")
+                else:
+                    out.append(item)
+        return out
+    return node
+
+
+def scale_ui_spec(ui_spec: Dict[str, Any], scale: int) -> Dict[str, Any]:
+    """Repeat pages and components with per-copy names, so codegen plans `scale` times as many units."""
+    ui_spec = dict(ui_spec)
+    for key in ("pages", "components"):
+        items = ui_spec.get(key) or []
+        ui_spec[key] = [dict(item, name=f"{item.get('name', key)}{i}" if i else item.get("name", key))
+                        for i in range(scale) for item in items if isinstance(item, dict)]
+    return ui_spec
+
+
+def codegen_replay(ui_spec: Dict[str, Any], profile: Dict[str, str]) -> Tuple[List[Dict[str, Any]], StubBackend]:
+    """The unit plan plus a StubBackend holding a recorded response for every unit prompt."""
+    units = content_to_code.plan_files({"ui_spec": ui_spec}, profile)
+    replay = {}
+    for unit in units:
+        prompt = content_to_code.build_unit_prompt(unit, units, profile)
+        replay[prompt_sha256(prompt)] = json.dumps({f: f"// {unit['name']}\nexport default {{}};\n" for f in unit["files"]})
+    return units, StubBackend(replay=replay)
+
+
+class Workload:
+    """Scaled inputs for one scale factor, written under tmp for generate_ui_spec."""
+
+    def __init__(self, scale: int, tmp: Path, profile: Dict[str, str]):
+        self.scale = scale
+        self.pairs = []
+        for system_file, require_file in SAMPLE_PAIRS:
+            system = scale_json(json.loads(Path(system_file).read_text(encoding="utf-8")), scale)
+            req = scale_json(json.loads(Path(require_file).read_text(encoding="utf-8")), scale)
+            self.pairs.append((system, req))
+        self.input_bytes = sum(len(json.dumps(s)) + len(json.dumps(r)) for s, r in self.pairs)
+
+        raw_spec = extract_json_from_text(SAMPLE_RAW.read_text(encoding="utf-8"))
+        self.ui_spec = scale_ui_spec(raw_spec.get("ui_spec", raw_spec), scale)
+        self.raw = "```json\n" + json.dumps({"ui_spec": self.ui_spec}, indent=2, ensure_ascii=False) + "\n```"
+
+        self.dir = tmp / f"x{scale}"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.system_file, self.require_file = self.dir / "system.json", self.dir / "requirements.json"
+        self.system_file.write_text(json.dumps(self.pairs[0][0]), encoding="utf-8")
+        self.require_file.write_text(json.dumps(self.pairs[0][1]), encoding="utf-8")
+        self.spec_model = StubBackend([self.raw])
+
+        self.profile = profile
+        self.units: List[Dict[str, Any]] = []
+        self.code_model: Optional[StubBackend] = None
+
+    def stage(self, name: str) -> Tuple[Callable[[], Any], float, str]:
+        """(callable running the stage once, work done per run, unit of that work)."""
+        if name == "prompt":
+            return (lambda: [build_master_prompt(s, r, summarize_inputs=False) for s, r in self.pairs],
+                    self.input_bytes / 1e6, "MB")
+        if name == "extract":
+            return lambda: extract_json_from_text(self.raw), len(self.raw) / 1e6, "MB"
+        if name == "validate":
+            return lambda: collect_validation_errors(self.ui_spec), len(self.raw) / 1e6, "MB"
+        if name == "ui_spec":
+            return (lambda: asyncio.run(generate_ui_spec(str(self.system_file), str(self.require_file),
+                                                         self.dir / "out", model=self.spec_model, stream=False)),
+                    (self.input_bytes / len(self.pairs) + len(self.raw)) / 1e6, "MB")
+        if name == "codegen":
+            if self.code_model is None:
+                self.units, self.code_model = codegen_replay(self.ui_spec, self.profile)
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    files, failed = asyncio.run(content_to_code.generate_code_chunked(
+                        {"ui_spec": self.ui_spec}, self.profile, concurrency=16, llm=self.code_model))
+                assert not failed, f"{len(failed)} units failed to replay"
+            return run, float(len(self.units)), "units"
+        raise KeyError(name)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"p50_s": metrics.percentile(times, 50), "p95_s": metrics.percentile(times, 95), "peak_mb": peak / 1e6}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of p50 time or peak memory beyond tolerance, for every stage/scale in both."""
+    regressions = []
+    for scale, stages in results["scales"].items():
+        for stage, cur in stages.items():
+            base = baseline.get("scales", {}).get(scale, {}).get(stage)
+            if not base:
+                continue
+            for key, slack in (("p50_s", MIN_DELTA_S), ("peak_mb", MIN_DELTA_MB)):
+                limit = base[key] * (1 + tolerance)
+                if cur[key] > limit and cur[key] - base[key] > slack:
+                    regressions.append(f"{stage} @ {scale}x: {key} {cur[key]:.4f} vs baseline {base[key]:.4f} "
+                                       f"(+{(cur[key] / base[key] - 1) * 100 if base[key] else float('inf'):.0f}%)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", default="1,10,100,1000", help="comma-separated input scale factors")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--check", help="baseline file to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown / memory growth")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    # The per-run JSON lines would be written on every repetition and measured with the stage.
+    metrics.METRICS_ENABLED = False
+    # Each repetition would add its result to the index and be matched against the previous ones.
+    example_index.EXAMPLE_INDEX_ENABLED = False
+    profile = content_to_code.load_profile()
+    stages = args.stages.split(",")
+    results: Dict[str, Any] = {"repeat": args.repeat, "python": sys.version.split()[0], "scales": {}}
+
+    print(f"{'scale':>6} {'stage':>9} {'p50_s':>9} {'p95_s':>9} {'throughput':>16} {'peak_mb':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact_store.ARTIFACT_ROOT = Path(tmp) / "artifacts"
+        for scale in (int(x) for x in args.scales.split(",")):
+            workload = Workload(scale, Path(tmp), profile)
+            for stage in stages:
+                fn, work, unit = workload.stage(stage)
+                row = measure(fn, args.repeat)
+                row["throughput"] = work / row["p50_s"] if row["p50_s"] else None
+                row["throughput_unit"] = f"{unit}/s"
+                results["scales"].setdefault(str(scale), {})[stage] = row
+                print(f"{scale:>6} {stage:>9} {row['p50_s']:>9.4f} {row['p95_s']:>9.4f} "
+                      f"{row['throughput']:>10.1f} {unit + '/s':>5} {row['peak_mb']:>9.1f}", flush=True)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Baseline written to {args.save}")
+    if args.check:
+        regressions = compare(results, json.loads(Path(args.check).read_text(encoding="utf-8")), args.tolerance)
+        for r in regressions:
+            print("REGRESSION", r, file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: debug_code static analysis, one snippet at a time vs batched.
+
+    legacy    pylint then mypy as fresh subprocesses per snippet (two cold launches each),
+              as run_static_analysis used to do; timed on --legacy-count snippets and
+              extrapolated to --count
+    batched   debug_code.analyze_snippets on all snippets, cache disabled
+    cached    the same call again with the on-disk cache warm
+
+Snippets are small generated modules; a third have a type error, a third an undefined
+name and a third a syntax error.
+
+Usage (from the repo root):
+    python -m benchmarks.static_analysis --count 100 --legacy-count 5
+"""
+import os
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+import debug_code
+
+
+def make_snippets(count: int) -> Dict[str, str]:
+    snippets = {}
+    for i in range(count):
+        if i % 3 == 0:
+            code = f"def f{i}(x: int) -> str:\n    return x\n"
+        elif i % 3 == 1:
+            code = f"import os\n\nprint(os.getcwd(), undefined_{i})\n"
+        else:
+            code = f"value_{i} = \n"
+        snippets[f"snippets/snippet{i}.py"] = code
+    return snippets
+
+
+def legacy(code: str):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "temp_code.py")
+        with open(path, "w") as f:
+            f.write(code)
+        subprocess.run(["pylint", path, *debug_code.PYLINT_ARGS], capture_output=True, text=True)
+        subprocess.run(["mypy", path], capture_output=True, text=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--legacy-count", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    snippets = make_snippets(args.count)
+    sample = list(snippets.values())[:args.legacy_count]
+    started = time.perf_counter()
+    for code in sample:
+        legacy(code)
+    legacy_s = (time.perf_counter() - started) / max(1, len(sample)) * args.count
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        debug_code.ANALYSIS_CACHE_DIR = debug_code.Path(cache_dir)
+        debug_code._analysis_cache = None
+        started = time.perf_counter()
+        debug_code.analyze_snippets(snippets)
+        batched_s = time.perf_counter() - started
+        launches = debug_code.ANALYSIS_STATS["tool_launches"]
+        started = time.perf_counter()
+        debug_code.analyze_snippets(snippets)
+        cached_s = time.perf_counter() - started
+
+    print(f"{'mode':>8} {'seconds':>9} {'launches':>9}")
+    print(f"{'legacy':>8} {legacy_s:>9.2f} {2 * args.count:>9}  (extrapolated from {len(sample)})")
+    print(f"{'batched':>8} {batched_s:>9.2f} {launches:>9}")
+    print(f"{'cached':>8} {cached_s:>9.3f} {debug_code.ANALYSIS_STATS['tool_launches'] - launches:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: ui_spec schema validation on large documents.
+
+Compares, per call:
+    legacy     jsonschema.validate(instance, schema) as generate_ui_spec used to do
+               (rebuilds the validator and re-checks the schema, stops at the first error)
+    cached     a jsonschema validator built once, collecting every error with iter_errors
+    compiled   content_writer01.collect_validation_errors (compiled checker, built once)
+
+Documents are the sample ui_spec with pages/components repeated to the requested counts,
+plus an invalid variant (three sections broken) to show full error collection.
+
+Usage (from the repo root):
+    python -m benchmarks.validation --counts 100,1000,5000 --repeat 20
+"""
+import sys
+import copy
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from content_writer01 import UI_SPEC_JSON_SCHEMA, collect_validation_errors
+
+try:
+    import jsonschema
+except Exception:
+    jsonschema = None
+
+SAMPLE_SPEC = Path("ui_output/generated_ui_spec.json")
+
+
+def large_spec(count: int) -> Dict[str, Any]:
+    spec = json.loads(SAMPLE_SPEC.read_text(encoding="utf-8"))["ui_spec"]
+    page, component = spec["pages"][0], spec["components"][0]
+    spec["pages"] = [dict(page, name=f"Page{i}") for i in range(count)]
+    spec["components"] = [dict(component, name=f"Component{i}") for i in range(count)]
+    return spec
+
+
+def broken(spec: Dict[str, Any]) -> Dict[str, Any]:
+    bad = copy.copy(spec)
+    bad.pop("testing_plan")
+    bad["pages"] = {"oops": True}
+    bad["project"] = 42
+    return bad
+
+
+def legacy(instance: Any) -> List[str]:
+    try:
+        jsonschema.validate(instance=instance, schema=UI_SPEC_JSON_SCHEMA)
+        return []
+    except jsonschema.ValidationError as e:
+        return [e.message]
+
+
+def bench(fn, instance: Any, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(instance)
+    return (time.perf_counter() - started) / repeat
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--counts", default="100,1000,5000", help="comma-separated page/component counts")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    fns = {"compiled": collect_validation_errors}
+    if jsonschema is not None:
+        validator = jsonschema.validators.validator_for(UI_SPEC_JSON_SCHEMA)(UI_SPEC_JSON_SCHEMA)
+        fns["cached"] = lambda instance: [e.message for e in validator.iter_errors(instance)]
+        fns["legacy"] = legacy
+    else:
+        print("jsonschema not installed; only the compiled checker is timed", file=sys.stderr)
+
+    print(f"{'count':>7} {'doc':>8} " + " ".join(f"{name + '_us':>12} {'errors':>6}" for name in fns))
+    for count in (int(x) for x in args.counts.split(",")):
+        spec = large_spec(count)
+        for label, doc in (("valid", spec), ("invalid", broken(spec))):
+            cells = []
+            for name, fn in fns.items():
+                cells.append(f"{bench(fn, doc, args.repeat) * 1e6:>12.1f} {len(fn(doc)):>6}")
+            print(f"{count:>7} {label:>8} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
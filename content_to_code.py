@@ -1,63 +1,126 @@
+"""
+Generate frontend code from a ui_spec JSON file.
+
+Usage:
+    python content_to_code.py                      # file dialog + interactive choices
+    python content_to_code.py spec.json other.json --profile profile.json --chunked
+
+Generation choices (framework, language, css_strategy, state_management, routing) come
+from DEFAULT_PROFILE, then a JSON profile file (--profile or CODEGEN_PROFILE), then
+CODEGEN_<KEY> environment variables, then command-line flags. Long-lived workers can call
+generate_files(spec, profile) directly; the LLM client is created once per process.
+"""
 import os
+import re
 import sys
 import json
+import time
+import asyncio
+import hashlib
+import collections
+import argparse
 from pathlib import Path
-from tkinter import Tk
-from tkinter.filedialog import askopenfilename
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-Tk().withdraw()
-input_file = askopenfilename(
-    title="Select JSON Spec File",
-    filetypes=[("JSON/JSON5 files", "*.json *.json5")]
-)
-if not input_file:
-    print("No file selected, exiting...")
-    sys.exit(1)
+from typing import Any, Callable, Dict, List, Optional
+from llm_backend import create_backend
+from artifact_store import atomic_write_bytes, json_bytes, open_run, write_json_output, write_output
+import metrics
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+API_KEY = os.getenv("GOOGLE_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+TEMPERATURE = float(os.getenv("TEMPERATURE", "1"))
+
+INPUT_SPEC_FILE = os.getenv("INPUT_SPEC_FILE")
+OUTPUT_ROOT = Path(os.getenv("CODEGEN_OUTPUT_ROOT", "src"))
+CODEGEN_PROFILE = os.getenv("CODEGEN_PROFILE")
+# Never open the file dialog (no display, CI, workers); specs must be passed explicitly.
+HEADLESS = os.getenv("HEADLESS", "0").strip().lower() in ("1", "true", "yes") or (
+    os.name == "posix" and sys.platform != "darwin" and not os.getenv("DISPLAY") and not os.getenv("WAYLAND_DISPLAY"))
+
+# Chunked mode plans one unit per component/page and generates them concurrently.
+CODEGEN_CHUNKED = os.getenv("CODEGEN_CHUNKED", "0").strip().lower() in ("1", "true", "yes")
+CODEGEN_CONCURRENCY = int(os.getenv("CODEGEN_CONCURRENCY", "4"))
+FILE_MAX_ATTEMPTS = int(os.getenv("FILE_MAX_ATTEMPTS", "3"))
+# In chunked mode, regenerate only units whose spec subtree (or a dependency) changed.
+CODEGEN_INCREMENTAL = os.getenv("CODEGEN_INCREMENTAL", "1").strip().lower() in ("1", "true", "yes")
+RECORD_NAME = "generated_code_record.json"
+
+DEFAULT_PROFILE: Dict[str, str] = {
+    "framework": "React",
+    "language": "TS",
+    "css_strategy": "Tailwind",
+    "state_management": "Redux",
+    "routing": "React Router",
+}
+
+PROFILE_QUESTIONS: Dict[str, str] = {
+    "framework": "Choose your frontend framework/library [React/Vue/Angular/Svelte]:",
+    "language": "Choose language [JS/TS]:",
+    "css_strategy": "Choose CSS strategy [Tailwind/CSS Modules/SCSS]:",
+    "state_management": "Choose state management [Redux/Zustand/Pinia/None]:",
+    "routing": "Choose routing solution [React Router/Vue Router/None]:",
+}
+
+_llm = None
+
+def get_llm():
+    """The process-wide LLM backend, created on first use and reused for every spec."""
+    global _llm
+    if _llm is None:
+        if LLM_BACKEND == "gemini" and not API_KEY:
+            raise ValueError("Please set your GOOGLE_API_KEY environment variable!")
+        _llm = create_backend(LLM_BACKEND, model_name=GEMINI_MODEL, temperature=TEMPERATURE, api_key=API_KEY)
+    return _llm
 
 def read_json(file_path: str):
     with open(file_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-ui_json = read_json(input_file)
-
-project_name = ui_json.get("ui_spec", {}).get("project", "MyProject").replace(" ", "")
-OUTPUT_DIR = Path("src") / project_name
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
 def ask_choice(question: str, default: str):
     print(f"{question} (default: {default})")
     ans = input().strip()
     return ans if ans else default
 
-framework = ask_choice("Choose your frontend framework/library [React/Vue/Angular/Svelte]:", "React")
-language = ask_choice("Choose language [JS/TS]:", "TS")
-css_strategy = ask_choice("Choose CSS strategy [Tailwind/CSS Modules/SCSS]:", "Tailwind")
-state_management = ask_choice("Choose state management [Redux/Zustand/Pinia/None]:", "Redux")
-routing = ask_choice("Choose routing solution [React Router/Vue Router/None]:", "React Router")
-
-ext = "tsx" if language.lower() == "ts" else "jsx"
-
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise ValueError("Please set your GOOGLE_API_KEY environment variable!")
+def load_profile(path: Optional[str] = None, overrides: Optional[Dict[str, Optional[str]]] = None,
+                 ask: bool = False) -> Dict[str, str]:
+    """
+    Resolve a generation profile: defaults < profile file < CODEGEN_<KEY> env vars < overrides.
+    With ask=True every choice is confirmed on stdin, using the resolved value as default.
+    """
+    profile = dict(DEFAULT_PROFILE)
+    if path:
+        data = read_json(path)
+        unknown = sorted(set(data) - set(DEFAULT_PROFILE))
+        if unknown:
+            raise ValueError(f"Unknown keys in profile {path}: {unknown}")
+        profile.update({k: str(v) for k, v in data.items()})
+    for key in DEFAULT_PROFILE:
+        value = os.getenv(f"CODEGEN_{key.upper()}")
+        if value:
+            profile[key] = value
+    profile.update({k: v for k, v in (overrides or {}).items() if k in DEFAULT_PROFILE and v})
+    if ask:
+        for key, question in PROFILE_QUESTIONS.items():
+            profile[key] = ask_choice(question, profile[key])
+    return profile
 
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-TEMPERATURE = float(os.getenv("TEMPERATURE", "1"))
+def default_output_dir(spec: dict) -> Path:
+    project_name = str(spec.get("ui_spec", {}).get("project", "MyProject")).replace(" ", "")
+    return OUTPUT_ROOT / project_name
 
-llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, temperature=TEMPERATURE, api_key=API_KEY)
+def code_ext(profile: Dict[str, str]) -> str:
+    return "tsx" if profile["language"].lower() == "ts" else "jsx"
 
 def write_file(file_path: Path, content: str):
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(content)
+    # Atomic, and recorded in the current artifact run when one is open.
+    write_output(file_path, content)
 
 def safe_slug(name: str, default: str = "Untitled"):
     if not name:
         return default
     return "".join(c for c in name.title().replace(" ", "") if c.isalnum())
 
-def generate_code_from_spec(full_spec: dict):
+def generate_code_from_spec(full_spec: dict, profile: Optional[Dict[str, str]] = None, llm=None):
     """
     Generate fully detailed static code from JSON spec.
     LLM must output complete components and pages including:
@@ -66,6 +129,10 @@ def generate_code_from_spec(full_spec: dict):
     - Full CSS styling (Tailwind)
     - Pages rendering multiple components
     """
+    profile = profile or load_profile()
+    llm = llm or get_llm()
+    framework, language, css_strategy = profile["framework"], profile["language"], profile["css_strategy"]
+    state_management, ext = profile["state_management"], code_ext(profile)
     prompt = f"""
 You are an expert frontend engineer. Generate a complete, fully functional {framework} project
 using {language} and {css_strategy}. Follow these rules:
@@ -89,45 +156,452 @@ Output JSON only, where keys are filenames like:
 
 Do NOT include markdown, explanations, or partial/skeleton code. Only output full, ready-to-use code.
 """
-    response = llm.invoke(prompt)
-
-    if hasattr(response, "content"):
-        resp_text = response.content
-    elif isinstance(response, str):
-        resp_text = response
-    else:
-        resp_text = str(response)
-
-    resp_text = resp_text.strip()
+    run = metrics.RunMetrics("generate_code_from_spec", mode="single", framework=framework, language=language)
+    run.prompt(prompt)
+    try:
+        with run.timer("model"):
+            resp_text = llm.invoke(prompt).strip()
+    except Exception as e:
+        run.finish("error", attempts=1, error=str(e))
+        raise
+    run.response(resp_text)
     if resp_text.startswith("```"):
         resp_text = "\n".join(resp_text.splitlines()[1:])
         if resp_text.endswith("```"):
             resp_text = "\n".join(resp_text.splitlines()[:-1])
 
     try:
-        return json.loads(resp_text)
+        with run.timer("parse"):
+            parsed = json.loads(resp_text)
     except Exception as e:
         print("Error parsing LLM output:", e)
         print("Raw output (first 500 chars):", resp_text[:500])
+        # Don't let the response cache replay an unusable answer on the next run.
+        llm.invalidate(prompt)
+        run.finish("failed", attempts=1, files=0)
         return {}
+    if not isinstance(parsed, dict):
+        print("LLM output is not a filename-to-code object; ignoring it")
+        llm.invalidate(prompt)
+        run.finish("failed", attempts=1, files=0)
+        return {}
+    skipped = [k for k, v in parsed.items() if not isinstance(v, str)]
+    if skipped:
+        print(f"Ignoring non-code entries in LLM output: {skipped[:10]}")
+    files = {k: v for k, v in parsed.items() if isinstance(v, str)}
+    if not files:
+        llm.invalidate(prompt)
+    run.finish("ok", attempts=1, files=len(files), skipped_entries=len(skipped))
+    return files
+
+def style_ext(profile: Dict[str, str]) -> Optional[str]:
+    """Extension of the per-file stylesheet, or None when styles live in the markup (Tailwind)."""
+    strategy = profile["css_strategy"].lower()
+    if "tailwind" in strategy:
+        return None
+    if "module" in strategy:
+        return "module.css"
+    if "scss" in strategy or "sass" in strategy:
+        return "scss"
+    return "css"
 
-def generate_ui_from_json(json_spec: dict, output_dir: Path = OUTPUT_DIR):
-    generated_code_record = {}
+def pascal_name(name: Any, default: str) -> str:
+    """PascalCase identifier that keeps existing inner capitals (RecipeCard stays RecipeCard)."""
+    parts = re.findall(r"[A-Za-z0-9]+", str(name or ""))
+    ident = "".join(p[0].upper() + p[1:] for p in parts)
+    if not ident or ident[0].isdigit():
+        return default
+    return ident
+
+def _unique_name(name: str, taken: set) -> str:
+    candidate, n = name, 2
+    while candidate in taken:
+        candidate = f"{name}{n}"
+        n += 1
+    taken.add(candidate)
+    return candidate
+
+def _page_name(page: Any, index: int) -> str:
+    if isinstance(page, dict):
+        for key in ("name", "title", "route", "path"):
+            if page.get(key):
+                return pascal_name(page[key], f"Page{index}")
+    return f"Page{index}"
+
+_WORD_RE = re.compile(r"\w+")
+
+def plan_files(full_spec: dict, profile: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Split the spec into generation units: one per component (admin components included),
+    one per page and a final App unit. Each unit lists the files it must produce and, in
+    "uses", the component/page names its spec references (the ones it may import).
+    """
+    spec = full_spec.get("ui_spec", full_spec)
+    ext, sext = code_ext(profile), style_ext(profile)
+    taken: set = set()
+    units: List[Dict[str, Any]] = []
+
+    components = list(spec.get("components") or []) + list(spec.get("admin_components") or [])
+    for i, comp in enumerate(components, start=1):
+        raw_name = comp.get("name") if isinstance(comp, dict) else str(comp)
+        name = _unique_name(pascal_name(raw_name, f"Component{i}"), taken)
+        files = [f"components/{name}/{name}.{ext}"] + ([f"components/{name}/{name}.{sext}"] if sext else [])
+        source = f"components[{i - 1}]" if i <= len(spec.get("components") or []) else \
+            f"admin_components[{i - 1 - len(spec.get('components') or [])}]"
+        units.append({"kind": "component", "name": name, "spec": comp, "files": files, "uses": [], "source": source})
+    # Names are [A-Za-z0-9]+, so a whole-word match is membership in the spec's \w+ tokens;
+    # one tokenization per spec keeps this linear in the number of units.
+    component_order = {u["name"]: i for i, u in enumerate(units)}
+    for unit in units:
+        tokens = set(_WORD_RE.findall(json.dumps(unit["spec"], ensure_ascii=False)))
+        tokens.discard(unit["name"])
+        unit["uses"] = sorted(tokens.intersection(component_order), key=component_order.__getitem__)
 
-    code_files = generate_code_from_spec(json_spec)
-    for filename, content in code_files.items():
-        file_path = output_dir / filename
-        write_file(file_path, content)
-        print(f"Generated: {file_path}")
-        slug_name = safe_slug(Path(filename).stem)
-        generated_code_record[slug_name] = filename
+    for i, page in enumerate(spec.get("pages") or [], start=1):
+        name = _unique_name(_page_name(page, i), taken)
+        tokens = set(_WORD_RE.findall(json.dumps(page, ensure_ascii=False)))
+        uses = sorted(tokens.intersection(component_order), key=component_order.__getitem__)
+        files = [f"pages/{name}/{name}.{ext}"] + ([f"pages/{name}/{name}.{sext}"] if sext else [])
+        units.append({"kind": "page", "name": name, "spec": page, "files": files, "uses": uses,
+                      "source": f"pages[{i - 1}]"})
 
-    record_path = output_dir / "generated_code_record.json"
-    with open(record_path, "w", encoding="utf-8") as f:
-        json.dump(generated_code_record, f, indent=2)
+    pages = [u["name"] for u in units if u["kind"] == "page"]
+    app_spec = {k: spec[k] for k in ("project", "flows") if k in spec}
+    units.append({"kind": "app", "name": "App", "spec": app_spec, "files": [f"App.{ext}"], "uses": pages,
+                  "source": "project,flows"})
+    return units
+
+def build_unit_prompt(unit: Dict[str, Any], units: List[Dict[str, Any]], profile: Dict[str, str],
+                      feedback: Optional[str] = None) -> str:
+    # Only the components this unit's spec references, so prompts don't grow with the project.
+    uses = set(unit["uses"])
+    used = [u for u in units if u["kind"] == "component" and u["name"] in uses]
+    if unit["kind"] == "component":
+        imports = "Other components you may import: " + (", ".join(
+            f"{u['name']} (components/{u['name']}/{u['name']})" for u in used) or "none")
+    elif unit["kind"] == "page":
+        imports = "Components this page uses (import them, don't redefine them):\n" + (
+            "\n".join(f"- components/{u['name']}/{u['name']}: props {json.dumps((u['spec'] or {}).get('props', {}) if isinstance(u['spec'], dict) else {}, ensure_ascii=False)}"
+                      for u in used) or "- none")
+    else:
+        imports = "Pages to route to (import from pages/<Name>/<Name>): " + ", ".join(unit["uses"])
+    feedback_block = f"\nYOUR PREVIOUS ANSWER WAS REJECTED: {feedback[:500]}\nFix it.\n" if feedback else ""
+    return f"""
+You are an expert frontend engineer writing ONE unit of a {profile['framework']} project in {profile['language']} with {profile['css_strategy']}.
+Use {profile['state_management']} for state management and {profile['routing']} for routing. Other files are generated separately.
+
+Write the {unit['kind']} "{unit['name']}". Make it fully static (dummy data where needed), ready to run without backend.
+{imports}
+{feedback_block}
+Spec for this {unit['kind']}:
+{json.dumps(unit['spec'], indent=2, ensure_ascii=False)}
+
+Output JSON only: an object whose keys are exactly {json.dumps(unit['files'])} and whose values are
+the complete file contents. Do NOT include markdown, explanations, or partial/skeleton code.
+"""
+
+def parse_unit_files(resp_text: str, unit: Dict[str, Any]):
+    """Returns (files, error); only the planned filenames are accepted."""
+    from content_writer01 import extract_json_from_text
+    parsed = extract_json_from_text(resp_text)
+    if not isinstance(parsed, dict):
+        return None, "the output was not a JSON object"
+    missing = [f for f in unit["files"] if not isinstance(parsed.get(f), str) or not parsed[f].strip()]
+    if missing:
+        return None, f"missing or empty files: {missing}"
+    return {f: parsed[f] for f in unit["files"]}, None
+
+async def generate_unit(unit: Dict[str, Any], units: List[Dict[str, Any]], profile: Dict[str, str], llm,
+                        sem: asyncio.Semaphore, output_dir: Optional[Path], max_attempts: int = FILE_MAX_ATTEMPTS):
+    """
+    Generate one unit, retrying only this unit; with an output_dir its files are written
+    as soon as they validate.
+    """
+    feedback = None
+    started = time.perf_counter()
+    run = metrics.current_run()
+    for attempt in range(1, max_attempts + 1):
+        prompt = build_unit_prompt(unit, units, profile, feedback)
+        if run is not None:
+            run.count("attempts")
+            run.prompt(prompt)
+        async with sem:
+            try:
+                with metrics.timer("model"):
+                    resp_text = await llm.ainvoke(prompt)
+            except Exception as e:
+                print(f"[{unit['name']}] attempt {attempt}/{max_attempts} failed: {e}")
+                metrics.count("model_errors")
+                continue
+        if run is not None:
+            run.response(resp_text)
+        with metrics.timer("parse"):
+            files, feedback = parse_unit_files(resp_text, unit)
+        if files is not None:
+            for filename, content in files.items():
+                if output_dir is not None:
+                    write_file(output_dir / filename, content)
+                    print(f"Generated: {output_dir / filename}")
+            return unit, files, {"attempts": attempt, "latency_s": round(time.perf_counter() - started, 3)}
+        llm.invalidate(prompt)
+        metrics.count("rejected_responses")
+        print(f"[{unit['name']}] attempt {attempt}/{max_attempts} rejected: {feedback}")
+    return unit, None, {"attempts": max_attempts, "latency_s": round(time.perf_counter() - started, 3)}
+
+async def generate_code_chunked(full_spec: dict, profile: Dict[str, str], output_dir: Optional[Path] = None,
+                                concurrency: int = CODEGEN_CONCURRENCY, llm=None,
+                                units: Optional[List[Dict[str, Any]]] = None,
+                                only: Optional[set] = None,
+                                on_unit: Optional[Callable[[Dict[str, Any], Optional[Dict[str, str]]], None]] = None):
+    """
+    Chunked counterpart of generate_code_from_spec: plans the file list, generates every
+    unit (or just the names in `only`) concurrently with at most `concurrency` requests in
+    flight, and writes files to output_dir (if given) as they arrive. Units that still fail
+    after FILE_MAX_ATTEMPTS are reported and skipped, so one bad response no longer
+    discards the whole project. on_unit(unit, files or None) is called as each unit
+    finishes. Returns (code_files, failed_unit_names).
+    """
+    llm = llm or get_llm()
+    units = units if units is not None else plan_files(full_spec, profile)
+    todo = [u for u in units if only is None or u["name"] in only]
+    sem = asyncio.Semaphore(max(1, concurrency))
+    print(f"Planned {len(units)} units, generating {len(todo)} ({sum(len(u['files']) for u in todo)} files), "
+          f"concurrency {concurrency}")
+    started = time.perf_counter()
+    code_files: Dict[str, str] = {}
+    failed: List[str] = []
+    run = metrics.RunMetrics("generate_code_from_spec", mode="chunked", framework=profile["framework"],
+                             language=profile["language"], concurrency=concurrency)
+    try:
+        for fut in asyncio.as_completed([generate_unit(u, units, profile, llm, sem, output_dir) for u in todo]):
+            unit, files, stats = await fut
+            run.observe("unit_attempts", stats["attempts"])
+            run.add_time("unit", stats["latency_s"])
+            if files is None:
+                failed.append(unit["name"])
+            else:
+                code_files.update(files)
+            if on_unit is not None:
+                on_unit(unit, files)
+    except BaseException:
+        run.finish("error", units=len(todo))
+        raise
+    status = "ok" if not failed else ("failed" if len(failed) == len(todo) else "partial")
+    run.finish(status, units=len(todo), failed_units=len(failed),
+               files=len(code_files), max_attempts=FILE_MAX_ATTEMPTS)
+    print(f"Chunked generation: {len(todo) - len(failed)}/{len(todo)} units in {time.perf_counter() - started:.2f}s")
+    if failed:
+        print(f"Failed units (rerun to retry): {', '.join(failed)}")
+    return code_files, failed
+
+async def agenerate_files(spec: dict, profile: Optional[Dict[str, str]] = None, chunked: Optional[bool] = None,
+                          concurrency: int = CODEGEN_CONCURRENCY, llm=None) -> Dict[str, str]:
+    """Async form of generate_files, for callers that already run an event loop."""
+    profile = profile or load_profile()
+    chunked = CODEGEN_CHUNKED if chunked is None else chunked
+    if chunked:
+        code_files, _ = await generate_code_chunked(spec, profile, None, concurrency, llm)
+        return code_files
+    return await asyncio.to_thread(generate_code_from_spec, spec, profile, llm)
+
+def generate_files(spec: dict, profile: Optional[Dict[str, str]] = None, chunked: Optional[bool] = None,
+                   concurrency: int = CODEGEN_CONCURRENCY, llm=None) -> Dict[str, str]:
+    """
+    Generate code for one spec without touching the disk: returns {filename: content}.
+    The LLM client is shared across calls, so a worker can process many specs in turn.
+    """
+    return asyncio.run(agenerate_files(spec, profile, chunked, concurrency, llm))
+
+def spec_hash(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def load_record(output_dir: Path) -> Dict[str, Any]:
+    """The previous run's record, or {} when missing, unreadable or in the old flat format."""
+    try:
+        record = read_json(str(output_dir / RECORD_NAME))
+    except (OSError, ValueError):
+        return {}
+    return record if isinstance(record, dict) and isinstance(record.get("units"), dict) else {}
+
+def diff_units(units: List[Dict[str, Any]], record: Dict[str, Any], output_dir: Path, profile: Dict[str, str]):
+    """
+    Decide which units to regenerate against the previous record. A unit is dirty when it
+    is new, its spec subtree hash or dependency list changed, one of its files is missing,
+    or it imports a dirty unit, directly or through other units (a component using a
+    changed component, the pages using either, App). Returns (dirty_names, reasons, stale_files)
+    where stale_files belonged to units that no longer exist, or were generated under a
+    different profile (e.g. .tsx files after switching to JavaScript), and won't be rewritten.
+    """
+    # The profile shapes every file, so a different profile invalidates the whole record.
+    recorded = record.get("units", {})
+    previous = recorded if record.get("settings") == profile else {}
+    reasons: Dict[str, str] = {}
+    for unit in units:
+        old = previous.get(unit["name"])
+        if old is None:
+            reasons[unit["name"]] = "new"
+        elif old.get("hash") != spec_hash(unit["spec"]):
+            reasons[unit["name"]] = f"spec changed ({unit['source']})"
+        elif old.get("uses") != unit["uses"] or old.get("files") != unit["files"]:
+            reasons[unit["name"]] = "dependencies changed"
+        elif not all((output_dir / f).exists() for f in unit["files"]):
+            reasons[unit["name"]] = "missing files"
+    users: Dict[str, List[Dict[str, Any]]] = {}
+    for unit in units:
+        for used in unit["uses"]:
+            users.setdefault(used, []).append(unit)
+    # Breadth-first from the units dirty on their own, in unit order, so each dependent is
+    # marked once with the dirty imports known when it is reached.
+    queue = collections.deque(u["name"] for u in units if u["name"] in reasons)
+    while queue:
+        for unit in users.get(queue.popleft(), []):
+            if unit["name"] not in reasons:
+                changed = [c for c in unit["uses"] if c in reasons]
+                reasons[unit["name"]] = f"imports changed {', '.join(changed)}"
+                queue.append(unit["name"])
+
+    current_files = {f for u in units for f in u["files"]}
+    names = {u["name"] for u in units}
+    # After a profile change every recorded file may be stale, otherwise only those of removed units.
+    gone = recorded if not previous else {name: old for name, old in recorded.items() if name not in names}
+    stale = [f for old in gone.values() for f in old.get("files", []) if f not in current_files]
+    return set(reasons), reasons, stale
+
+def write_record(record_path: Path, record: Dict[str, Any], final: bool = False):
+    """Checkpoints only replace the file; the final record is also kept in the artifact run."""
+    if final:
+        write_json_output(record_path, record)
+    else:
+        atomic_write_bytes(record_path, json_bytes(record))
+
+def build_record(units: List[Dict[str, Any]], record: Dict[str, Any], regenerated: set, failed: List[str],
+                 profile: Dict[str, str]):
+    """Record for this run; failed units are left out so the next run retries them."""
+    previous = record.get("units", {})
+    entries: Dict[str, Any] = {}
+    for unit in units:
+        if unit["name"] in failed:
+            continue
+        if unit["name"] not in regenerated and unit["name"] not in previous:
+            continue
+        entries[unit["name"]] = {"kind": unit["kind"], "source": unit["source"], "hash": spec_hash(unit["spec"]),
+                                 "files": unit["files"], "uses": unit["uses"]}
+    files = {}
+    for entry in entries.values():
+        for filename in entry["files"]:
+            files[safe_slug(Path(filename).stem)] = filename
+    return {"settings": dict(profile), "units": entries, "files": files}
+
+async def agenerate_ui_from_json(json_spec: dict, output_dir: Optional[Path] = None,
+                                 profile: Optional[Dict[str, str]] = None, chunked: Optional[bool] = None,
+                                 concurrency: int = CODEGEN_CONCURRENCY, llm=None) -> Path:
+    """
+    Generate the project for json_spec under output_dir (default src/<project>) and write
+    generated_code_record.json; returns the record path. In chunked mode only units that
+    changed since the last record are regenerated.
+    """
+    profile = profile or load_profile()
+    chunked = CODEGEN_CHUNKED if chunked is None else chunked
+    output_dir = Path(output_dir) if output_dir is not None else default_output_dir(json_spec)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    record_path = output_dir / RECORD_NAME
+    artifacts = open_run("generate_code", base_dir=output_dir, chunked=bool(chunked),
+                         project=json_spec.get("ui_spec", {}).get("project"))
+
+    try:
+        if chunked:
+            units = plan_files(json_spec, profile)
+            record = load_record(output_dir) if CODEGEN_INCREMENTAL else {}
+            dirty, reasons, stale = diff_units(units, record, output_dir, profile)
+            for name in sorted(reasons):
+                print(f"Regenerating {name}: {reasons[name]}")
+            print(f"Incremental: {len(dirty)}/{len(units)} units need regeneration")
+            for filename in stale:
+                try:
+                    (output_dir / filename).unlink()
+                    print(f"Removed stale file: {output_dir / filename}")
+                except OSError:
+                    pass
+            done: set = set()
+
+            def checkpoint(unit: Dict[str, Any], files: Optional[Dict[str, str]]):
+                # Record finished units as they land, so an interrupted run resumes with the rest.
+                if files is not None:
+                    done.add(unit["name"])
+                    write_record(record_path, build_record(units, record, done, sorted(dirty - done), profile))
+
+            _, failed = await generate_code_chunked(json_spec, profile, output_dir, concurrency, llm,
+                                                    units=units, only=dirty, on_unit=checkpoint)
+            generated_code_record = build_record(units, record, dirty, failed, profile)
+        else:
+            failed = []
+            generated_code_record = {}
+            code_files = await asyncio.to_thread(generate_code_from_spec, json_spec, profile, llm)
+            for filename, content in code_files.items():
+                file_path = output_dir / filename
+                write_file(file_path, content)
+                print(f"Generated: {file_path}")
+                slug_name = safe_slug(Path(filename).stem)
+                generated_code_record[slug_name] = filename
+
+        write_record(record_path, generated_code_record, final=True)
+    except BaseException:
+        if artifacts is not None:
+            artifacts.close("error")
+        raise
+    if artifacts is not None:
+        artifacts.close("partial" if chunked and failed else "ok")
 
     print(f"JSON record saved at: {record_path}")
     print(f"UI code generation completed under '{output_dir}' folder.")
+    return record_path
+
+def generate_ui_from_json(json_spec: dict, output_dir: Optional[Path] = None,
+                          profile: Optional[Dict[str, str]] = None, chunked: Optional[bool] = None,
+                          concurrency: int = CODEGEN_CONCURRENCY, llm=None) -> Path:
+    return asyncio.run(agenerate_ui_from_json(json_spec, output_dir, profile, chunked, concurrency, llm))
+
+def pick_spec_file() -> Optional[str]:
+    """Ask for the spec with a file dialog; tkinter is only imported when a dialog is needed."""
+    from tkinter import Tk
+    from tkinter.filedialog import askopenfilename
+    Tk().withdraw()
+    return askopenfilename(
+        title="Select JSON Spec File",
+        filetypes=[("JSON/JSON5 files", "*.json *.json5")]
+    )
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate frontend code from ui_spec JSON files.")
+    parser.add_argument("specs", nargs="*", help="ui_spec JSON files (default: INPUT_SPEC_FILE or a file dialog)")
+    parser.add_argument("--profile", default=CODEGEN_PROFILE, help="JSON file with generation choices")
+    for key in DEFAULT_PROFILE:
+        parser.add_argument(f"--{key.replace('_', '-')}", dest=key, help=f"override the profile's {key}")
+    parser.add_argument("--output-dir", help="output directory (single spec only; default src/<project>)")
+    parser.add_argument("--chunked", action="store_true", default=None, help="one request per component/page")
+    parser.add_argument("--concurrency", type=int, default=CODEGEN_CONCURRENCY)
+    parser.add_argument("--interactive", action="store_true", help="confirm every choice on stdin")
+    args = parser.parse_args(argv)
+
+    specs = args.specs or ([INPUT_SPEC_FILE] if INPUT_SPEC_FILE else [])
+    from_dialog = not specs
+    if from_dialog and HEADLESS:
+        parser.error("no spec given (pass spec files or set INPUT_SPEC_FILE in headless mode)")
+    if from_dialog:
+        input_file = pick_spec_file()
+        if not input_file:
+            print("No file selected, exiting...")
+            sys.exit(1)
+        specs = [input_file]
+    if args.output_dir and len(specs) > 1:
+        parser.error("--output-dir needs exactly one spec")
+
+    # Someone who picked the file in a dialog is at the keyboard; keep the old prompts for them.
+    ask = args.interactive or (from_dialog and args.profile is None and sys.stdin.isatty())
+    profile = load_profile(args.profile, {k: getattr(args, k) for k in DEFAULT_PROFILE}, ask=ask)
+    for spec_file in specs:
+        generate_ui_from_json(read_json(spec_file), args.output_dir, profile, args.chunked, args.concurrency)
 
 if __name__ == "__main__":
-    generate_ui_from_json(ui_json)
+    main()
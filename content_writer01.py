@@ -6,20 +6,21 @@ import logging
 import re
 import textwrap
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple, List
-
-from tkinter import Tk
-from tkinter.filedialog import askopenfilename
+from typing import Callable, Dict, Any, Optional, Tuple, List
 
 import asyncio
-import json5
 
 try:
-    import jsonschema
+    import orjson
 except Exception:
-    jsonschema = None
+    orjson = None
 
-from langchain_google_genai import ChatGoogleGenerativeAI
+from artifact_store import open_run, write_json_output, write_output
+from llm_backend import KeyedPrompt, create_backend
+from metrics import RunMetrics
+from example_index import find_examples, record_example
+from json_stream import IncrementalJSONParser, JSONStreamError, load_selected
+from prompt_budget import estimate_tokens, fit_context, inputs_block
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,93 +29,113 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ui-generator-super")
 
-Tk().withdraw()
-
-INPUT_SYSTEM_FILE = os.getenv("INPUT_SYSTEM_FILE") or askopenfilename(
-    title="Choose system design JSON file", filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-)
-INPUT_REQUIRE_FILE = os.getenv("INPUT_REQUIRE_FILE") or askopenfilename(
-    title="Choose requirements JSON file", filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-)
-
-if not INPUT_SYSTEM_FILE or not INPUT_REQUIRE_FILE:
-    logger.error("Both system and requirements files are required. Exiting.")
-    sys.exit(1)
+INPUT_SYSTEM_FILE = os.getenv("INPUT_SYSTEM_FILE")
+INPUT_REQUIRE_FILE = os.getenv("INPUT_REQUIRE_FILE")
 
 OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "ui_output"))
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-RAW_OUTPUT_PATH = OUTPUT_DIR / "generated_ui_spec_raw.txt"
-GENERATED_JSON_PATH = OUTPUT_DIR / "generated_ui_spec.json"
-FAILED_JSON_PATH = OUTPUT_DIR / "generated_ui_spec_failed.json"
+RAW_OUTPUT_NAME = "generated_ui_spec_raw.txt"
+GENERATED_JSON_NAME = "generated_ui_spec.json"
+FAILED_JSON_NAME = "generated_ui_spec_failed.json"
+
+RAW_OUTPUT_PATH = OUTPUT_DIR / RAW_OUTPUT_NAME
+GENERATED_JSON_PATH = OUTPUT_DIR / GENERATED_JSON_NAME
+FAILED_JSON_PATH = OUTPUT_DIR / FAILED_JSON_NAME
 
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.3"))
 MAX_ATTEMPTS = int(os.getenv("MAX_ATTEMPTS", "5"))
 SUMMARIZE_INPUTS = os.getenv("SUMMARIZE_INPUTS", "0").strip() in ("1", "true", "yes")
 FORCE_FULL_PROMPT = os.getenv("FORCE_FULL_PROMPT", "0").strip() in ("1", "true", "yes")
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "30000"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "1000"))
+STREAM_OUTPUT = os.getenv("STREAM_OUTPUT", "0").strip() in ("1", "true", "yes")
+SHARDED = os.getenv("SHARDED", "0").strip() in ("1", "true", "yes")
+# Never open file dialogs (no display, CI, workers); inputs must come from the environment.
+HEADLESS = os.getenv("HEADLESS", "0").strip() in ("1", "true", "yes") or (
+    os.name == "posix" and sys.platform != "darwin" and not os.getenv("DISPLAY") and not os.getenv("WAYLAND_DISPLAY"))
+REPAIR_MODE = os.getenv("REPAIR_MODE", "delta").strip().lower()
+REPAIR_MAX_CHARS = int(os.getenv("REPAIR_MAX_CHARS", "15000"))
+# First attempt as BEST_OF_N concurrent candidates (at BEST_OF_TEMPERATURES, default
+# TEMPERATURE stepped up by 0.3); "first" takes the first valid one and cancels the rest,
+# "best" waits for all and keeps the most complete.
+BEST_OF_N = int(os.getenv("BEST_OF_N", "1"))
+BEST_OF_MODE = os.getenv("BEST_OF_MODE", "first").strip().lower()
+BEST_OF_TEMPERATURES = [float(t) for t in os.getenv("BEST_OF_TEMPERATURES", "").split(",") if t.strip()]
+# Input files of at least this size are streamed, keeping only INPUT_SECTION_KEYS (and
+# shallow scalars) instead of loading the whole export.
+INPUT_STREAM_MIN_MB = float(os.getenv("INPUT_STREAM_MIN_MB", "64"))
+INPUT_SECTION_KEYS = {
+    "features", "user_roles", "pages", "crud_operations", "data_models", "tech_stack", "api_endpoints",
+    "component_architecture", "components", "database_schema", "security_considerations", "security",
+    "infrastructure", "frontend", "backend", "database",
+}
+
+class UISpecGenerationError(RuntimeError):
+    """Raised when no validated ui_spec could be produced within MAX_ATTEMPTS."""
+
+    def __init__(self, message: str, raw_output_path: Optional[Path] = None):
+        super().__init__(message)
+        self.raw_output_path = raw_output_path
+
+
+def pick_input_file(title: str) -> str:
+    """Ask for an input file with a Tk dialog (interactive runs only)."""
+    from tkinter import Tk
+    from tkinter.filedialog import askopenfilename
+
+    root = Tk()
+    root.withdraw()
+    try:
+        return askopenfilename(title=title, filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+    finally:
+        root.destroy()
+
+
+def output_paths(output_dir: Path) -> Tuple[Path, Path, Path]:
+    """Return (raw, generated, failed) output paths inside output_dir."""
+    return output_dir / RAW_OUTPUT_NAME, output_dir / GENERATED_JSON_NAME, output_dir / FAILED_JSON_NAME
+
+
+def create_model(temperature: Optional[float] = None):
+    """Create the LLM backend selected by LLM_BACKEND (see llm_backend)."""
+    return create_backend(model_name=GEMINI_MODEL, temperature=TEMPERATURE if temperature is None else temperature)
+
 
 def read_json_file(path: str) -> Dict:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def _input_member(path: Tuple[str, ...], kind: str) -> bool:
+    return path[-1] in INPUT_SECTION_KEYS or (kind == "scalar" and len(path) <= 2)
+
+
+def read_input_json(path: str) -> Dict:
+    """
+    Read a system/requirements input. Files of INPUT_STREAM_MIN_MB or more are streamed and
+    only the sections the prompts use are built, so memory follows those, not the file size.
+    """
+    size = os.path.getsize(path)
+    if size < INPUT_STREAM_MIN_MB * 1e6:
+        return read_json_file(path)
+    started = time.perf_counter()
+    data = load_selected(path, _input_member)
+    logger.info("Streamed %s (%.0f MB) in %.1fs, keeping %s", path, size / 1e6,
+                time.perf_counter() - started, sorted(data) if isinstance(data, dict) else type(data).__name__)
+    return data
+
+
 def atomic_write_json(path: Path, data: Any):
-    tmp = path.with_suffix(".tmp")
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    tmp.replace(path)
+    write_json_output(path, data)
     logger.info("Wrote %s", path)
 
 
 def save_raw_output(path: Path, text: str):
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(text)
+    write_output(path, text)
     logger.info("Saved raw model output to %s", path)
 
 
-def summarize_json_for_prompt(j: Dict, role: str = "system", max_chars: int = 4000) -> Tuple[str, bool]:
-    """
-    Produce a concise, structured summary of an input JSON for embedding in the prompt.
-    Returns (summary_text, truncated_flag).
-    """
-    try:
-        parts = []
-        keys = list(j.keys())[:50]
-        parts.append(f"TOP_KEYS: {', '.join(keys)}")
-        def get_path(obj, *path):
-            cur = obj
-            for p in path:
-                if isinstance(cur, dict) and p in cur:
-                    cur = cur[p]
-                else:
-                    return None
-            return cur
-
-        features = get_path(j, "output", "requirements", "features") or get_path(j, "requirements", "features") or j.get("features")
-        if isinstance(features, list):
-            parts.append("FEATURES: " + "; ".join(features[:20]))
-        pages = get_path(j, "output", "requirements", "pages") or get_path(j, "requirements", "pages") or j.get("pages")
-        if isinstance(pages, list):
-            parts.append("PAGES: " + ", ".join(pages[:40]))
-        data_models = get_path(j, "output", "requirements", "data_models") or get_path(j, "requirements", "data_models") or j.get("data_models") or j.get("models")
-        if isinstance(data_models, dict):
-            parts.append("DATA_MODELS: " + ", ".join(list(data_models.keys())[:40]))
-            for k, v in list(data_models.items())[:6]:
-                if isinstance(v, dict):
-                    parts.append(f"{k}_FIELDS: {', '.join(list(v.keys())[:8])}")
-        api = get_path(j, "output", "architecture_spec", "api_endpoints") or j.get("api_endpoints")
-        if isinstance(api, list):
-            endpoints = [str(item.get("path") or item) for item in api[:8]]
-            parts.append("API_ENDPOINTS: " + ", ".join(endpoints))
-        summary = "\n".join(parts)
-        if len(summary) > max_chars:
-            return summary[:max_chars] + "\n...TRUNCATED...", True
-        return summary, False
-    except Exception as e:
-        return f"(unable to summarize input: {e})", True
-
-
 UI_SPEC_JSON_SCHEMA: Dict[str, Any] = {
     "type": "object",
     "required": ["project", "inferred_domain", "generated_at", "source_files", "purpose", "assumptions", "pages", "components", "data_models", "implementation_notes", "accessibility_summary", "i18n_keys_sample", "performance_tips", "monitoring_and_metrics", "testing_plan", "deployment_plan", "next_steps"],
@@ -142,29 +163,7 @@ UI_SPEC_JSON_SCHEMA: Dict[str, Any] = {
     "additionalProperties": True
 }
 
-def build_master_prompt(system_json: Dict, req_json: Dict, summarize_inputs: bool = True, examples: List[Dict] = None) -> str:
-    """
-    Build an ultra-detailed master prompt that:
-    - instructs domain inference
-    - requires complete production-ready ui_spec JSON
-    - contains few-shot examples and chain-of-thought style instructions
-    """
-    if summarize_inputs and not FORCE_FULL_PROMPT:
-        sys_summary, sys_trunc = summarize_json_for_prompt(system_json, role="system", )
-        req_summary, req_trunc = summarize_json_for_prompt(req_json, role="requirements",)
-        system_block = f"STRUCTURED_SUMMARY_SYSTEM:\n{sys_summary}\n" + ("(truncated)" if sys_trunc else "")
-        requirements_block = f"STRUCTURED_SUMMARY_REQUIREMENTS:\n{req_summary}\n" + ("(truncated)" if req_trunc else "")
-    else:
-        system_block = "FULL_SYSTEM_JSON:\n" + json.dumps(system_json, indent=2, ensure_ascii=False)
-        requirements_block = "FULL_REQUIREMENTS_JSON:\n" + json.dumps(req_json, indent=2, ensure_ascii=False)
-
-    examples_text = ""
-    if examples:
-        for i, ex in enumerate(examples[:3], start=1):
-            examples_text += f"\n### EXAMPLE {i} INPUT\n{json.dumps(ex['input'], ensure_ascii=False)}\n"
-            examples_text += f"### EXAMPLE {i} OUTPUT (JSON only)\n{json.dumps(ex['output'], ensure_ascii=False)}\n"
-
-    master_instructions = textwrap.dedent(f"""
+MASTER_INSTRUCTIONS = textwrap.dedent("""
     You are an AI Senior Product Designer, UX Writer, and Full-Stack Architect.
     Your job is to generate a single JSON object with top-level key "ui_spec".
     The ui_spec must be production-ready, exhaustive, and written so a junior dev + devops engineer
@@ -256,166 +255,720 @@ def build_master_prompt(system_json: Dict, req_json: Dict, summarize_inputs: boo
 
     Now, using the inputs below, produce the ui_spec JSON.
 
-    {examples_text}
+    """)
 
-    SYSTEM INPUT:
-    {system_block}
+def examples_block(examples: Optional[List[Dict]]) -> str:
+    examples_text = ""
+    if examples:
+        for i, ex in enumerate(examples[:3], start=1):
+            examples_text += f"\n### EXAMPLE {i} INPUT\n{json.dumps(ex['input'], ensure_ascii=False, sort_keys=True)}\n"
+            examples_text += f"### EXAMPLE {i} OUTPUT (JSON only)\n{json.dumps(ex['output'], ensure_ascii=False, sort_keys=True)}\n"
+    return examples_text
 
-    REQUIREMENTS INPUT:
-    {requirements_block}
 
-    Produce JSON now. ONLY the JSON object with "ui_spec".
-    """)
+def prompt_prefix() -> str:
+    """
+    The static part of the master prompt: the instructions only. It is byte-identical for
+    every job and attempt, so it can be registered once as cached context with the backend;
+    the few-shot examples and the inputs follow it.
+    """
+    return MASTER_INSTRUCTIONS
 
-    prompt = master_instructions
-    return prompt
 
-def extract_json_from_text(text: str) -> Optional[Dict]:
-    cleaned = text.strip()
-    cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned, flags=re.IGNORECASE | re.MULTILINE)
-    cleaned = re.sub(r"\s*```$", "", cleaned, flags=re.MULTILINE)
-    try:
-        return json.loads(cleaned)
-    except Exception:
-        pass
-    braces = []
-    start = None
-    largest = None
-    for i, ch in enumerate(text):
-        if ch == "{":
-            braces.append(i)
-            if start is None:
-                start = i
-        elif ch == "}":
-            if braces:
-                braces.pop()
-                if not braces and start is not None:
-                    candidate = text[start:i+1]
-                    largest = candidate
-                    start = None
-    if largest:
+def build_inputs_text(system_json: Dict, req_json: Dict, summarize_inputs: bool = True) -> str:
+    """The per-job inputs section, within PROMPT_TOKEN_BUDGET (SUMMARY_TOKEN_BUDGET when summarizing)."""
+    budget = SUMMARY_TOKEN_BUDGET if summarize_inputs else PROMPT_TOKEN_BUDGET
+    inputs_text, inputs_report = inputs_block(
+        system_json, req_json, UI_SPEC_JSON_SCHEMA["required"], budget, force_full=FORCE_FULL_PROMPT
+    )
+    logger.info("Prompt inputs: %s mode, ~%d tokens (budget %d)",
+                inputs_report["mode"], inputs_report["estimated_tokens"], budget)
+    return inputs_text
+
+
+def build_master_prompt(system_json: Dict, req_json: Dict, summarize_inputs: bool = True, examples: List[Dict] = None,
+                        inputs_text: Optional[str] = None) -> str:
+    """
+    Build an ultra-detailed master prompt that:
+    - instructs domain inference
+    - requires complete production-ready ui_spec JSON
+    - contains few-shot examples and chain-of-thought style instructions
+    The prompt is prompt_prefix(), then the few-shot examples, then the per-job inputs.
+    With examples it is a KeyedPrompt whose cache key leaves them out: which examples the
+    index returns changes as it grows, and that must not make identical jobs miss the cache.
+    Inputs are embedded as compact JSON within PROMPT_TOKEN_BUDGET estimated tokens
+    (SUMMARY_TOKEN_BUDGET when summarize_inputs); over budget, the most relevant parts
+    are kept (see prompt_budget). FORCE_FULL_PROMPT always embeds everything.
+    Pass inputs_text (from build_inputs_text) to reuse an already serialized inputs section.
+    """
+    if inputs_text is None:
+        inputs_text = build_inputs_text(system_json, req_json, summarize_inputs)
+
+    suffix = (
+        "SYSTEM AND REQUIREMENTS INPUT (keys \"system\" and \"requirements\"):\n"
+        f"{inputs_text}\n\n"
+        "Produce JSON now. ONLY the JSON object with \"ui_spec\".\n"
+    )
+    prefix = prompt_prefix()
+    examples_text = examples_block(examples)
+    if not examples_text:
+        return prefix + suffix
+    return KeyedPrompt(prefix + examples_text + "\n" + suffix, key_text=prefix + suffix)
+
+
+_JSON_TYPES: Dict[str, Any] = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+    "null": type(None),
+}
+_SIMPLE_SCHEMA_KEYS = {"type", "required", "properties", "additionalProperties"}
+_VALIDATORS: Dict[str, Any] = {}
+_VALIDATORS_BY_ID: Dict[int, Tuple[Dict[str, Any], Any]] = {}
+
+
+def _type_ok(value: Any, expected: str) -> bool:
+    if isinstance(value, bool) and expected in ("number", "integer"):
+        return False
+    py_type = _JSON_TYPES.get(expected)
+    return py_type is None or isinstance(value, py_type)
+
+
+def compile_schema_checker(schema: Dict[str, Any]):
+    """
+    Turn a flat object schema (type/required/properties with plain "type" entries, like
+    UI_SPEC_JSON_SCHEMA) into a plain Python function returning all errors. Returns None
+    for schemas using anything else; those go through jsonschema.
+    """
+    if set(schema) - _SIMPLE_SCHEMA_KEYS or schema.get("type", "object") != "object":
+        return None
+    if schema.get("additionalProperties", True) is not True:
+        return None
+    props = schema.get("properties", {})
+    if any(not isinstance(p, dict) or set(p) - {"type"} or not isinstance(p.get("type", ""), str) for p in props.values()):
+        return None
+    required = list(schema.get("required", []))
+    typed = [(k, p["type"]) for k, p in props.items() if "type" in p]
+
+    def check(instance: Any) -> List[Dict[str, Any]]:
+        if not isinstance(instance, dict):
+            return [{"path": "", "section": None, "validator": "type", "message": f"{type(instance).__name__} is not of type 'object'"}]
+        errors = [
+            {"path": "", "section": k, "validator": "required", "message": f"{k!r} is a required property"}
+            for k in required if k not in instance
+        ]
+        for k, expected in typed:
+            if k in instance and not _type_ok(instance[k], expected):
+                errors.append({"path": k, "section": k, "validator": "type",
+                               "message": f"{k}: {type(instance[k]).__name__} is not of type {expected!r}"})
+        return errors
+
+    return check
+
+
+def get_validator(schema: Dict[str, Any] = UI_SPEC_JSON_SCHEMA):
+    """
+    Return a cached function instance -> list of structured errors for schema.
+    Built once per process per distinct schema: a compiled checker when the schema is
+    simple enough, otherwise a jsonschema validator (checked once, not on every call).
+    """
+    hit = _VALIDATORS_BY_ID.get(id(schema))
+    if hit is not None and hit[0] is schema:
+        return hit[1]
+    key = json.dumps(schema, sort_keys=True)
+    check = _VALIDATORS.get(key)
+    if check is not None:
+        return check
+    check = compile_schema_checker(schema)
+    jsonschema = None
+    if check is None:
         try:
-            return json5.loads(largest)
+            import jsonschema
         except Exception:
-            try:
-                return json.loads(largest)
-            except Exception:
-                return None
-    try:
-        return json5.loads(text)
-    except Exception:
+            pass
+    if check is None and jsonschema:
+        validator_cls = jsonschema.validators.validator_for(schema)
+        validator_cls.check_schema(schema)
+        validator = validator_cls(schema)
+        required = schema.get("required", [])
+
+        def check(instance: Any) -> List[Dict[str, Any]]:
+            errors = []
+            for err in validator.iter_errors(instance):
+                path = list(err.absolute_path)
+                if path:
+                    section = path[0]
+                elif err.validator == "required" and isinstance(instance, dict):
+                    section = next((k for k in required if k not in instance and repr(k) in err.message), None)
+                else:
+                    section = None
+                errors.append({"path": "/".join(str(p) for p in path), "section": section,
+                               "validator": err.validator, "message": err.message})
+            return errors
+    elif check is None:
+        required = schema.get("required", [])
+
+        def check(instance: Any) -> List[Dict[str, Any]]:
+            if not isinstance(instance, dict):
+                return [{"path": "", "section": None, "validator": "type", "message": "ui_spec is not an object"}]
+            return [{"path": "", "section": k, "validator": "required", "message": f"{k!r} is a required property"}
+                    for k in required if k not in instance]
+    _VALIDATORS[key] = check
+    _VALIDATORS_BY_ID[id(schema)] = (schema, check)
+    return check
+
+
+def collect_validation_errors(ui_spec: Any, schema: Dict[str, Any] = UI_SPEC_JSON_SCHEMA) -> List[Dict[str, Any]]:
+    """All validation errors in one pass, as {"path", "section", "validator", "message"} dicts."""
+    return get_validator(schema)(ui_spec)
+
+
+def validate_ui_spec(ui_spec: Any, schema: Dict[str, Any] = UI_SPEC_JSON_SCHEMA) -> Optional[str]:
+    """Validate ui_spec against schema; returns None when valid, else all error messages joined."""
+    errors = collect_validation_errors(ui_spec, schema)
+    if not errors:
         return None
+    return "; ".join(e["message"] for e in errors)
 
-async def generate_ui_spec():
 
-    system_json = read_json_file(INPUT_SYSTEM_FILE)
-    req_json = read_json_file(INPUT_REQUIRE_FILE)
+def failing_sections(ui_spec: Any, schema: Dict[str, Any] = UI_SPEC_JSON_SCHEMA) -> List[str]:
+    """Top-level ui_spec keys that are missing or fail validation, in schema order."""
+    if not isinstance(ui_spec, dict):
+        return []
+    bad = {e["section"] for e in collect_validation_errors(ui_spec, schema) if e["section"]}
+    order = list(schema["properties"])
+    return sorted(bad, key=lambda k: order.index(k) if k in order else len(order))
 
-    prompt = build_master_prompt(system_json, req_json, summarize_inputs=SUMMARIZE_INPUTS)
 
-    logger.info("Prompt length: %d chars", len(prompt))
-    logger.info("Using model: %s (temperature=%s)", GEMINI_MODEL, TEMPERATURE)
-
-    model = ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-        temperature=TEMPERATURE
+def build_repair_prompt(ui_spec: Dict[str, Any], keys: List[str], errors: Optional[str],
+                        system_json: Dict, req_json: Dict) -> str:
+    """
+    Delta repair prompt: only the failing/missing sections, their current (invalid) values
+    and the input slices relevant to them; the model returns just those sections.
+    """
+    from sharded_ui_spec import SECTION_GUIDANCE, SECTION_SHARDS, shard_context
+
+    context: Dict[str, Any] = {}
+    for shard, shard_keys in SECTION_SHARDS.items():
+        if set(shard_keys) & set(keys):
+            for source, values in shard_context(shard, system_json, req_json).items():
+                context.setdefault(source, {}).update(values)
+    current = {k: ui_spec[k] for k in keys if k in ui_spec}
+    current_text = json.dumps(current, ensure_ascii=False, separators=(",", ":"))[:REPAIR_MAX_CHARS]
+    sections = "\n".join(f"- {k}: {SECTION_GUIDANCE.get(k, '')}" for k in keys)
+    return textwrap.dedent("""
+    You are an AI JSON Refiner. A production-ready "ui_spec" JSON for project {project!r} ({domain}) was generated,
+    but some of its sections are missing or invalid. All other sections are fine and must not be repeated.
+
+    Return ONLY a JSON object whose top-level keys are exactly: {keys}
+
+    SECTIONS TO PRODUCE:
+    {sections}
+
+    VALIDATION ERRORS:
+    {errors}
+
+    CURRENT (INVALID) VALUES OF THESE SECTIONS:
+    {current}
+
+    RELEVANT INPUTS (JSON):
+    {context}
+
+    Keep all explanations INSIDE the JSON. Do NOT output any free text outside the JSON.
+    """).format(
+        project=ui_spec.get("project", ""),
+        domain=ui_spec.get("inferred_domain", "unknown domain"),
+        keys=json.dumps(keys),
+        sections=sections,
+        errors=(errors or "missing sections")[:2000],
+        current=current_text or "(missing)",
+        context=fit_context(context, keys, PROMPT_TOKEN_BUDGET),
     )
 
-    attempt = 0
-    last_raw = None
-    while attempt < MAX_ATTEMPTS:
-        attempt += 1
-        logger.info("Generation attempt %d/%d", attempt, MAX_ATTEMPTS)
+
+_JSON_STRUCT_RE = re.compile(r'[{}"]')
+_JSON_STRING_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|,(\s*[}\]])', re.DOTALL)
+
+
+def _fast_loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _strip_trailing_commas(text: str) -> str:
+    return _TRAILING_COMMA_RE.sub(lambda m: m.group(1) or m.group(2), text)
+
+
+def iter_json_object_spans(text: str):
+    """
+    Yield (start, end) of each balanced top-level {...} span in text, in order.
+    Single pass: regexes jump between braces and double quotes, and string literals are
+    skipped whole so braces inside strings are ignored. Stops at the first span that
+    never closes (truncated output).
+    """
+    i = text.find("{")
+    depth = 0
+    start = i
+    while i != -1:
+        m = _JSON_STRUCT_RE.search(text, i)
+        if m is None:
+            return
+        ch, j = m.group(), m.start()
+        if ch == '"':
+            sm = _JSON_STRING_RE.match(text, j)
+            if sm is None:
+                return
+            i = sm.end()
+            continue
+        i = j + 1
+        if ch == "{":
+            if depth == 0:
+                start = j
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                yield start, i
+                i = text.find("{", i)
+
+
+def extract_json_from_text(text: str) -> Optional[Dict]:
+    """
+    Return the first top-level JSON object in text (code fences and prose around it are
+    ignored). Candidates are parsed with orjson/json, then retried with trailing commas
+    removed; json5 is only tried as a last resort, on the largest candidates and then on
+    the outermost {...} region.
+    """
+    failed = []
+    for start, end in iter_json_object_spans(text):
+        candidate = text[start:end]
+        try:
+            parsed = _fast_loads(candidate)
+        except ValueError:
+            failed.append(candidate)
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    fallbacks = sorted(failed, key=len, reverse=True)[:3]
+    for candidate in fallbacks:
+        try:
+            parsed = _fast_loads(_strip_trailing_commas(candidate))
+        except ValueError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    outer_start, outer_end = text.find("{"), text.rfind("}")
+    if outer_start != -1 and outer_end > outer_start:
+        outer = text[outer_start:outer_end + 1]
+        if outer not in fallbacks:
+            fallbacks.append(outer)
+    if not fallbacks:
+        return None
+    import json5
+    for candidate in fallbacks:
+        try:
+            parsed = json5.loads(candidate)
+        except Exception:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    return None
+
+
+async def stream_model_output(model, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Stream one response through IncrementalJSONParser.
+    Stops reading as soon as the structure is malformed (stats["aborted"]). Once the
+    top-level object closes (stats["complete_s"]) the rest is drained without parsing, so
+    caching and rate-limiting layers see a finished stream and the response gets cached.
+    Also reports time-to-first-byte and time-to-valid-prefix (first complete JSON value
+    inside a well-formed prefix) in seconds.
+    """
+    parser = IncrementalJSONParser()
+    chunks: List[str] = []
+    stats: Dict[str, Any] = {"ttfb_s": None, "time_to_valid_prefix_s": None, "complete_s": None,
+                             "aborted": None, "truncated": False}
+    started = time.perf_counter()
+    stream = model.astream(prompt)
+    try:
+        async for chunk in stream:
+            if not chunk:
+                continue
+            if stats["ttfb_s"] is None:
+                stats["ttfb_s"] = round(time.perf_counter() - started, 3)
+            chunks.append(chunk)
+            if parser.complete:
+                continue
+            try:
+                parser.feed(chunk)
+            except JSONStreamError as e:
+                stats["aborted"] = str(e)
+                break
+            if stats["time_to_valid_prefix_s"] is None and parser.values_completed:
+                stats["time_to_valid_prefix_s"] = round(time.perf_counter() - started, 3)
+            if parser.complete:
+                stats["complete_s"] = round(time.perf_counter() - started, 3)
+    finally:
+        await stream.aclose()
+    if not stats["aborted"]:
         try:
-            resp = await model.ainvoke(prompt)
-        except AttributeError:
-            resp = model.invoke(prompt)
-        except Exception as e:
-            logger.exception("Model invocation error: %s", e)
-            raise
-
-        raw_text = getattr(resp, "content", None) or str(resp)
-        last_raw = raw_text
-        save_raw_output(RAW_OUTPUT_PATH, raw_text)
-
-        parsed = extract_json_from_text(raw_text)
-        if parsed is None:
-            logger.warning("Could not parse JSON from model output. Attempting refinement prompt.")
+            parser.finish()
+        except JSONStreamError as e:
+            stats["truncated"] = True
+            stats["aborted"] = str(e)
+    stats["total_s"] = round(time.perf_counter() - started, 3)
+    text = "".join(chunks)
+    stats["chars"] = len(text)
+    return text, stats
+
+
+BEST_OF_STATS: Dict[str, Any] = {"races": 0, "no_valid": 0, "wins": {}}
+
+
+def candidate_temperatures(n: int) -> List[float]:
+    if BEST_OF_TEMPERATURES:
+        return [BEST_OF_TEMPERATURES[i % len(BEST_OF_TEMPERATURES)] for i in range(n)]
+    return [round(min(1.0, TEMPERATURE + 0.3 * i), 2) for i in range(n)]
+
+
+def completeness_score(ui_spec: Any) -> Tuple[int, int]:
+    """(required sections present and non-empty, total pages + components + data_models) for ranking candidates."""
+    if not isinstance(ui_spec, dict):
+        return 0, 0
+    present = sum(1 for k in UI_SPEC_JSON_SCHEMA["required"] if ui_spec.get(k) not in (None, "", [], {}))
+    items = sum(len(ui_spec[k]) for k in ("pages", "components", "data_models")
+                if isinstance(ui_spec.get(k), (list, dict)))
+    return present, items
+
+
+async def _run_candidate(position: int, model, prompt: str, stream: bool) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"position": position, "model": model, "raw": None, "ui_spec": None, "errors": None}
+    started = time.perf_counter()
+    try:
+        if stream:
+            result["raw"], stats = await stream_model_output(model, prompt)
+            if stats["aborted"] and not stats["truncated"]:
+                result["errors"] = [f"stream aborted: {stats['aborted']}"]
         else:
-            ui_spec = parsed.get("ui_spec") if isinstance(parsed, dict) and "ui_spec" in parsed else parsed
-            valid = False
-            validation_errors = None
-            if jsonschema:
-                try:
-                    jsonschema.validate(instance=ui_spec, schema=UI_SPEC_JSON_SCHEMA)
-                    valid = True
-                except Exception as e:
-                    validation_errors = str(e)
-                    valid = False
+            result["raw"] = await model.ainvoke(prompt)
+    except Exception as e:
+        result["exception"] = e
+        result["errors"] = [f"model error: {e}"]
+    if result["errors"] is None:
+        parsed = extract_json_from_text(result["raw"])
+        if isinstance(parsed, dict):
+            result["ui_spec"] = parsed.get("ui_spec") if "ui_spec" in parsed else parsed
+            result["errors"] = [e["message"] for e in collect_validation_errors(result["ui_spec"])] or None
+        else:
+            result["errors"] = ["no JSON object in output"]
+    result["latency_s"] = time.perf_counter() - started
+    return result
+
+
+async def race_candidates(prompt: str, models: List[Any], stream: bool = False, mode: Optional[str] = None,
+                          run: Optional[RunMetrics] = None) -> str:
+    """
+    Generate one candidate per model concurrently and return the chosen raw output. In
+    "first" mode the first candidate to validate wins and the others are cancelled; in
+    "best" mode all finish and the most complete wins (valid ones first). Without a valid
+    candidate the most complete output is returned for the usual repair/refine attempts.
+    Wins are counted per candidate position in BEST_OF_STATS and the run's metrics.
+    """
+    mode = mode or BEST_OF_MODE
+    tasks = [asyncio.ensure_future(_run_candidate(i, m, prompt, stream)) for i, m in enumerate(models)]
+    results: List[Dict[str, Any]] = []
+    winner = None
+    try:
+        for fut in asyncio.as_completed(tasks):
+            result = await fut
+            results.append(result)
+            logger.info("Candidate %d finished in %.2fs: %s", result["position"], result["latency_s"],
+                        "valid" if result["errors"] is None else f"{len(result['errors'])} problem(s)")
+            if result["errors"] is None and mode != "best":
+                winner = result
+                break
+    finally:
+        pending = [t for t in tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    for result in results:
+        if result["errors"] is not None and result["raw"] is not None:
+            result["model"].invalidate(prompt)
+    if winner is None:
+        scored = [r for r in results if r["raw"] is not None]
+        if not scored:
+            raise results[0]["exception"]
+        winner = max(scored, key=lambda r: (r["errors"] is None, completeness_score(r["ui_spec"]), -r["position"]))
+
+    BEST_OF_STATS["races"] += 1
+    if winner["errors"] is None:
+        wins = BEST_OF_STATS["wins"]
+        wins[winner["position"]] = wins.get(winner["position"], 0) + 1
+    else:
+        BEST_OF_STATS["no_valid"] += 1
+    if run is not None:
+        run.count("candidates", len(models))
+        run.count("candidates_cancelled", len(pending))
+        run.count(f"best_of_win_{winner['position']}" if winner["errors"] is None else "best_of_no_valid")
+        # The winner's prompt and response are recorded by the attempt itself.
+        for _ in models[1:]:
+            run.prompt(prompt)
+        for r in results:
+            if r is not winner and r["raw"] is not None:
+                run.response(r["raw"])
+        run.set(best_of_winner=winner["position"], best_of_temperature=getattr(winner["model"], "temperature", None))
+    logger.info("Best-of-%d (%s): candidate %d chosen (%s); wins so far by position: %s", len(models), mode,
+                winner["position"], "valid" if winner["errors"] is None else "none valid",
+                BEST_OF_STATS["wins"])
+    return winner["raw"]
+
+
+async def generate_ui_spec(
+    system_file: Optional[str] = None,
+    require_file: Optional[str] = None,
+    output_dir: Optional[Path] = None,
+    model=None,
+    stream: Optional[bool] = None,
+    best_of: Optional[int] = None,
+    checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None,
+    resume: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """
+    Generate and validate a ui_spec for one (system, requirements) pair.
+    Writes outputs under output_dir (default OUTPUT_DIR) and returns the path of the
+    validated JSON; raises UISpecGenerationError when all attempts fail.
+    With stream=True (default STREAM_OUTPUT) responses are checked incrementally and an
+    attempt is abandoned as soon as its JSON goes malformed.
+    With best_of > 1 (default BEST_OF_N) the first attempt is a race_candidates between
+    that many concurrent generations, each sampling at its candidate_temperatures entry
+    (a given model is re-targeted with with_temperature, keeping its cache and governor).
+    After every failed attempt checkpoint(state) is called with the retry state (next
+    prompt, attempt count, partial spec); passing that state back as resume continues
+    with the next attempt instead of starting over.
+    """
+    system_file = system_file or INPUT_SYSTEM_FILE
+    require_file = require_file or INPUT_REQUIRE_FILE
+    output_dir = Path(output_dir) if output_dir is not None else OUTPUT_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    raw_output_path, generated_json_path, failed_json_path = output_paths(output_dir)
+
+    system_json = read_input_json(system_file)
+    req_json = read_input_json(require_file)
+
+    # Serialized once per job; the refinement prompts below reuse it.
+    inputs_text = build_inputs_text(system_json, req_json, summarize_inputs=SUMMARIZE_INPUTS)
+    examples = find_examples(system_json, req_json)
+    if examples:
+        logger.info("Few-shot examples: %s", [(ex["id"], ex["similarity"]) for ex in examples])
+    prompt = build_master_prompt(system_json, req_json, examples=examples, inputs_text=inputs_text)
+
+    logger.info("Prompt length: %d chars (~%d tokens)", len(prompt), estimate_tokens(prompt))
+    logger.info("Using model: %s (temperature=%s)", GEMINI_MODEL, TEMPERATURE)
+
+    best_of = BEST_OF_N if best_of is None else best_of
+    candidates = []
+    if best_of > 1:
+        temperatures = candidate_temperatures(best_of)
+        candidates = [model.with_temperature(t) if model is not None else create_model(t) for t in temperatures]
+        logger.info("First attempt: best of %d (%s mode)", best_of, BEST_OF_MODE)
+    if model is None:
+        model = candidates[0] if candidates else create_model()
+    if stream is None:
+        stream = STREAM_OUTPUT
+    prefix = prompt_prefix()
+    prefix_cached = model.register_prefix(prefix)
+    for extra in candidates:
+        if extra is not model:
+            extra.register_prefix(prefix)
+    logger.info("Static prompt prefix: %d chars (provider-cached=%s)", len(prefix), prefix_cached)
+    run = RunMetrics("generate_ui_spec", model=GEMINI_MODEL, stream=bool(stream), output_dir=str(output_dir))
+    artifacts = None
+    try:
+        run.set(max_attempts=MAX_ATTEMPTS, prefix_chars=len(prefix), prefix_provider_cached=prefix_cached,
+                examples=len(examples), example_similarity=examples[0]["similarity"] if examples else None)
+        artifacts = open_run("generate_ui_spec", run_id=run.run_id, base_dir=output_dir, model=GEMINI_MODEL)
+        if artifacts is not None:
+            run.set(artifact_run=artifacts.run_id)
+
+        attempt = 0
+        last_raw = None
+        current_spec: Optional[Dict[str, Any]] = None
+        repair_keys: Optional[List[str]] = None
+        prompt_sizes: List[Dict[str, Any]] = []
+        if resume:
+            attempt, prompt = resume["attempt"], resume["prompt"]
+            current_spec, repair_keys = resume.get("current_spec"), resume.get("repair_keys")
+            last_raw, prompt_sizes = resume.get("last_raw"), list(resume.get("prompt_sizes", []))
+            logger.info("Resuming after attempt %d/%d", attempt, MAX_ATTEMPTS)
+            run.set(resumed_after=attempt)
+
+        def save_checkpoint():
+            if checkpoint is not None:
+                checkpoint({"attempt": attempt, "prompt": prompt, "current_spec": current_spec,
+                            "repair_keys": repair_keys, "last_raw": last_raw, "prompt_sizes": prompt_sizes})
+
+        while attempt < MAX_ATTEMPTS:
+            attempt += 1
+            mode = "initial" if attempt == 1 else ("delta_repair" if repair_keys else "full_refine")
+            prompt_sizes.append({"attempt": attempt, "mode": mode, "prompt_chars": len(prompt)})
+            logger.info("Generation attempt %d/%d (%s, prompt %d chars)", attempt, MAX_ATTEMPTS, mode, len(prompt))
+            run.count(f"attempts_{mode}")
+            run.prompt(prompt)
+            stream_stats = None
+            try:
+                with run.timer("model"):
+                    if attempt == 1 and candidates:
+                        raw_text = await race_candidates(prompt, candidates, stream, run=run)
+                    elif stream:
+                        raw_text, stream_stats = await stream_model_output(model, prompt)
+                    else:
+                        raw_text = await model.ainvoke(prompt)
+            except Exception as e:
+                logger.exception("Model invocation error: %s", e)
+                run.finish("error", attempts=attempt, error=str(e))
+                if artifacts is not None:
+                    artifacts.close("error")
+                raise
+
+            run.response(raw_text)
+            last_raw = raw_text
+            save_raw_output(raw_output_path, raw_text)
+            if artifacts is not None:
+                artifacts.put(f"attempts/{attempt}/{RAW_OUTPUT_NAME}", raw_text)
+
+            if stream_stats is not None:
+                if stream_stats["ttfb_s"] is not None:
+                    run.observe("ttfb_s", stream_stats["ttfb_s"])
+                logger.info("Stream timings (s): ttfb=%s valid_prefix=%s complete=%s total=%s chars=%d",
+                            stream_stats["ttfb_s"], stream_stats["time_to_valid_prefix_s"],
+                            stream_stats["complete_s"], stream_stats["total_s"], stream_stats["chars"])
+            if stream_stats and stream_stats["aborted"] and not stream_stats["truncated"]:
+                logger.warning("Aborted streamed attempt early: %s", stream_stats["aborted"])
+                run.count("stream_aborts")
+                parsed = None
             else:
-                missing = [k for k in UI_SPEC_JSON_SCHEMA["required"] if k not in ui_spec]
-                if missing:
-                    validation_errors = f"Missing keys: {missing}"
-                    valid = False
+                with run.timer("parse"):
+                    parsed = extract_json_from_text(raw_text)
+            ui_spec = None
+            if isinstance(parsed, dict):
+                ui_spec = parsed.get("ui_spec") if "ui_spec" in parsed else parsed
+                if repair_keys and current_spec is not None and isinstance(ui_spec, dict):
+                    patch = {k: ui_spec[k] for k in repair_keys if k in ui_spec}
+                    logger.info("Patching sections %s into the previous ui_spec", list(patch))
+                    ui_spec = dict(current_spec, **patch)
+            if ui_spec is None:
+                logger.warning("Could not parse JSON from model output. Attempting refinement prompt.")
+                run.count("parse_failures")
+                validation_errors = None
+            else:
+                with run.timer("validate"):
+                    validation_errors = validate_ui_spec(ui_spec)
+                valid = validation_errors is None
+
+                if valid:
+                    atomic_write_json(generated_json_path, {"ui_spec": ui_spec})
+                    logger.info("Generation succeeded and validated on attempt %d", attempt)
+                    record_example(system_json, req_json, ui_spec,
+                                   {"system": str(system_file), "requirements": str(require_file)})
+                    logger.info("Prompt sizes per attempt: %s", prompt_sizes)
+                    if model.cache_stats():
+                        logger.info("Response cache: %s", model.cache_stats())
+                    run.finish("ok", attempts=attempt)
+                    if artifacts is not None:
+                        artifacts.close("ok")
+                    return generated_json_path
                 else:
-                    valid = True
+                    logger.warning("Validation failed: %s", validation_errors)
+                    run.count("validation_failures")
+                    if isinstance(ui_spec, dict):
+                        current_spec = ui_spec
+
+            model.invalidate(prompt)
+            if attempt >= MAX_ATTEMPTS:
+                # No attempt left to use a repair or refine prompt.
+                break
+
+            repair_keys = failing_sections(current_spec) if REPAIR_MODE == "delta" and current_spec else None
+            if repair_keys:
+                prompt = build_repair_prompt(current_spec, repair_keys, validation_errors, system_json, req_json)
+                logger.info("Delta repair prompt prepared for %s. Retrying...", repair_keys)
+                save_checkpoint()
+                continue
+
+            refine_prompt = textwrap.dedent(f"""
+            You are an AI JSON Refiner. The system attempted to generate a production-ready "ui_spec" JSON but the output was invalid or incomplete.
+            The original instructions were: produce a single JSON object with top-level "ui_spec" that is production-ready and contains keys:
+            {UI_SPEC_JSON_SCHEMA['required']}
+
+            System and requirements input (keys "system" and "requirements"):
+            {{inputs}}
+
+            Model's last raw output (truncated):
+            {{raw_output}}
+
+            Please:
+            1) Fix and complete the JSON so that it validates against the schema above.
+            2) If fields are missing or ambiguous, make reasonable assumptions and list them under "assumptions".
+            3) Keep all explanations INSIDE the JSON (e.g., as "explanations_for_junior" strings). Do NOT output any free text outside the JSON.
+            4) Return ONLY the corrected JSON object with top-level "ui_spec".
+            """)
+            # Substituted after dedent: embedded text would defeat it and make it rescan the whole inputs.
+            prompt = refine_prompt.replace("{inputs}", inputs_text, 1).replace("{raw_output}", raw_text[:15000], 1)
+            save_checkpoint()
+            logger.info("Refinement prompt prepared. Retrying...")
+
+        logger.error("Failed to produce validated ui_spec after %d attempts. Saving failed output.", MAX_ATTEMPTS)
+        logger.info("Prompt sizes per attempt: %s", prompt_sizes)
+        run.finish("failed", attempts=MAX_ATTEMPTS)
+        if last_raw:
+            save_raw_output(failed_json_path, last_raw)
+        if artifacts is not None:
+            artifacts.close("failed")
+        raise UISpecGenerationError(
+            f"Failed to produce validated ui_spec after {MAX_ATTEMPTS} attempts", raw_output_path
+        )
+    except BaseException as e:
+        # An unexpected error (writing outputs, record_example, ...) still ends the run and resets
+        # the current-run context; runs that already finished with their own status are left alone.
+        run.finish("error", error=str(e) or type(e).__name__)
+        if artifacts is not None:
+            artifacts.close("error")
+        raise
+
+
+def main():
+    system_file, require_file = INPUT_SYSTEM_FILE, INPUT_REQUIRE_FILE
+    if not HEADLESS:
+        system_file = system_file or pick_input_file("Choose system design JSON file")
+        require_file = require_file or pick_input_file("Choose requirements JSON file")
+    if not system_file or not require_file:
+        logger.error("Both system and requirements files are required (INPUT_SYSTEM_FILE / INPUT_REQUIRE_FILE"
+                     " in headless mode). Exiting.")
+        sys.exit(1)
 
-            if valid:
-                atomic_write_json(GENERATED_JSON_PATH, {"ui_spec": ui_spec})
-                logger.info("Generation succeeded and validated on attempt %d", attempt)
-                print("SUCCESS:", GENERATED_JSON_PATH)
-                return
-            else:
-                logger.warning("Validation failed: %s", validation_errors)
-
-        refine_instruction = {
-            "reason": "validation_failed" if parsed else "parse_failed",
-            "parsed": parsed or {},
-            "raw_text_snippet": raw_text[:15000]  
-        }
-        refine_prompt = textwrap.dedent(f"""
-        You are an AI JSON Refiner. The system attempted to generate a production-ready "ui_spec" JSON but the output was invalid or incomplete.
-        The original instructions were: produce a single JSON object with top-level "ui_spec" that is production-ready and contains keys:
-        {UI_SPEC_JSON_SCHEMA['required']}
-
-        System JSON:
-        {json.dumps(system_json, indent=2)}
-
-        Requirements JSON:
-        {json.dumps(req_json, indent=2)}
-
-        Model's last raw output (truncated):
-        {raw_text[:15000]}
-
-        Please:
-        1) Fix and complete the JSON so that it validates against the schema above.
-        2) If fields are missing or ambiguous, make reasonable assumptions and list them under "assumptions".
-        3) Keep all explanations INSIDE the JSON (e.g., as "explanations_for_junior" strings). Do NOT output any free text outside the JSON.
-        4) Return ONLY the corrected JSON object with top-level "ui_spec".
-        """)
-        prompt = refine_prompt
-        logger.info("Refinement prompt prepared. Retrying...")
-
-    logger.error("Failed to produce validated ui_spec after %d attempts. Saving failed output.", MAX_ATTEMPTS)
-    if last_raw:
-        save_raw_output(FAILED_JSON_PATH, last_raw)
-    print("FAILED: see logs and", RAW_OUTPUT_PATH)
-    sys.exit(1)
+    generate = generate_ui_spec
+    if SHARDED:
+        from sharded_ui_spec import generate_ui_spec_sharded as generate
 
-if __name__ == "__main__":
     try:
-        asyncio.run(generate_ui_spec())
+        generated = asyncio.run(generate(system_file, require_file))
     except KeyboardInterrupt:
         logger.info("Interrupted by user.")
         sys.exit(130)
+    except UISpecGenerationError as exc:
+        print("FAILED: see logs and", exc.raw_output_path)
+        sys.exit(1)
     except Exception as exc:
         logger.exception("Unhandled exception: %s", exc)
         print("FAILED: see logs and", RAW_OUTPUT_PATH)
         sys.exit(1)
+    print("SUCCESS:", generated)
 
 
-
-
-
-
+if __name__ == "__main__":
+    main()
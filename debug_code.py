@@ -1,51 +1,399 @@
+"""
+Debug code with static analysis (pylint, mypy) plus an LLM review.
+
+Usage:
+    python debug_code.py src/MyProject --output-dir debug_output --concurrency 8
+    python debug_code.py                  # the built-in sample
+
+debug_batch() is the async API: many (filename, code) items, bounded model concurrency,
+per-file results and debug_report.json with per-stage timings. Only .py files are run
+through the static analyzers; other sources (e.g. content_to_code's .tsx) go straight to
+the model.
+
+Static analysis runs each snippet in its own temporary directory, runs pylint and mypy
+concurrently, and analyzes many snippets per tool launch (ANALYSIS_BATCH_SIZE). Results
+are cached on disk by content hash (ANALYSIS_CACHE_DIR, default .analysis_cache;
+ANALYSIS_CACHE=0 disables). MYPY_DAEMON=1 uses a persistent dmypy daemon instead of a
+cold mypy per batch.
+"""
 import subprocess
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
 import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", api_key=os.getenv("GOOGLE_API_KEY"))
+from llm_backend import create_backend
+from artifact_store import open_run, write_json_output, write_output
+import metrics
 
-def run_static_analysis(file_path: str):
-    """Run pylint and mypy on given file and return errors/warnings"""
-    results = {}
+ANALYSIS_CACHE = os.getenv("ANALYSIS_CACHE", "1").strip().lower() in ("1", "true", "yes")
+ANALYSIS_CACHE_DIR = Path(os.getenv("ANALYSIS_CACHE_DIR", ".analysis_cache"))
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", "50"))
+MYPY_DAEMON = os.getenv("MYPY_DAEMON", "0").strip().lower() in ("1", "true", "yes")
+DMYPY_STATUS_FILE = Path(os.getenv("DMYPY_STATUS_FILE", ".dmypy.json")).resolve()
+# The daemon keeps the working directory it was started in, so batches live under a stable one.
+DMYPY_WORK_DIR = Path(os.getenv("DMYPY_WORK_DIR", os.path.join(tempfile.gettempdir(), "debug_code_dmypy")))
+
+DEBUG_OUTPUT_DIR = Path(os.getenv("DEBUG_OUTPUT_DIR", "debug_output"))
+DEBUG_CONCURRENCY = int(os.getenv("DEBUG_CONCURRENCY", "4"))
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "2"))
+
+SOURCE_EXTENSIONS = (".py", ".js", ".jsx", ".ts", ".tsx", ".vue", ".svelte")
+LANGUAGE_BY_EXTENSION = {".py": "Python", ".js": "JavaScript", ".jsx": "React (JSX)", ".ts": "TypeScript",
+                         ".tsx": "React (TSX)", ".vue": "Vue", ".svelte": "Svelte"}
+
+PYLINT_ARGS = ["--disable=all", "--enable=E,F"]
+# Bump when the tool arguments or output post-processing change, so old cache entries are ignored.
+ANALYSIS_VERSION = 2
 
+# Process-wide totals; debug_batch also keeps a per-batch counter for its report.
+ANALYSIS_STATS: Dict[str, int] = {"snippets": 0, "cache_hits": 0, "analyzed": 0, "tool_launches": 0}
+_stats_lock = threading.Lock()
+
+_NO_LIMIT = contextlib.nullcontext()
+
+_llm = None
+_analysis_cache = None
+
+def get_llm():
+    """The LLM backend, created on first use so importing this module stays cheap."""
+    global _llm
+    if _llm is None:
+        _llm = create_backend(model_name=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
+    return _llm
+
+def get_analysis_cache():
+    global _analysis_cache
+    if _analysis_cache is None and ANALYSIS_CACHE:
+        from response_cache import ResponseCache
+        _analysis_cache = ResponseCache(ANALYSIS_CACHE_DIR, max_entries=20000)
+    return _analysis_cache
+
+def _analysis_key(code: str) -> str:
+    material = json.dumps([ANALYSIS_VERSION, PYLINT_ARGS, MYPY_DAEMON, code])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def new_analysis_stats() -> Dict[str, int]:
+    return dict.fromkeys(ANALYSIS_STATS, 0)
+
+def _count(stats: Optional[Dict[str, int]], name: str, n: int = 1):
+    """Add n to ANALYSIS_STATS and to stats (if given); tools run in worker threads, hence the lock."""
+    with _stats_lock:
+        ANALYSIS_STATS[name] += n
+        if stats is not None:
+            stats[name] += n
+
+def _run_tool(cmd: List[str], cwd: str, env: Optional[Dict[str, str]] = None,
+              stats: Optional[Dict[str, int]] = None) -> Tuple[bool, str]:
+    """(launched, stdout); when the tool could not be started the error text is returned instead."""
+    _count(stats, "tool_launches")
     try:
-        pylint_result = subprocess.run(
-            ["pylint", file_path, "--disable=all", "--enable=E,F"],
-            capture_output=True, text=True
-        )
-        results["pylint"] = pylint_result.stdout.strip()
+        return True, subprocess.run(cmd, capture_output=True, text=True, cwd=cwd, env=env).stdout
     except Exception as e:
-        results["pylint"] = str(e)
+        return False, str(e)
 
+def _split_output(output: str, stems: List[str], tmpdir: str) -> Dict[str, str]:
+    """Assign tool output lines to the snippet they mention; lines naming no snippet are dropped."""
+    per_file: Dict[str, List[str]] = {stem: [] for stem in stems}
+    output = output.replace(tmpdir + os.sep, "").replace(os.path.basename(tmpdir) + os.sep, "")
+    for line in output.splitlines():
+        for stem in stems:
+            if line.startswith(f"{stem}.py:") or line == f"************* Module {stem}":
+                per_file[stem].append(line)
+                break
+    return {stem: "\n".join(lines) for stem, lines in per_file.items()}
+
+def _syntax_error(code: str, stem: str) -> Optional[str]:
+    """mypy stops checking every file when one has a syntax error, so those are reported here."""
     try:
-        mypy_result = subprocess.run(
-            ["mypy", file_path],
-            capture_output=True, text=True
-        )
-        results["mypy"] = mypy_result.stdout.strip()
-    except Exception as e:
-        results["mypy"] = str(e)
+        compile(code, f"{stem}.py", "exec")
+    except SyntaxError as e:
+        return f"{stem}.py:{e.lineno}: error: {e.msg}  [syntax]"
+    return None
 
+def _analyze_chunk(codes: Dict[str, str], stats: Optional[Dict[str, int]] = None
+                   ) -> Tuple[Dict[str, Dict[str, str]], bool]:
+    """
+    Run pylint and mypy once each (concurrently) over all snippets. Returns (results keyed
+    by content digest, whether both tools actually ran).
+    """
+    stems = {digest: f"snippet_{digest[:16]}" for digest in codes}
+    work_dir = None
+    if MYPY_DAEMON:
+        DMYPY_WORK_DIR.mkdir(parents=True, exist_ok=True)
+        work_dir = str(DMYPY_WORK_DIR)
+    with tempfile.TemporaryDirectory(prefix="debug_code_", dir=work_dir) as tmpdir:
+        paths = {}
+        for digest, code in codes.items():
+            paths[digest] = os.path.join(tmpdir, f"{stems[digest]}.py")
+            with open(paths[digest], "w", encoding="utf-8") as f:
+                f.write(code)
+        syntax = {digest: _syntax_error(code, stems[digest]) for digest, code in codes.items()}
+        mypy_targets = [paths[d] for d in codes if syntax[d] is None]
+
+        pylint_cmd = ["pylint", *PYLINT_ARGS, *paths.values()]
+        mypy_env = None
+        if MYPY_DAEMON:
+            mypy_cmd = ["dmypy", "--status-file", str(DMYPY_STATUS_FILE), "run", "--", *mypy_targets]
+            # The daemon inherits the first caller's environment; a relative PYTHONPATH makes
+            # it silently skip files on later runs.
+            mypy_env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+        else:
+            mypy_cmd = ["mypy", *mypy_targets]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pylint_future = pool.submit(_run_tool, pylint_cmd, tmpdir, None, stats)
+            mypy_future = pool.submit(_run_tool, mypy_cmd, work_dir or tmpdir, mypy_env, stats) if mypy_targets else None
+            pylint_ok, pylint_out = pylint_future.result()
+            mypy_ok, mypy_out = mypy_future.result() if mypy_future else (True, "")
+
+        stem_list = list(stems.values())
+        # A tool that failed to start reports its launch error for every snippet.
+        pylint_split = _split_output(pylint_out, stem_list, tmpdir) if pylint_ok else dict.fromkeys(stem_list, pylint_out)
+        mypy_split = _split_output(mypy_out, stem_list, tmpdir) if mypy_ok else dict.fromkeys(stem_list, mypy_out)
+        results = {digest: {"pylint": pylint_split[stem], "mypy": syntax[digest] or mypy_split[stem]}
+                   for digest, stem in stems.items()}
+    return results, pylint_ok and mypy_ok
+
+def analyze_snippets(snippets: Dict[str, str], stats: Optional[Dict[str, int]] = None
+                     ) -> Dict[str, Dict[str, str]]:
+    """
+    Static analysis for many snippets ({display_path: code}); returns {display_path:
+    {"pylint": ..., "mypy": ...}}. Cached snippets are skipped, identical snippets are
+    analyzed once, and the rest go through the tools in batches of ANALYSIS_BATCH_SIZE.
+    Counts go to ANALYSIS_STATS and, when given, to stats (see new_analysis_stats).
+    """
+    cache = get_analysis_cache()
+    _count(stats, "snippets", len(snippets))
+    digests = {name: _analysis_key(code) for name, code in snippets.items()}
+    found: Dict[str, Dict[str, str]] = {}
+    todo: Dict[str, str] = {}
+    for name, digest in digests.items():
+        if digest in found or digest in todo:
+            continue
+        hit = cache.get(digest) if cache is not None else None
+        if hit is not None:
+            _count(stats, "cache_hits")
+            found[digest] = json.loads(hit)
+        else:
+            todo[digest] = snippets[name]
+
+    items = list(todo.items())
+    for i in range(0, len(items), max(1, ANALYSIS_BATCH_SIZE)):
+        chunk = dict(items[i:i + ANALYSIS_BATCH_SIZE])
+        chunk_results, complete = _analyze_chunk(chunk, stats)
+        _count(stats, "analyzed", len(chunk_results))
+        for digest, result in chunk_results.items():
+            if cache is not None and complete:
+                cache.put(digest, json.dumps(result))
+            found[digest] = result
+
+    results = {}
+    for name, digest in digests.items():
+        # The temp file's stem depends only on the content, so one cache entry serves every
+        # path with it; only that stem is renamed, never the snippet's own identifiers.
+        stem = Path(name).stem
+        results[name] = {tool: text.replace(f"snippet_{digest[:16]}", stem)
+                         for tool, text in found[digest].items()}
     return results
 
+def run_static_analysis(file_path: str):
+    """Run pylint and mypy on given file and return errors/warnings"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        code = f.read()
+    return analyze_snippets({file_path: code})[file_path]
+
+def build_debug_messages(code: str, analysis: Dict[str, str], language: str = "Python"):
+    # Plain (role, content) messages; no prompt-template import needed.
+    return [
+        ("system", f"You are an expert {language} debugger. Fix errors and suggest improvements."),
+        ("user", f"Here is the code:\n\n{code}\n\n"
+                 f"Here are static analysis results:\n{analysis}\n\n"
+                 "Please debug and suggest corrected code with explanations."),
+    ]
+
 def debug_code(code: str, file_path: str = "temp_code.py"): 
-    """Analyze + Debug code using static tools + Gemini"""
-    with open(file_path, "w") as f:
-        f.write(code)
+    """Analyze + Debug code using static tools + Gemini (file_path only names the snippet)"""
+    run = metrics.RunMetrics("debug_code", file=file_path)
+    with run.timer("analysis"):
+        analysis = analyze_snippets({file_path: code})[file_path]
+    messages = build_debug_messages(code, analysis)
+    run.prompt(messages)
+    try:
+        with run.timer("model"):
+            result = get_llm().invoke(messages)
+    except Exception:
+        run.finish("error")
+        raise
+    run.response(result)
+    run.finish("ok")
+    return result
 
-    analysis = run_static_analysis(file_path)
+def _stage_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    return {"sum_s": round(sum(values), 3), "p50_s": metrics.percentile(values, 50),
+            "p95_s": metrics.percentile(values, 95), "max_s": max(values) if values else None}
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an expert Python debugger. Fix errors and suggest improvements."),
-        ("user", "Here is the code:\n\n{code}\n\n"
-                 "Here are static analysis results:\n{analysis}\n\n"
-                 "Please debug and suggest corrected code with explanations.")
-    ])
+def collect_source_files(paths: List[str], extensions: Tuple[str, ...] = SOURCE_EXTENSIONS) -> List[Tuple[str, str]]:
+    """(display name, code) for every file given, and every matching file under each directory."""
+    items = []
+    for p in paths:
+        path = Path(p)
+        if path.is_dir():
+            files = sorted(f for f in path.rglob("*") if f.is_file() and f.suffix in extensions)
+            items.extend((str(f.relative_to(path.parent)), f.read_text(encoding="utf-8")) for f in files)
+        else:
+            items.append((str(path), path.read_text(encoding="utf-8")))
+    return items
 
-    chain = prompt | llm
-    response = chain.invoke({"code": code, "analysis": str(analysis)})
-    return response.content
+def _result_path(output_dir: Path, name: str) -> Path:
+    """Where the result for `name` goes; absolute and parent parts are dropped so it stays inside output_dir."""
+    parts = [p for p in Path(name).parts if p not in ("..", ".") and p != Path(name).anchor]
+    return output_dir.joinpath(*parts).with_name(f"{parts[-1]}.debug.md")
+
+async def debug_file(name: str, code: str, output_dir: Path, sem: asyncio.Semaphore, llm=None,
+                     analysis_task: Optional["asyncio.Future"] = None, batch: Optional[str] = None,
+                     stats: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Debug one file: static analysis (awaiting analysis_task, the shared batch this file is
+    in, or analyzing it alone, counted in stats), then the model review under `sem`. The
+    review is written to output_dir/<name>.debug.md; returns the file's report entry.
+    """
+    llm = llm or get_llm()
+    entry: Dict[str, Any] = {"file": name, "status": "ok"}
+    if Path(name).suffix == ".py":
+        if analysis_task is None:
+            analysis_task = asyncio.ensure_future(_analyze_timed({name: code}, stats=stats))
+            batch = name
+        analysis, analysis_s = await analysis_task
+        entry.update(analysis=analysis[name], analysis_s=analysis_s, analysis_batch=batch)
+    else:
+        entry.update(analysis={"skipped": "static analysis only runs on Python files"}, analysis_s=0.0)
+    language = LANGUAGE_BY_EXTENSION.get(Path(name).suffix, "software")
+    messages = build_debug_messages(code, entry["analysis"], language)
+    run = metrics.current_run()
+    if run is not None:
+        run.prompt(messages)
+    queued = time.perf_counter()
+    async with sem:
+        entry["queue_s"] = round(time.perf_counter() - queued, 3)
+        llm_started = time.perf_counter()
+        try:
+            result = await llm.ainvoke(messages)
+        except Exception as e:
+            entry.update(status="error", error=str(e))
+            result = None
+        entry["llm_s"] = round(time.perf_counter() - llm_started, 3)
+    if run is not None:
+        run.add_time("queue", entry["queue_s"])
+        run.add_time("model", entry["llm_s"])
+        run.count("files_failed" if result is None else "files_ok")
+        if result is not None:
+            run.response(result)
+    if result is not None:
+        result_path = _result_path(output_dir, name)
+        write_output(result_path, result)
+        entry["result_path"] = str(result_path)
+    return entry
+
+async def _analyze_timed(chunk: Dict[str, str], sem: Optional[asyncio.Semaphore] = None,
+                         stats: Optional[Dict[str, int]] = None):
+    """(analyze_snippets result, seconds), run in a worker thread, optionally under sem."""
+    async with (sem or _NO_LIMIT):
+        started = time.perf_counter()
+        analysis = await asyncio.to_thread(analyze_snippets, chunk, stats)
+        return analysis, round(time.perf_counter() - started, 3)
+
+def write_debug_report(entries: List[Dict[str, Any]], output_dir: Path, wall_s: float, concurrency: int,
+                       llm=None, stats: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Summarize debug_file entries into output_dir/debug_report.json and return the report;
+    stats are the analysis counts of this batch (from new_analysis_stats).
+    """
+    batches = {e["analysis_batch"]: e["analysis_s"] for e in entries if e.get("analysis_batch") is not None}
+    analysis_sum = sum(batches.values())
+    llm_stage = _stage_summary([e["llm_s"] for e in entries])
+    report = {
+        "files": len(entries),
+        "succeeded": sum(1 for e in entries if e["status"] == "ok"),
+        "failed": sum(1 for e in entries if e["status"] != "ok"),
+        "concurrency": concurrency,
+        "wall_s": round(wall_s, 3),
+        "stages": {
+            "analysis": {"batches": len(batches), "sum_s": round(analysis_sum, 3), "stats": dict(stats) if stats is not None else None},
+            "llm": llm_stage,
+            "queue": _stage_summary([e["queue_s"] for e in entries]),
+        },
+        # Compare each stage's busy time divided by how many of its jobs run at once.
+        "bottleneck": "analysis" if analysis_sum / max(1, ANALYSIS_CONCURRENCY) >
+                                    (llm_stage["sum_s"] or 0) / max(1, concurrency) else "llm",
+        "llm_cache": llm.cache_stats() if llm is not None else None,
+        "results": entries,
+    }
+    write_json_output(output_dir / "debug_report.json", report)
+    return report
+
+async def debug_batch(items: List[Tuple[str, str]], output_dir: Path = DEBUG_OUTPUT_DIR,
+                      concurrency: int = DEBUG_CONCURRENCY, llm=None,
+                      done: Optional[List[Dict[str, Any]]] = None,
+                      on_entry: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Debug many (filename, code) items. Python files are statically analyzed in batches
+    (in a worker thread, see analyze_snippets); each file's LLM review starts as soon as
+    its batch is analyzed, with at most `concurrency` model calls in flight. Every result
+    is written to output_dir/<filename>.debug.md and a summary with per-file and
+    per-stage timings to output_dir/debug_report.json, which is also returned.
+    on_entry(entry) is called as each file finishes; entries of an interrupted earlier
+    run passed as `done` are included in the report (callers leave those files out of items).
+    """
+    llm = llm or get_llm()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    analysis_sem = asyncio.Semaphore(max(1, ANALYSIS_CONCURRENCY))
+    started = time.perf_counter()
+    run = metrics.RunMetrics("debug_batch", files=len(items), concurrency=concurrency)
+    stats = new_analysis_stats()
+    artifacts = open_run("debug_batch", run_id=run.run_id, base_dir=output_dir, files=len(items))
+
+    python_items = [(name, code) for name, code in items if Path(name).suffix == ".py"]
+    chunk_tasks: Dict[str, Tuple["asyncio.Future", str]] = {}
+    for i in range(0, len(python_items), max(1, ANALYSIS_BATCH_SIZE)):
+        chunk = dict(python_items[i:i + ANALYSIS_BATCH_SIZE])
+        task = asyncio.ensure_future(_analyze_timed(chunk, analysis_sem, stats))
+        for name in chunk:
+            chunk_tasks[name] = (task, f"batch{i // max(1, ANALYSIS_BATCH_SIZE)}")
+
+    async def one(name: str, code: str) -> Dict[str, Any]:
+        entry = await debug_file(name, code, output_dir, sem, llm, *chunk_tasks.get(name, (None, None)),
+                                 stats=stats)
+        if on_entry is not None:
+            on_entry(entry)
+        return entry
+
+    try:
+        entries = await asyncio.gather(*(one(name, code) for name, code in items))
+    except BaseException:
+        run.finish("error")
+        if artifacts is not None:
+            artifacts.close("error")
+        raise
+    report = write_debug_report(list(done or []) + list(entries), output_dir, time.perf_counter() - started,
+                                concurrency, llm, stats)
+    for batch_s in {e["analysis_batch"]: e["analysis_s"] for e in entries if e.get("analysis_batch")}.values():
+        run.add_time("analysis", batch_s)
+    status = "ok" if not report["failed"] else "partial"
+    run.finish(status, analysis=dict(stats))
+    if artifacts is not None:
+        artifacts.close(status)
+    return report
 
 
 buggy_code = """
@@ -54,7 +402,25 @@ public static void main(String[] args) {
 }
 """
 
-result = debug_code(buggy_code)
-print(result)
-with open("debugged_code.txt", "w") as f:
-    f.write(result)
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Debug source files with static analysis and an LLM review.")
+    parser.add_argument("paths", nargs="*", help="files or directories, e.g. a src/<Project> folder "
+                                                 "(default: the built-in sample)")
+    parser.add_argument("--output-dir", default=str(DEBUG_OUTPUT_DIR))
+    parser.add_argument("--concurrency", type=int, default=DEBUG_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    items = collect_source_files(args.paths) if args.paths else [("sample/buggy_code.py", buggy_code)]
+    if not items:
+        parser.error("no source files found")
+    report = asyncio.run(debug_batch(items, Path(args.output_dir), args.concurrency))
+    stages = report["stages"]
+    print(f"Debugged {report['succeeded']}/{report['files']} files in {report['wall_s']}s "
+          f"(analysis {stages['analysis']['sum_s']}s in {stages['analysis']['batches']} batches, "
+          f"llm p50={stages['llm']['p50_s']}s p95={stages['llm']['p95_s']}s; bottleneck: {report['bottleneck']})")
+    print(f"Report: {Path(args.output_dir) / 'debug_report.json'}")
+    if report["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
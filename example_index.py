@@ -0,0 +1,310 @@
+"""
+Local retrieval index of validated ui_specs, used to pick few-shot examples.
+
+Each validated output is stored with a fingerprint of the inputs it was generated from:
+the top-level keys of both inputs plus the words of their features and data_models.
+Fingerprints are hashed word unigrams and bigrams. At prompt time they are weighted by
+TF-IDF over the whole index and compared by cosine similarity, so no embedding service
+or extra dependency is involved. Examples are stored condensed (lists cut to their first
+items, long strings clipped) so they don't crowd out the job's own inputs.
+
+Settings:
+    EXAMPLE_INDEX           "0" disables lookups and additions (default "1")
+    EXAMPLE_INDEX_PATH      JSON lines file (default .example_index/index.jsonl)
+    EXAMPLE_TOP_K           examples per prompt (default 2; examples_block uses at most 3)
+    EXAMPLE_MIN_SIMILARITY  past projects less similar than this are never used (default 0.15)
+    EXAMPLE_MAX_CHARS       size limit of one condensed example (default 6000)
+
+Usage:
+    python example_index.py add --system sys.json --requirements req.json --spec ui_output/generated_ui_spec.json
+    python example_index.py query --system sys.json --requirements req.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("example-index")
+
+EXAMPLE_INDEX_ENABLED = os.getenv("EXAMPLE_INDEX", "1").strip().lower() in ("1", "true", "yes")
+EXAMPLE_INDEX_PATH = Path(os.getenv("EXAMPLE_INDEX_PATH", ".example_index/index.jsonl"))
+EXAMPLE_TOP_K = int(os.getenv("EXAMPLE_TOP_K", "2"))
+EXAMPLE_MIN_SIMILARITY = float(os.getenv("EXAMPLE_MIN_SIMILARITY", "0.15"))
+EXAMPLE_MAX_CHARS = int(os.getenv("EXAMPLE_MAX_CHARS", "6000"))
+
+HASH_BUCKETS = 1 << 20
+# Input sections compared; each gets its own term namespace so e.g. a feature called
+# "orders" and a data model called "orders" count separately.
+FINGERPRINT_SECTIONS = {"features": "f", "data_models": "d", "database_schema": "d"}
+SECTION_DEPTH = 3
+_WORD_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def _words(text: str) -> List[str]:
+    out, cur = [], []
+    for ch in text.lower():
+        if ch in _WORD_CHARS:
+            cur.append(ch)
+        elif cur:
+            out.append("".join(cur))
+            cur = []
+    if cur:
+        out.append("".join(cur))
+    return [w for w in out if len(w) > 1]
+
+
+def _strings(node: Any, limit: int = 2000) -> List[str]:
+    """Keys and string values of node, depth first, up to limit characters."""
+    out: List[str] = []
+    size = 0
+    stack = [node]
+    while stack and size < limit:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            for k, v in reversed(list(cur.items())):
+                stack.append(v)
+                stack.append(str(k))
+        elif isinstance(cur, list):
+            stack.extend(reversed(cur))
+        elif isinstance(cur, str):
+            out.append(cur)
+            size += len(cur)
+    return out
+
+
+def _roots(doc: Any) -> List[Dict[str, Any]]:
+    """The object itself and a wrapping "output" object, where the agents put their results."""
+    if not isinstance(doc, dict):
+        return []
+    return [doc] + ([doc["output"]] if isinstance(doc.get("output"), dict) else [])
+
+
+def find_sections(doc: Any, key: str) -> List[Any]:
+    """Values of `key` in the input's objects up to SECTION_DEPTH levels down."""
+    found, level = [], [doc]
+    for _ in range(SECTION_DEPTH):
+        nxt = []
+        for node in level:
+            if isinstance(node, dict):
+                if key in node:
+                    found.append(node[key])
+                nxt.extend(v for k, v in node.items() if k != key and isinstance(v, dict))
+        level = nxt
+    return found
+
+
+def fingerprint(system_json: Any, req_json: Any) -> Dict[str, int]:
+    """Hashed term counts of the inputs' top-level keys and feature / data model words."""
+    terms: Dict[str, int] = {}
+
+    def add(term: str):
+        bucket = str(zlib.crc32(term.encode("utf-8")) % HASH_BUCKETS)
+        terms[bucket] = terms.get(bucket, 0) + 1
+
+    for doc in (system_json, req_json):
+        for root in _roots(doc):
+            for key in root:
+                add(f"k:{key}")
+        for section, ns in FINGERPRINT_SECTIONS.items():
+            for value in find_sections(doc, section):
+                for text in _strings(value):
+                    words = _words(text)
+                    for w in words:
+                        add(f"{ns}:{w}")
+                    for a, b in zip(words, words[1:]):
+                        add(f"{ns}:{a} {b}")
+    return terms
+
+
+def condense(node: Any, max_items: int, max_str: int) -> Any:
+    """node with every list cut to max_items entries and strings to max_str characters."""
+    if isinstance(node, dict):
+        return {k: condense(v, max_items, max_str) for k, v in node.items()}
+    if isinstance(node, list):
+        return [condense(v, max_items, max_str) for v in node[:max_items]]
+    if isinstance(node, str) and len(node) > max_str:
+        return node[:max_str] + "..."
+    return node
+
+
+def make_example(system_json: Any, req_json: Any, ui_spec: Dict[str, Any],
+                 max_chars: int = EXAMPLE_MAX_CHARS) -> Optional[Dict[str, Any]]:
+    """A condensed {"input", "output"} few-shot example, or None if it can't get under max_chars."""
+    summary = {
+        "top_level_keys": sorted({k for doc in (system_json, req_json) for root in _roots(doc) for k in root}),
+        "features": find_sections(req_json, "features") + find_sections(system_json, "features"),
+        "data_models": find_sections(req_json, "data_models") + find_sections(system_json, "data_models"),
+    }
+    for max_items, max_str in ((3, 300), (2, 160), (1, 80)):
+        example = {"input": condense(summary, max_items, max_str),
+                   "output": {"ui_spec": condense(ui_spec, max_items, max_str)}}
+        if len(json.dumps(example, ensure_ascii=False)) <= max_chars:
+            return example
+    return None
+
+
+def _weights(terms: Dict[str, int], idf: Dict[str, float]) -> Tuple[Dict[str, float], float]:
+    vec = {t: (1 + math.log(n)) * idf[t] for t, n in terms.items()}
+    return vec, math.sqrt(sum(w * w for w in vec.values()))
+
+
+def _example_id(terms: Dict[str, int]) -> str:
+    """Records are keyed on their inputs' fingerprint, so the same inputs map to the same id."""
+    return hashlib.sha256(json.dumps(terms, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class ExampleIndex:
+    """Validated examples in a JSON lines file; reloaded when the file changes."""
+
+    def __init__(self, path: Path = EXAMPLE_INDEX_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[float, int]] = None
+        self._records: Dict[str, Dict[str, Any]] = {}
+
+    def records(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if self._stamp != (st.st_mtime, st.st_size):
+                records = {}
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A half-written last line from an interrupted run.
+                            continue
+                        records[rec["id"]] = rec
+                self._records, self._stamp = records, (st.st_mtime, st.st_size)
+            return self._records
+
+    def add(self, system_json: Any, req_json: Any, ui_spec: Dict[str, Any], source: Optional[Dict[str, str]] = None
+            ) -> Optional[str]:
+        """Store a validated ui_spec; returns its id (None if it could not be condensed enough)."""
+        terms = fingerprint(system_json, req_json)
+        example = make_example(system_json, req_json, ui_spec)
+        if example is None:
+            logger.info("Not indexing ui_spec: no condensed example fits in %d chars", EXAMPLE_MAX_CHARS)
+            return None
+        spec_hash = hashlib.sha256(json.dumps(ui_spec, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        example_id = _example_id(terms)
+        if self.records().get(example_id, {}).get("spec_sha256") == spec_hash:
+            return example_id
+        record = {"id": example_id, "added": time.time(), "source": source or {}, "spec_sha256": spec_hash,
+                  "terms": terms, **example}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        logger.info("Indexed example %s (%d terms) in %s", example_id, len(terms), self.path)
+        return example_id
+
+    def search(self, system_json: Any, req_json: Any, k: int = EXAMPLE_TOP_K,
+               min_similarity: float = EXAMPLE_MIN_SIMILARITY) -> List[Dict[str, Any]]:
+        """
+        Up to k stored examples most similar to these inputs, best first, each with its
+        "similarity". The record for these very inputs (an earlier run of the same job) is
+        left out: it would only echo that run's output back.
+        """
+        query = fingerprint(system_json, req_json)
+        own_id = _example_id(query)
+        records = [r for r in self.records().values() if r["id"] != own_id]
+        if not records or k <= 0:
+            return []
+        df: Dict[str, int] = {}
+        for terms in [query] + [r["terms"] for r in records]:
+            for t in terms:
+                df[t] = df.get(t, 0) + 1
+        n = len(records) + 1
+        idf = {t: math.log((1 + n) / (1 + c)) + 1 for t, c in df.items()}
+        qvec, qnorm = _weights(query, idf)
+        if not qnorm:
+            return []
+        scored = []
+        for rec in records:
+            vec, norm = _weights(rec["terms"], idf)
+            if norm:
+                sim = sum(w * vec.get(t, 0.0) for t, w in qvec.items()) / (qnorm * norm)
+                if sim >= min_similarity:
+                    scored.append((sim, rec))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [{"id": rec["id"], "similarity": round(sim, 4), "input": rec["input"], "output": rec["output"]}
+                for sim, rec in scored[:k]]
+
+
+_default_index: Optional[ExampleIndex] = None
+
+
+def default_index() -> ExampleIndex:
+    global _default_index
+    if _default_index is None or _default_index.path != EXAMPLE_INDEX_PATH:
+        _default_index = ExampleIndex(EXAMPLE_INDEX_PATH)
+    return _default_index
+
+
+def find_examples(system_json: Any, req_json: Any, k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Few-shot examples for a job from the default index ([] when disabled, empty or unreadable)."""
+    if not EXAMPLE_INDEX_ENABLED:
+        return []
+    try:
+        return default_index().search(system_json, req_json, EXAMPLE_TOP_K if k is None else k)
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning("Example index lookup failed: %s", e)
+        return []
+
+
+def record_example(system_json: Any, req_json: Any, ui_spec: Dict[str, Any],
+                   source: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Add a validated ui_spec to the default index; failures are logged, never raised."""
+    if not EXAMPLE_INDEX_ENABLED:
+        return None
+    try:
+        return default_index().add(system_json, req_json, ui_spec, source)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning("Could not add example to %s: %s", EXAMPLE_INDEX_PATH, e)
+        return None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Manage the few-shot example index of validated ui_specs.")
+    parser.add_argument("command", choices=["add", "query"])
+    parser.add_argument("--system", required=True, help="system design JSON")
+    parser.add_argument("--requirements", required=True, help="requirements JSON")
+    parser.add_argument("--spec", help="validated generated_ui_spec.json (add)")
+    parser.add_argument("-k", type=int, default=EXAMPLE_TOP_K)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from content_writer01 import read_input_json, validate_ui_spec
+    system_json, req_json = read_input_json(args.system), read_input_json(args.requirements)
+    index = default_index()
+    if args.command == "add":
+        if not args.spec:
+            parser.error("add needs --spec")
+        with open(args.spec, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        ui_spec = spec.get("ui_spec", spec)
+        errors = validate_ui_spec(ui_spec)
+        if errors:
+            print(f"Not adding {args.spec}: it does not validate ({errors})")
+            sys.exit(1)
+        example_id = index.add(system_json, req_json, ui_spec,
+                               {"system": args.system, "requirements": args.requirements, "spec": args.spec})
+        print(example_id or "not indexed (too large to condense)")
+        sys.exit(0 if example_id else 1)
+    for ex in index.search(system_json, req_json, args.k, min_similarity=0.0):
+        print(f"{ex['id']}  similarity={ex['similarity']:.3f}  project={ex['output']['ui_spec'].get('project')!r:.80}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Incremental JSON structure checker for streamed model output.
+
+IncrementalJSONParser is fed text chunks as they arrive and raises JSONStreamError as soon
+as the output can no longer become a valid JSON object (unbalanced or mismatched brackets,
+prose in the middle of the structure, bad literals). It does not build the object; the
+finished text is still parsed by extract_json_from_text.
+
+Like extract_json_from_text it tolerates a short preamble before the first "{" (e.g. a
+```json fence), trailing commas and anything after the top-level object closes.
+
+load_selected reads a large JSON file in chunks and builds only the members a caller asks
+for, so inputs of hundreds of MB can be used without materializing them whole.
+"""
+import re
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_WS = " \t\r\n"
+_SCALAR_CHARS = set("0123456789+-.eEtruefalsn")
+_NUMBER_RE = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_LITERALS = ("true", "false", "null")
+# Strings (group 1 is None when the string is cut off at the end of the buffer) and the
+# structural characters; _SKIP_RE leaves out ":" and "," for scanning over whole values.
+_EVENT_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(")?|[{}\[\]:,]')
+_SKIP_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(")?|[{}\[\]]')
+_SPACE_RE = re.compile(r"\s*")
+
+
+class JSONStreamError(ValueError):
+    """The streamed text can no longer become a valid JSON object."""
+
+    def __init__(self, message: str, position: int):
+        super().__init__(f"{message} at char {position}")
+        self.position = position
+
+
+class IncrementalJSONParser:
+    def __init__(self, max_preamble: int = 4096):
+        self.max_preamble = max_preamble
+        self.stack: List[str] = []
+        self.expect = "preamble"
+        self.position = 0
+        self.values_completed = 0
+        self.started = False
+        self.complete = False
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._scalar = ""
+
+    @property
+    def depth(self) -> int:
+        return len(self.stack)
+
+    def feed(self, chunk: str):
+        for ch in chunk:
+            self._step(ch)
+            self.position += 1
+
+    def _error(self, message: str):
+        raise JSONStreamError(message, self.position)
+
+    def _end_value(self):
+        self.values_completed += 1
+        if not self.stack:
+            self.complete = True
+            self.expect = "done"
+        else:
+            self.expect = "comma"
+
+    def _finish_scalar(self):
+        s, self._scalar = self._scalar, ""
+        if s in _LITERALS or _NUMBER_RE.fullmatch(s):
+            self._end_value()
+        else:
+            self._error(f"invalid literal {s[:20]!r}")
+
+    def _step(self, ch: str):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    self.expect = "colon"
+                else:
+                    self._end_value()
+            return
+
+        if self._scalar:
+            if ch in _SCALAR_CHARS:
+                self._scalar += ch
+                if self._scalar[0] in "tfn" and not any(lit.startswith(self._scalar) for lit in _LITERALS):
+                    self._error(f"invalid literal {self._scalar[:20]!r}")
+                return
+            self._finish_scalar()
+
+        expect = self.expect
+        if expect == "done":
+            return
+        if expect == "preamble":
+            if ch == "{":
+                self.started = True
+                self.stack.append("{")
+                self.expect = "key"
+            elif self.position >= self.max_preamble:
+                self._error("no JSON object start")
+            return
+        if ch in _WS:
+            return
+
+        if expect == "key":
+            if ch == '"':
+                self._in_string, self._string_is_key = True, True
+            elif ch == "}":
+                self._close(ch)
+            else:
+                self._error(f"expected object key, got {ch!r}")
+        elif expect == "colon":
+            if ch != ":":
+                self._error(f"expected ':', got {ch!r}")
+            self.expect = "value"
+        elif expect == "value":
+            if ch == '"':
+                self._in_string, self._string_is_key = True, False
+            elif ch == "{":
+                self.stack.append("{")
+                self.expect = "key"
+            elif ch == "[":
+                self.stack.append("[")
+                self.expect = "value"
+            elif ch == "]" and self.stack[-1] == "[":
+                self._close(ch)
+            elif ch in "-0123456789tfn":
+                self._scalar = ch
+            else:
+                self._error(f"expected value, got {ch!r}")
+        elif expect == "comma":
+            if ch == ",":
+                self.expect = "key" if self.stack[-1] == "{" else "value"
+            elif ch in "}]":
+                self._close(ch)
+            else:
+                self._error(f"expected ',' or closing bracket, got {ch!r}")
+
+    def _close(self, ch: str):
+        opener = "{" if ch == "}" else "["
+        if not self.stack or self.stack[-1] != opener:
+            self._error(f"mismatched {ch!r}")
+        self.stack.pop()
+        self._end_value()
+
+    def finish(self):
+        """Call at end of stream; raises JSONStreamError if the object never closed."""
+        if self._scalar:
+            self._finish_scalar()
+        if not self.started:
+            self._error("no JSON object in output")
+        if not self.complete:
+            self._error(f"truncated output (depth {self.depth})")
+
+
+class _ChunkBuffer:
+    """A window over a text file; consumed text is dropped unless a value is being captured."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.offset = 0
+        self.mark: Optional[int] = None
+        self.parts: List[str] = []
+
+    def fill(self) -> bool:
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            return False
+        if self.mark is not None:
+            self.parts.append(self.text[self.mark:self.pos])
+            self.mark = 0
+        self.offset += self.pos
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it ("" at end of file)."""
+        while True:
+            self.pos = _SPACE_RE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def next(self, pattern=_EVENT_RE):
+        while True:
+            m = pattern.search(self.text, self.pos)
+            if m is None:
+                self.pos = len(self.text)
+            elif m.group(0)[0] == '"' and m.group(1) is None:
+                self.pos = m.start()
+            else:
+                self.pos = m.end()
+                return m
+            if not self.fill():
+                raise JSONStreamError("unexpected end of JSON", self.offset + self.pos)
+
+    def capture(self):
+        self.mark = self.pos
+        self.parts = []
+
+    def take(self, end: int) -> str:
+        text = "".join(self.parts) + self.text[self.mark:end]
+        self.mark, self.parts = None, []
+        return text
+
+
+def _read_value(buf: _ChunkBuffer, first: str, keep: bool) -> Optional[str]:
+    """Consume the value starting at buf.pos; its raw text if keep."""
+    if keep:
+        buf.capture()
+    if first in "{[":
+        depth = 0
+        while True:
+            tok = buf.next(_SKIP_RE).group(0)
+            if tok in "{[":
+                depth += 1
+            elif tok in "}]":
+                depth -= 1
+                if depth == 0:
+                    break
+        end = buf.pos
+    elif first == '"':
+        buf.next()
+        end = buf.pos
+    else:
+        # Numbers and literals end at the next "," or "}" of the enclosing object.
+        m = buf.next()
+        if m.group(0) not in ",}":
+            raise JSONStreamError(f"unexpected {m.group(0)[:20]!r} after value", buf.offset + m.start())
+        end = buf.pos = m.start()
+    return buf.take(end) if keep else None
+
+
+def load_selected(path, select: Callable[[Tuple[str, ...], str], bool], max_depth: int = 3,
+                  chunk_size: int = 1 << 20) -> Any:
+    """
+    Load a JSON object file, keeping only the members select(key_path, kind) accepts (kind is
+    "object", "array" or "scalar"). Rejected objects less than max_depth keys deep are
+    descended into and kept only if something inside them is; everything else is skipped
+    without being parsed, so memory stays at the kept parts plus about one chunk.
+    A file whose top level is not an object is loaded whole.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        buf = _ChunkBuffer(f, chunk_size)
+        if buf.peek() != "{":
+            f.seek(0)
+            return json.load(f)
+        buf.next()
+        root: Dict[str, Any] = {}
+        stack: List[Tuple[Dict[str, Any], Tuple[str, ...]]] = [(root, ())]
+        key = None
+        while stack:
+            m = buf.next()
+            tok = m.group(0)
+            obj, obj_path = stack[-1]
+            if tok == "}":
+                stack.pop()
+                if stack and not obj:
+                    del stack[-1][0][obj_path[-1]]
+            elif tok[0] == '"':
+                key = json.loads(tok)
+            elif tok == ":":
+                first = buf.peek()
+                kind = "object" if first == "{" else "array" if first == "[" else "scalar"
+                member = obj_path + (key,)
+                keep = select(member, kind)
+                if not keep and kind == "object" and len(member) < max_depth:
+                    buf.next()
+                    obj[key] = {}
+                    stack.append((obj[key], member))
+                    continue
+                raw = _read_value(buf, first, keep)
+                if keep:
+                    obj[key] = json.loads(raw)
+            elif tok != ",":
+                raise JSONStreamError(f"unexpected {tok!r} in object", buf.offset + m.start())
+    return root
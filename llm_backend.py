@@ -0,0 +1,424 @@
+"""
+Pluggable LLM backends shared by content_writer01, content_to_code and debug_code.
+
+Every backend exposes invoke(prompt) / ainvoke(prompt) returning the response text, so
+callers never deal with provider response objects. Select one with LLM_BACKEND:
+
+    gemini  (default) ChatGoogleGenerativeAI, needs GOOGLE_API_KEY
+    stub    deterministic local replay of recorded responses, no network
+
+Stub settings:
+    STUB_RESPONSES       files/directories of recorded responses, separated by os.pathsep
+                         (default ui_output/generated_ui_spec_raw.txt). A .jsonl file holds
+                         {"prompt_sha256": ..., "response": ...} records replayed by prompt hash.
+    STUB_LATENCY         artificial latency per call in seconds (default 0)
+    STUB_LATENCY_JITTER  uniform +/- jitter added to the latency in seconds (default 0)
+    STUB_FAILURE_RATE    probability in [0, 1] that a call raises StubFailure (default 0)
+    STUB_SEED            RNG seed so latency/failure sequences are reproducible (default 0)
+    STUB_CHUNK_SIZE      characters per chunk when streaming (default 64)
+
+GEMINI_CONTEXT_CACHE=1 lets the gemini backend upload a registered static prompt prefix
+once as a cached context (GEMINI_CONTEXT_CACHE_TTL seconds, default 3600) and send only
+the variable suffix afterwards. It is best-effort: if the SDK is missing or the prefix is
+below the provider's minimum cacheable size, full prompts are sent as before.
+
+Calls are rate limited, retried and circuit-broken by a process-wide governor, see
+llm_governor. LLM_RECORD_PATH wraps any backend and appends every prompt/response pair to
+a .jsonl file that the stub backend can replay later. Responses are cached on disk by
+default, see response_cache.
+
+Provider SDKs (langchain_google_genai, google.generativeai) are imported on the first real
+model call, so startup, stub runs and cache hits never pay for them.
+"""
+import os
+import copy
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger("llm-backend")
+
+DEFAULT_STUB_RESPONSES = "ui_output/generated_ui_spec_raw.txt"
+
+
+class BackendError(RuntimeError):
+    """Base error raised by LLM backends."""
+
+
+class StubFailure(BackendError):
+    """Injected failure from the stub backend."""
+
+
+def prompt_text(prompt: Any) -> str:
+    """Flatten a prompt (string or list of chat messages) to plain text."""
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, (list, tuple)):
+        parts = []
+        for m in prompt:
+            if isinstance(m, (list, tuple)) and len(m) == 2:
+                parts.append(f"{m[0]}: {m[1]}")
+            else:
+                parts.append(f"{getattr(m, 'type', 'message')}: {getattr(m, 'content', m)}")
+        return "\n".join(parts)
+    return str(prompt)
+
+
+class KeyedPrompt(str):
+    """
+    A prompt string whose response-cache key is computed from key_text instead of the
+    full text, for optional context (e.g. few-shot examples) that should not split the cache.
+    """
+
+    key_text: str
+
+    def __new__(cls, text: str, key_text: str):
+        obj = super().__new__(cls, text)
+        obj.key_text = key_text
+        return obj
+
+
+def cache_text(prompt: Any) -> str:
+    """The text a response cache keys on: key_text for a KeyedPrompt, otherwise the prompt itself."""
+    return prompt.key_text if isinstance(prompt, KeyedPrompt) else prompt_text(prompt)
+
+
+def prompt_sha256(prompt: Any) -> str:
+    return hashlib.sha256(prompt_text(prompt).encode("utf-8")).hexdigest()
+
+
+def response_text(resp: Any) -> str:
+    content = getattr(resp, "content", None)
+    if isinstance(content, list):
+        content = "".join(c if isinstance(c, str) else str(c.get("text", "")) for c in content)
+    return content or (resp if isinstance(resp, str) else str(resp))
+
+
+class LLMBackend:
+    """Minimal interface: invoke/ainvoke take a prompt and return the response text."""
+
+    name = "base"
+
+    def __init__(self, model_name: str = "", temperature: Optional[float] = None):
+        self.model_name = model_name
+        self.temperature = temperature
+
+    def invoke(self, prompt: Any) -> str:
+        raise NotImplementedError
+
+    async def ainvoke(self, prompt: Any) -> str:
+        return await asyncio.to_thread(self.invoke, prompt)
+
+    async def astream(self, prompt: Any) -> AsyncIterator[str]:
+        """Yield the response text in chunks; backends without streaming yield it whole."""
+        yield await self.ainvoke(prompt)
+
+    def invalidate(self, prompt: Any):
+        """Forget any stored response for prompt (no-op unless the backend caches)."""
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return None
+
+    def register_prefix(self, prefix: str) -> bool:
+        """
+        Declare a static prompt prefix that many prompts will start with. Backends that
+        can cache it server-side return True; the default is a no-op returning False.
+        """
+        return False
+
+    def with_temperature(self, temperature: Optional[float]) -> "LLMBackend":
+        """
+        This backend sampling at `temperature`: itself when unchanged, otherwise a shallow
+        copy (wrappers re-target their inner backend too) that shares caches and governors.
+        """
+        if temperature == self.temperature:
+            return self
+        clone = copy.copy(self)
+        clone.temperature = temperature
+        inner = getattr(self, "inner", None)
+        if isinstance(inner, LLMBackend):
+            clone.inner = inner.with_temperature(temperature)
+        return clone
+
+
+def _chat_model_class():
+    try:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+    except Exception as e:
+        raise BackendError(f"langchain_google_genai is not available ({e}); use LLM_BACKEND=stub for offline runs")
+    return ChatGoogleGenerativeAI
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str, temperature: Optional[float] = None, api_key: Optional[str] = None,
+                 max_retries: Optional[int] = None):
+        super().__init__(model_name, temperature)
+        # The SDK is imported (and a missing install reported) on the first uncached call.
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        kwargs: Dict[str, Any] = {"model": model_name, "google_api_key": self.api_key}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_retries is not None:
+            kwargs["max_retries"] = max_retries
+        self._client_kwargs = kwargs
+        self._client = None
+        self.context_cache = os.getenv("GEMINI_CONTEXT_CACHE", "0").strip().lower() in ("1", "true", "yes")
+        self.context_cache_ttl = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+        self._prefix_clients: Dict[str, Any] = {}
+        self._prefix_lock = threading.Lock()
+        self.prefix_hits = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _chat_model_class()(**self._client_kwargs)
+        return self._client
+
+    def register_prefix(self, prefix: str) -> bool:
+        if not self.context_cache or not prefix:
+            return False
+        with self._prefix_lock:
+            if prefix in self._prefix_clients:
+                return True
+            try:
+                import datetime
+                import google.generativeai as genai
+                from google.generativeai import caching as genai_caching
+                genai.configure(api_key=self.api_key)
+                cached = genai_caching.CachedContent.create(
+                    model=f"models/{self.model_name}",
+                    contents=[prefix],
+                    ttl=datetime.timedelta(seconds=self.context_cache_ttl),
+                )
+                client = _chat_model_class()(**self._client_kwargs, cached_content=cached.name)
+            except Exception as e:
+                # Typically a prefix below the minimum cacheable token count; don't retry per job.
+                logger.warning("Context caching unavailable, sending full prompts: %s", e)
+                self.context_cache = False
+                return False
+            self._prefix_clients[prefix] = client
+            logger.info("Registered cached context %s for a %d-char prompt prefix", cached.name, len(prefix))
+            return True
+
+    def with_temperature(self, temperature: Optional[float]) -> "LLMBackend":
+        if temperature == self.temperature:
+            return self
+        clone = super().with_temperature(temperature)
+        clone._client_kwargs = dict(self._client_kwargs, temperature=temperature)
+        if temperature is None:
+            del clone._client_kwargs["temperature"]
+        clone._client = None
+        clone._prefix_clients = {}
+        clone._prefix_lock = threading.Lock()
+        return clone
+
+    def _route(self, prompt: Any):
+        """(client, prompt) to send: the cached-context client and the suffix when the prefix matches."""
+        if isinstance(prompt, str):
+            for prefix, client in self._prefix_clients.items():
+                if prompt.startswith(prefix):
+                    self.prefix_hits += 1
+                    return client, prompt[len(prefix):]
+        return self.client, prompt
+
+    def invoke(self, prompt: Any) -> str:
+        client, prompt = self._route(prompt)
+        return response_text(client.invoke(prompt))
+
+    async def ainvoke(self, prompt: Any) -> str:
+        client, prompt = self._route(prompt)
+        try:
+            resp = await client.ainvoke(prompt)
+        except AttributeError:
+            resp = client.invoke(prompt)
+        return response_text(resp)
+
+    async def astream(self, prompt: Any) -> AsyncIterator[str]:
+        client, prompt = self._route(prompt)
+        async for chunk in client.astream(prompt):
+            text = response_text(chunk)
+            if text:
+                yield text
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline backend. Prompts whose hash appears in a .jsonl recording get
+    that response; everything else cycles through the plain recorded responses in order.
+    """
+
+    name = "stub"
+
+    def __init__(self, responses: Optional[List[str]] = None, replay: Optional[Dict[str, str]] = None,
+                 latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0,
+                 chunk_size: int = 64, model_name: str = "stub", temperature: Optional[float] = None):
+        super().__init__(model_name, temperature)
+        self.responses = list(responses or [])
+        self.replay = dict(replay or {})
+        if not self.responses and not self.replay:
+            raise BackendError("StubBackend needs at least one recorded response")
+        self.latency = max(0.0, latency)
+        self.jitter = max(0.0, jitter)
+        self.failure_rate = min(1.0, max(0.0, failure_rate))
+        self.chunk_size = max(1, chunk_size)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next = 0
+        self.calls = 0
+        self.failures = 0
+        self.prefixes: List[str] = []
+
+    @classmethod
+    def from_paths(cls, paths: List[str], **kwargs) -> "StubBackend":
+        responses: List[str] = []
+        replay: Dict[str, str] = {}
+        for p in paths:
+            path = Path(p)
+            files = sorted(f for f in path.iterdir() if f.is_file()) if path.is_dir() else [path]
+            for f in files:
+                if f.suffix == ".jsonl":
+                    with open(f, "r", encoding="utf-8") as fh:
+                        for line in fh:
+                            if line.strip():
+                                rec = json.loads(line)
+                                replay[rec["prompt_sha256"]] = rec["response"]
+                else:
+                    responses.append(f.read_text(encoding="utf-8"))
+        return cls(responses, replay, **kwargs)
+
+    def register_prefix(self, prefix: str) -> bool:
+        """Remember the prefix (for inspection); the stub has nothing to cache server-side."""
+        with self._lock:
+            if prefix not in self.prefixes:
+                self.prefixes.append(prefix)
+        return False
+
+    def _plan_call(self, prompt: Any):
+        """Pick the response, delay and failure outcome for one call (thread-safe)."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+            text = self.replay.get(prompt_sha256(prompt)) if self.replay else None
+            if text is None and self.responses:
+                text = self.responses[self._next % len(self.responses)]
+                self._next += 1
+        if text is None:
+            raise BackendError("No recorded response for prompt")
+        return text, max(0.0, delay), fail
+
+    def invoke(self, prompt: Any) -> str:
+        text, delay, fail = self._plan_call(prompt)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise StubFailure("injected stub failure")
+        return text
+
+    async def ainvoke(self, prompt: Any) -> str:
+        text, delay, fail = self._plan_call(prompt)
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            raise StubFailure("injected stub failure")
+        return text
+
+    async def astream(self, prompt: Any) -> AsyncIterator[str]:
+        """Latency applies before the first chunk; chunks of chunk_size follow back to back."""
+        text, delay, fail = self._plan_call(prompt)
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            raise StubFailure("injected stub failure")
+        for i in range(0, len(text), self.chunk_size):
+            yield text[i:i + self.chunk_size]
+            await asyncio.sleep(0)
+
+
+class RecordingBackend(LLMBackend):
+    """Wraps a backend and appends prompt/response pairs to a .jsonl file for later replay."""
+
+    def __init__(self, inner: LLMBackend, record_path: Path):
+        super().__init__(inner.model_name, inner.temperature)
+        self.inner = inner
+        self.name = inner.name
+        self.record_path = Path(record_path)
+        self.record_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def register_prefix(self, prefix: str) -> bool:
+        return self.inner.register_prefix(prefix)
+
+    def _record(self, prompt: Any, text: str):
+        line = json.dumps({"prompt_sha256": prompt_sha256(prompt), "response": text}, ensure_ascii=False)
+        with self._lock, open(self.record_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def invoke(self, prompt: Any) -> str:
+        text = self.inner.invoke(prompt)
+        self._record(prompt, text)
+        return text
+
+    async def ainvoke(self, prompt: Any) -> str:
+        text = await self.inner.ainvoke(prompt)
+        self._record(prompt, text)
+        return text
+
+    async def astream(self, prompt: Any) -> AsyncIterator[str]:
+        chunks = []
+        async for chunk in self.inner.astream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self._record(prompt, "".join(chunks))
+
+
+def create_backend(kind: Optional[str] = None, model_name: Optional[str] = None,
+                   temperature: Optional[float] = None, api_key: Optional[str] = None,
+                   cache: bool = True) -> LLMBackend:
+    """
+    Build the backend selected by `kind` or LLM_BACKEND (gemini | stub), wrapped in the
+    shared rate limiter / retry governor unless LLM_GOVERNOR=0 (see llm_governor) and in
+    the on-disk response cache unless cache=False or LLM_CACHE=0 (see response_cache).
+    """
+    from llm_governor import governor_enabled, with_governor
+    kind = (kind or os.getenv("LLM_BACKEND", "gemini")).strip().lower()
+    model_name = model_name or os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+    if kind == "stub":
+        paths = os.getenv("STUB_RESPONSES", DEFAULT_STUB_RESPONSES).split(os.pathsep)
+        backend: LLMBackend = StubBackend.from_paths(
+            [p for p in paths if p],
+            latency=float(os.getenv("STUB_LATENCY", "0")),
+            jitter=float(os.getenv("STUB_LATENCY_JITTER", "0")),
+            failure_rate=float(os.getenv("STUB_FAILURE_RATE", "0")),
+            seed=int(os.getenv("STUB_SEED", "0")),
+            chunk_size=int(os.getenv("STUB_CHUNK_SIZE", "64")),
+            model_name=f"stub:{model_name}",
+            temperature=temperature,
+        )
+    elif kind == "gemini":
+        # With the governor retrying, the SDK's own retry loop would multiply the attempts.
+        backend = GeminiBackend(model_name, temperature=temperature, api_key=api_key,
+                                max_retries=1 if governor_enabled() else None)
+    else:
+        raise BackendError(f"Unknown LLM_BACKEND: {kind!r}")
+
+    backend = with_governor(backend)
+
+    record_path = os.getenv("LLM_RECORD_PATH")
+    if record_path:
+        backend = RecordingBackend(backend, Path(record_path))
+    if cache:
+        from response_cache import with_cache
+        backend = with_cache(backend)
+    logger.info("Using %s backend (model=%s)", backend.name, backend.model_name)
+    return backend
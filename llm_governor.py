@@ -0,0 +1,483 @@
+"""
+Client-side governor shared by the model calls of content_writer01, content_to_code and
+debug_code.
+
+create_backend wraps the provider backend in a GovernedBackend. Its Governor is shared by
+every backend for the same (backend, model) in the process, so concurrent jobs stay under
+the provider limits together instead of each hammering them on its own:
+
+    rate limits      token buckets for requests per minute (LLM_RPM) and estimated prompt +
+                     response tokens per minute (LLM_TPM); callers wait for budget
+    retries          transient errors (429/rate limits, timeouts, 5xx, connection errors) are
+                     retried up to LLM_MAX_RETRIES times with exponential backoff and full
+                     jitter. A 429 pauses every caller, for the provider's Retry-After when given
+    circuit breaker  after LLM_BREAKER_THRESHOLD consecutive transient failures calls fail
+                     fast with CircuitOpenError for LLM_BREAKER_RESET seconds; then a single
+                     probe call decides whether the circuit closes again
+
+Settings:
+    LLM_GOVERNOR           "0" disables the wrapper (default "1")
+    LLM_RPM                requests per minute, 0 = unlimited (default 0)
+    LLM_TPM                tokens per minute, 0 = unlimited (default 0)
+    LLM_MAX_CONCURRENCY    model calls in flight across the process, 0 = unlimited (default 0)
+    LLM_MAX_RETRIES        retries per call for transient errors (default 4)
+    LLM_BACKOFF_BASE       first backoff ceiling in seconds, doubled per retry (default 1)
+    LLM_BACKOFF_MAX        backoff cap in seconds (default 30)
+    LLM_CALL_TIMEOUT       per-attempt timeout of async calls in seconds, 0 = none (default 120)
+    LLM_BREAKER_THRESHOLD  consecutive failures that open the circuit, 0 = never (default 5)
+    LLM_BREAKER_RESET      seconds the circuit stays open before a probe (default 30)
+    LLM_BURST_SECONDS      bursts allowed by the buckets, in seconds of budget (default 10)
+
+Over any window of T seconds a bucket admits at most (LLM_BURST_SECONDS + T) seconds of
+budget, so leave some headroom below the provider's limit. A single request larger than
+the burst simply waits longer. `python -m benchmarks.governor` runs the governor against
+a local fake endpoint that answers with 429s, 503s and timeouts.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import contextlib
+import collections
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+
+import metrics
+from llm_backend import BackendError, LLMBackend, StubFailure, prompt_text
+from prompt_budget import estimate_tokens
+
+logger = logging.getLogger("llm-governor")
+
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+_RATE_LIMIT_NAMES = ("ResourceExhausted", "TooManyRequests", "RateLimit")
+_TRANSIENT_NAMES = _RATE_LIMIT_NAMES + ("ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "Timeout")
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes")
+
+
+class CircuitOpenError(BackendError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class TransientBackendError(BackendError):
+    """A failure worth retrying; backends raise it with the HTTP status and Retry-After they got."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """HTTP-like status code carried by an exception (or its .response), if any."""
+    for obj in (exc, getattr(exc, "response", None)):
+        for attr in ("status", "status_code", "code"):
+            value = getattr(obj, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+
+def is_rate_limit(exc: BaseException) -> bool:
+    return error_status(exc) == 429 or any(n in type(exc).__name__ for n in _RATE_LIMIT_NAMES)
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (TransientBackendError, StubFailure, TimeoutError, ConnectionError)):
+        return True
+    status = error_status(exc)
+    if status is not None:
+        return status in TRANSIENT_STATUS
+    return any(n in type(exc).__name__ for n in _TRANSIENT_NAMES)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait (Retry-After), if it said."""
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None)
+        value = headers.get("Retry-After") if headers is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, with bursts of up to burst_s seconds worth."""
+
+    def __init__(self, per_minute: float, burst_s: float = 10.0):
+        self.rate = max(0.0, per_minute) / 60.0
+        self.capacity = max(1.0, self.rate * burst_s)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` now (the level may go negative) and return how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_s` one probe call is let through."""
+
+    def __init__(self, threshold: int, reset_s: float):
+        self.threshold = threshold
+        self.reset_s = reset_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.probing or time.monotonic() - self.opened_at >= self.reset_s else "open"
+
+    def allow(self) -> bool:
+        """Raise CircuitOpenError while open; True when the caller is the half-open probe."""
+        if self.threshold <= 0:
+            return False
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            remaining = self.reset_s - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self.probing:
+                raise CircuitOpenError(f"circuit open after {self.failures} consecutive failures "
+                                       f"(retry in {max(0.0, remaining):.1f}s)")
+            self.probing = True
+            return True
+
+    def probe_finished(self):
+        """End a probe that neither succeeded nor failed transiently (a non-transient error, a
+        cancellation, an abandoned stream); the circuit stays open and the next call probes again."""
+        with self._lock:
+            self.probing = False
+
+    def success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Circuit closed again after a successful probe")
+            self.failures, self.opened_at, self.probing = 0, None, False
+
+    def failure(self):
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.trips += 1
+                logger.warning("Circuit opened for %.1fs after %d consecutive failures", self.reset_s, self.failures)
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class Governor:
+    """Rate limits, retry policy and circuit breaker shared by all calls to one provider model."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_concurrency: int = 0, max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0, call_timeout: float = 0,
+                 breaker_threshold: int = 5, breaker_reset: float = 30.0, burst_s: float = 10.0,
+                 seed: Optional[int] = None):
+        self.requests = TokenBucket(rpm, burst_s)
+        self.tokens = TokenBucket(tpm, burst_s)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.call_timeout = call_timeout
+        self.stats: Dict[str, float] = {"calls": 0, "retries": 0, "rate_limited": 0, "transient_errors": 0,
+                                        "circuit_rejections": 0, "throttle_wait_s": 0.0}
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        # Coroutines waiting for a slot, each with the loop it runs on; see aslot.
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = collections.deque()
+
+    @classmethod
+    def from_env(cls) -> "Governor":
+        return cls(
+            rpm=float(os.getenv("LLM_RPM", "0")),
+            tpm=float(os.getenv("LLM_TPM", "0")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "0")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "1")),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "30")),
+            call_timeout=float(os.getenv("LLM_CALL_TIMEOUT", "120")),
+            breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            breaker_reset=float(os.getenv("LLM_BREAKER_RESET", "30")),
+            burst_s=float(os.getenv("LLM_BURST_SECONDS", "10")),
+        )
+
+    def _count(self, key: str, n: float = 1):
+        with self._lock:
+            self.stats[key] += n
+        metrics.count(f"governor_{key}", n)
+
+    def backoff(self, attempt: int, hint: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff for the given (1-based) retry, at least `hint`."""
+        with self._lock:
+            delay = self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        return max(delay, hint or 0.0)
+
+    def admit(self, tokens: int) -> Tuple[float, bool]:
+        """Check the breaker and reserve budget for one attempt.
+
+        Returns the seconds to wait first and whether the attempt is the breaker's probe; a
+        probe must end with succeeded(), failed() or probe_finished(), whatever happens.
+        """
+        try:
+            probe = self.breaker.allow()
+        except CircuitOpenError:
+            self._count("circuit_rejections")
+            raise
+        self._count("calls")
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens), self._paused_until - time.monotonic(), 0.0)
+        if wait:
+            self._count("throttle_wait_s", wait)
+        return wait, probe
+
+    def failed(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Delay before retrying after `exc` on the given attempt, or None when it must propagate."""
+        if not is_transient(exc):
+            return None
+        self._count("transient_errors")
+        self.breaker.failure()
+        hint = retry_after(exc)
+        if is_rate_limit(exc):
+            self._count("rate_limited")
+            pause = hint if hint is not None else self.backoff(attempt)
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        if attempt > self.max_retries:
+            return None
+        self._count("retries")
+        delay = self.backoff(attempt, hint)
+        logger.warning("Transient model error (%s: %s); retry %d/%d in %.2fs",
+                       type(exc).__name__, exc, attempt, self.max_retries, delay)
+        return delay
+
+    def succeeded(self, response: str):
+        self.breaker.success()
+        # Response tokens are only known now; they count against the budget of later calls.
+        self.tokens.reserve(estimate_tokens(response))
+
+    def probe_finished(self):
+        """Settle a probe attempt; a no-op when succeeded() or failed() already did."""
+        self.breaker.probe_finished()
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        if self.max_concurrency <= 0:
+            yield
+            return
+        with self._slot_free:
+            while self._in_flight >= self.max_concurrency:
+                self._slot_free.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextlib.asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        if self.max_concurrency <= 0:
+            yield
+            return
+        # Callers may run on different event loops and threads: a waiter parks on a future of
+        # its own loop and _release hands it the slot with call_soon_threadsafe.
+        loop = asyncio.get_running_loop()
+        waiter = None
+        with self._lock:
+            if self._in_flight < self.max_concurrency:
+                self._in_flight += 1
+            else:
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+        if waiter is not None:
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    queued = (loop, waiter) in self._async_waiters
+                    if queued:
+                        self._async_waiters.remove((loop, waiter))
+                # Granted just before the cancellation landed: pass the slot on.
+                if not queued and waiter.done() and not waiter.cancelled():
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _grant(self, waiter: "asyncio.Future"):
+        """Runs on the waiter's loop; a waiter cancelled in the meantime passes the slot on."""
+        if waiter.done():
+            self._release()
+        else:
+            waiter.set_result(None)
+
+    def _release(self):
+        with self._slot_free:
+            while self._async_waiters:
+                loop, waiter = self._async_waiters.popleft()
+                if waiter.cancelled():
+                    continue
+                try:
+                    # The slot moves to the waiter as is; _in_flight stays the same.
+                    loop.call_soon_threadsafe(self._grant, waiter)
+                    return
+                except RuntimeError:
+                    # Its loop has been closed.
+                    continue
+            self._in_flight -= 1
+            self._slot_free.notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update(breaker=self.breaker.state, breaker_trips=self.breaker.trips,
+                     throttle_wait_s=round(stats["throttle_wait_s"], 3))
+        return stats
+
+
+class GovernedBackend(LLMBackend):
+    """Sends every call of the wrapped backend through a Governor."""
+
+    def __init__(self, inner: LLMBackend, governor: Governor):
+        super().__init__(inner.model_name, inner.temperature)
+        self.inner = inner
+        self.name = inner.name
+        self.governor = governor
+
+    def invoke(self, prompt: Any) -> str:
+        tokens = estimate_tokens(prompt_text(prompt))
+        attempt = 0
+        while True:
+            attempt += 1
+            wait, probe = self.governor.admit(tokens)
+            try:
+                if wait:
+                    time.sleep(wait)
+                with self.governor.slot():
+                    text = self.inner.invoke(prompt)
+            except Exception as e:
+                delay = self.governor.failed(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.governor.succeeded(text)
+                return text
+            finally:
+                if probe:
+                    self.governor.probe_finished()
+            time.sleep(delay)
+
+    async def ainvoke(self, prompt: Any) -> str:
+        tokens = estimate_tokens(prompt_text(prompt))
+        timeout = self.governor.call_timeout or None
+        attempt = 0
+        while True:
+            attempt += 1
+            wait, probe = self.governor.admit(tokens)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                async with self.governor.aslot():
+                    text = await asyncio.wait_for(self.inner.ainvoke(prompt), timeout)
+            except Exception as e:
+                delay = self.governor.failed(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.governor.succeeded(text)
+                return text
+            finally:
+                # A cancelled or non-transiently failed probe must not leave the breaker half-open.
+                if probe:
+                    self.governor.probe_finished()
+            await asyncio.sleep(delay)
+
+    async def astream(self, prompt: Any) -> AsyncIterator[str]:
+        """Retried only until the first chunk arrives; a stream that breaks later raises."""
+        tokens = estimate_tokens(prompt_text(prompt))
+        attempt = 0
+        while True:
+            attempt += 1
+            wait, probe = self.governor.admit(tokens)
+            chunks = []
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                async with self.governor.aslot():
+                    async for chunk in self.inner.astream(prompt):
+                        chunks.append(chunk)
+                        yield chunk
+            except GeneratorExit:
+                # The caller stopped reading (e.g. a malformed response it aborted); the provider
+                # still answered, which is what the breaker and token budget track.
+                if chunks:
+                    self.governor.succeeded("".join(chunks))
+                raise
+            except Exception as e:
+                delay = None if chunks else self.governor.failed(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.governor.succeeded("".join(chunks))
+                return
+            finally:
+                if probe:
+                    self.governor.probe_finished()
+            await asyncio.sleep(delay)
+
+    def invalidate(self, prompt: Any):
+        self.inner.invalidate(prompt)
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self.inner.cache_stats()
+
+    def register_prefix(self, prefix: str) -> bool:
+        return self.inner.register_prefix(prefix)
+
+
+_governors: Dict[tuple, Governor] = {}
+_governors_lock = threading.Lock()
+
+
+def governor_enabled() -> bool:
+    return _env_flag("LLM_GOVERNOR", "1")
+
+
+def default_governor(backend: LLMBackend) -> Governor:
+    """The process-wide governor for backend's (name, model)."""
+    key = (backend.name, backend.model_name)
+    with _governors_lock:
+        if key not in _governors:
+            _governors[key] = Governor.from_env()
+        return _governors[key]
+
+
+def with_governor(backend: LLMBackend) -> LLMBackend:
+    if not governor_enabled():
+        return backend
+    return GovernedBackend(backend, default_governor(backend))
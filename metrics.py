@@ -0,0 +1,221 @@
+"""
+Structured per-run metrics for generate_ui_spec, content_to_code and debug_code.
+
+Each instrumented call creates a RunMetrics, records timings (model latency, parse,
+validation, ...), counters (attempts, cache hits, ...) and observed values (prompt
+tokens/characters, response size, ...), and finish() appends one JSON line to
+METRICS_PATH. The run is also the "current run" for the asyncio task (and worker threads)
+that created it, so lower layers such as the response cache can count into it without
+being passed the object.
+
+Settings:
+    METRICS            "0" disables writing (default "1")
+    METRICS_PATH       JSON lines file (default metrics/metrics.jsonl)
+    METRICS_PROM_PATH  if set, a Prometheus text-format dump of the process totals is
+                       rewritten there after every run (node_exporter textfile style)
+"""
+import os
+import json
+import math
+import time
+import uuid
+import logging
+import tempfile
+import threading
+import contextlib
+import contextvars
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("metrics")
+
+METRICS_ENABLED = os.getenv("METRICS", "1").strip().lower() in ("1", "true", "yes")
+METRICS_PATH = Path(os.getenv("METRICS_PATH", "metrics/metrics.jsonl"))
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH")
+PROM_PREFIX = "ui_pipeline"
+
+_current: contextvars.ContextVar[Optional["RunMetrics"]] = contextvars.ContextVar("current_run", default=None)
+_lock = threading.Lock()
+# Process totals for the Prometheus dump, keyed by (component, status) / (component, name).
+_runs: Dict[tuple, int] = {}
+_timings: Dict[tuple, List[float]] = {}
+_counters: Dict[tuple, float] = {}
+_values: Dict[tuple, List[float]] = {}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+class RunMetrics:
+    """Metrics of one call of an instrumented function; finish() writes them out once."""
+
+    def __init__(self, component: str, **labels: Any):
+        self.component = component
+        self.labels = labels
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.timings: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.values: Dict[str, List[float]] = {}
+        self.fields: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._token = _current.set(self)
+        self._finished = False
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def count(self, name: str, n: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.values.setdefault(name, []).append(value)
+
+    def set(self, **fields: Any):
+        self.fields.update(fields)
+
+    def prompt(self, prompt: Any, response_text: Optional[str] = None):
+        """Record prompt characters/estimated tokens (chat messages are flattened) and, if given, the response size."""
+        from llm_backend import prompt_text
+        from prompt_budget import estimate_tokens
+        text = prompt_text(prompt)
+        self.observe("prompt_chars", len(text))
+        self.observe("prompt_tokens", estimate_tokens(text))
+        if response_text is not None:
+            self.response(response_text)
+
+    def response(self, response_text: str):
+        self.observe("response_chars", len(response_text))
+
+    def as_record(self, status: str) -> Dict[str, Any]:
+        def summary(xs: List[float]) -> Dict[str, Any]:
+            return {"count": len(xs), "sum": round(sum(xs), 6), "max": round(max(xs), 6),
+                    "p50": round(percentile(xs, 50), 6), "p95": round(percentile(xs, 95), 6)}
+        return {
+            "ts": time.time(),
+            "run_id": self.run_id,
+            "component": self.component,
+            "status": status,
+            "labels": self.labels,
+            "wall_s": round(time.perf_counter() - self.started, 6),
+            "timings_s": {k: summary(v) for k, v in self.timings.items()},
+            "counters": dict(self.counters),
+            "values": {k: summary(v) for k, v in self.values.items()},
+            **self.fields,
+        }
+
+    def finish(self, status: str = "ok", **fields: Any) -> Dict[str, Any]:
+        """Write the run's JSON line (once) and fold it into the process totals."""
+        self.fields.update(fields)
+        record = self.as_record(status)
+        if self._finished:
+            return record
+        self._finished = True
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Finished from a different context than it was created in; nothing to restore.
+            pass
+        with _lock:
+            key = (self.component, status)
+            _runs[key] = _runs.get(key, 0) + 1
+            for name, xs in self.timings.items():
+                _timings.setdefault((self.component, name), []).extend(xs)
+            for name, n in self.counters.items():
+                _counters[(self.component, name)] = _counters.get((self.component, name), 0) + n
+            for name, xs in self.values.items():
+                _values.setdefault((self.component, name), []).extend(xs)
+        if METRICS_ENABLED:
+            _append_jsonl(METRICS_PATH, record)
+            if METRICS_PROM_PATH:
+                write_prometheus(Path(METRICS_PROM_PATH))
+        return record
+
+
+def current_run() -> Optional[RunMetrics]:
+    return _current.get()
+
+
+def count(name: str, n: float = 1):
+    """Increment a counter on the current run, if there is one."""
+    run = _current.get()
+    if run is not None:
+        run.count(name, n)
+
+
+def observe(name: str, value: float):
+    run = _current.get()
+    if run is not None:
+        run.observe(name, value)
+
+
+@contextlib.contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Time the block into the current run, if there is one."""
+    run = _current.get()
+    if run is None:
+        yield
+        return
+    with run.timer(name):
+        yield
+
+
+def _append_jsonl(path: Path, record: Dict[str, Any]):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with _lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        logger.warning("Could not write metrics to %s: %s", path, e)
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text() -> str:
+    """Process totals in the Prometheus text exposition format."""
+    lines = [f"# TYPE {PROM_PREFIX}_runs_total counter"]
+    with _lock:
+        for (component, status), n in sorted(_runs.items()):
+            lines.append(f"{PROM_PREFIX}_runs_total{_labels(component=component, status=status)} {n}")
+        lines.append(f"# TYPE {PROM_PREFIX}_stage_seconds summary")
+        for (component, name), xs in sorted(_timings.items()):
+            labels = _labels(component=component, stage=name)
+            lines.append(f"{PROM_PREFIX}_stage_seconds_sum{labels} {sum(xs):.6f}")
+            lines.append(f"{PROM_PREFIX}_stage_seconds_count{labels} {len(xs)}")
+        lines.append(f"# TYPE {PROM_PREFIX}_events_total counter")
+        for (component, name), n in sorted(_counters.items()):
+            lines.append(f"{PROM_PREFIX}_events_total{_labels(component=component, event=name)} {n:g}")
+        lines.append(f"# TYPE {PROM_PREFIX}_observed summary")
+        for (component, name), xs in sorted(_values.items()):
+            labels = _labels(component=component, name=name)
+            lines.append(f"{PROM_PREFIX}_observed_sum{labels} {sum(xs):g}")
+            lines.append(f"{PROM_PREFIX}_observed_count{labels} {len(xs)}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
@@ -0,0 +1,249 @@
+"""
+Pipelined generate -> code -> debug orchestrator.
+
+The three scripts run as concurrent stages connected by asyncio queues:
+
+    ui_spec   sharded_ui_spec generates the spec section by section; each validated
+              shard is put on the sections queue
+    code      content_to_code units are started as soon as the sections they need have
+              arrived (components first, pages once components and pages are known, App
+              last); every unit's files go on the files queue as they are written
+    debug     debug_code reviews each emitted source file as it lands
+
+so end-to-end latency approaches the slowest stage instead of the sum of all three.
+pipeline_report.json records when each stage started, produced its first output and
+finished, next to the per-stage reports.
+
+Usage:
+    python pipeline.py --system json_file/sys.json --requirements json_file/req.json \
+        --output-root pipeline_output --profile profile.json
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import content_to_code
+import debug_code
+from artifact_store import open_run
+from content_writer01 import INPUT_SYSTEM_FILE, INPUT_REQUIRE_FILE, UISpecGenerationError, atomic_write_json
+from sharded_ui_spec import generate_ui_spec_sharded
+
+logger = logging.getLogger("ui-pipeline")
+
+PIPELINE_OUTPUT_ROOT = Path(os.getenv("PIPELINE_OUTPUT_ROOT", "pipeline_output"))
+
+# A unit kind can start once all of these ui_spec sections have arrived.
+UNIT_REQUIREMENTS: Dict[str, List[str]] = {
+    "component": ["components"],
+    "page": ["components", "pages"],
+    "app": ["components", "pages", "project"],
+}
+
+
+class StageClock:
+    """Start / first output / finish times of each stage, in seconds since the pipeline started."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def mark(self, stage: str, event: str):
+        self.stages.setdefault(stage, {"items": 0}).setdefault(event, round(time.perf_counter() - self.t0, 3))
+
+    def output(self, stage: str):
+        self.mark(stage, "first_output_s")
+        self.stages[stage]["items"] += 1
+
+    def report(self) -> Dict[str, Any]:
+        for timings in self.stages.values():
+            if "started_s" in timings and "finished_s" in timings:
+                timings["busy_s"] = round(timings["finished_s"] - timings["started_s"], 3)
+        return dict(self.stages)
+
+
+def ready_units(units: List[Dict[str, Any]], spec: Dict[str, Any], scheduled: set) -> List[Dict[str, Any]]:
+    """Units of the partial spec whose inputs are complete and that haven't been started yet."""
+    return [u for u in units
+            if u["name"] not in scheduled and all(k in spec for k in UNIT_REQUIREMENTS[u["kind"]])]
+
+
+async def spec_stage(system_file: str, require_file: str, out_dir: Path, sections_q: asyncio.Queue,
+                     clock: StageClock, model=None) -> Path:
+    clock.mark("ui_spec", "started_s")
+
+    async def on_section(shard: str, sections: Dict[str, Any]):
+        clock.output("ui_spec")
+        await sections_q.put(sections)
+
+    try:
+        return await generate_ui_spec_sharded(system_file, require_file, out_dir, model=model, on_section=on_section)
+    finally:
+        clock.mark("ui_spec", "finished_s")
+        await sections_q.put(None)
+
+
+async def code_stage(sections_q: asyncio.Queue, files_q: asyncio.Queue, out_dir: Path, profile: Dict[str, str],
+                     concurrency: int, clock: StageClock, llm=None) -> Dict[str, Any]:
+    llm = llm or content_to_code.get_llm()
+    sem = asyncio.Semaphore(max(1, concurrency))
+    spec: Dict[str, Any] = {}
+    scheduled: set = set()
+    tasks: List[asyncio.Task] = []
+    failed: List[str] = []
+
+    async def run_unit(unit: Dict[str, Any], units: List[Dict[str, Any]]):
+        _, files, _ = await content_to_code.generate_unit(unit, units, profile, llm, sem, out_dir)
+        if files is None:
+            failed.append(unit["name"])
+            return
+        clock.output("code")
+        for filename, code in files.items():
+            await files_q.put((filename, code))
+
+    def schedule():
+        units = content_to_code.plan_files({"ui_spec": spec}, profile)
+        for unit in ready_units(units, spec, scheduled):
+            scheduled.add(unit["name"])
+            clock.mark("code", "started_s")
+            tasks.append(asyncio.ensure_future(run_unit(unit, units)))
+
+    try:
+        while True:
+            sections = await sections_q.get()
+            if sections is None:
+                break
+            spec.update(sections)
+            schedule()
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        clock.mark("code", "finished_s")
+        await files_q.put(None)
+
+    units = content_to_code.plan_files({"ui_spec": spec}, profile)
+    record = content_to_code.build_record(units, {}, scheduled, failed, profile)
+    content_to_code.write_record(out_dir / content_to_code.RECORD_NAME, record, final=True)
+    return {"units": len(units), "generated": len(scheduled) - len(failed), "failed": failed}
+
+
+async def debug_stage(files_q: asyncio.Queue, out_dir: Path, concurrency: int, clock: StageClock,
+                      llm=None) -> Dict[str, Any]:
+    llm = llm or debug_code.get_llm()
+    sem = asyncio.Semaphore(max(1, concurrency))
+    tasks: List[asyncio.Task] = []
+    started = None
+    stats = debug_code.new_analysis_stats()
+
+    async def run_file(name: str, code: str):
+        entry = await debug_code.debug_file(name, code, out_dir, sem, llm, stats=stats)
+        clock.output("debug")
+        return entry
+
+    try:
+        while True:
+            item = await files_q.get()
+            if item is None:
+                break
+            name, code = item
+            if Path(name).suffix in debug_code.SOURCE_EXTENSIONS:
+                clock.mark("debug", "started_s")
+                started = started or time.perf_counter()
+                tasks.append(asyncio.ensure_future(run_file(name, code)))
+        entries = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        clock.mark("debug", "finished_s")
+    busy = time.perf_counter() - started if started else 0.0
+    return debug_code.write_debug_report(list(entries), out_dir, busy, concurrency, llm, stats)
+
+
+async def run_pipeline(system_file: str, require_file: str, output_root: Path = PIPELINE_OUTPUT_ROOT,
+                       profile: Optional[Dict[str, str]] = None, code_concurrency: int = 4,
+                       debug_concurrency: int = 4, spec_model=None, code_llm=None,
+                       debug_llm=None) -> Dict[str, Any]:
+    """
+    Run the three stages concurrently for one project under output_root (ui_spec/, code/,
+    debug/) and write output_root/pipeline_report.json, which is also returned.
+    """
+    output_root = Path(output_root)
+    spec_dir, code_dir, debug_dir = output_root / "ui_spec", output_root / "code", output_root / "debug"
+    for d in (spec_dir, code_dir, debug_dir):
+        d.mkdir(parents=True, exist_ok=True)
+    profile = profile or content_to_code.load_profile()
+    clock = StageClock()
+    sections_q: asyncio.Queue = asyncio.Queue()
+    files_q: asyncio.Queue = asyncio.Queue()
+    # The code and debug stages write into this run; the spec stage records its own.
+    artifacts = open_run("pipeline", base_dir=output_root)
+
+    stages = [
+        asyncio.ensure_future(spec_stage(system_file, require_file, spec_dir, sections_q, clock, spec_model)),
+        asyncio.ensure_future(code_stage(sections_q, files_q, code_dir, profile, code_concurrency, clock, code_llm)),
+        asyncio.ensure_future(debug_stage(files_q, debug_dir, debug_concurrency, clock, debug_llm)),
+    ]
+    try:
+        spec_path, code_summary, debug_report = await asyncio.gather(*stages)
+    except BaseException:
+        for stage in stages:
+            stage.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
+        if artifacts is not None:
+            artifacts.close("error")
+        raise
+    end_to_end = round(time.perf_counter() - clock.t0, 3)
+
+    timings = clock.report()
+    report = {
+        "end_to_end_s": end_to_end,
+        "sum_of_stage_busy_s": round(sum(t.get("busy_s", 0) for t in timings.values()), 3),
+        "stages": timings,
+        "ui_spec": str(spec_path),
+        "code": dict(code_summary, output_dir=str(code_dir)),
+        "debug": {k: debug_report[k] for k in ("files", "succeeded", "failed", "bottleneck")},
+    }
+    atomic_write_json(output_root / "pipeline_report.json", report)
+    if artifacts is not None:
+        artifacts.close("ok")
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate ui_spec, code and debug reviews as one pipelined run.")
+    parser.add_argument("--system", default=INPUT_SYSTEM_FILE, help="system design JSON (default INPUT_SYSTEM_FILE)")
+    parser.add_argument("--requirements", default=INPUT_REQUIRE_FILE,
+                        help="requirements JSON (default INPUT_REQUIRE_FILE)")
+    parser.add_argument("--output-root", default=str(PIPELINE_OUTPUT_ROOT))
+    parser.add_argument("--profile", default=content_to_code.CODEGEN_PROFILE, help="content_to_code profile JSON")
+    parser.add_argument("--code-concurrency", type=int, default=content_to_code.CODEGEN_CONCURRENCY)
+    parser.add_argument("--debug-concurrency", type=int, default=debug_code.DEBUG_CONCURRENCY)
+    args = parser.parse_args(argv)
+    if not args.system or not args.requirements:
+        parser.error("--system and --requirements are required")
+
+    profile = content_to_code.load_profile(args.profile)
+    try:
+        report = asyncio.run(run_pipeline(args.system, args.requirements, Path(args.output_root), profile,
+                                          args.code_concurrency, args.debug_concurrency))
+    except UISpecGenerationError as exc:
+        print("FAILED: see logs and", exc.raw_output_path)
+        sys.exit(1)
+    stages = report["stages"]
+    print(f"Pipeline done in {report['end_to_end_s']}s (stage busy times sum to {report['sum_of_stage_busy_s']}s)")
+    for name, t in stages.items():
+        print(f"  {name:8} start={t.get('started_s')}s first={t.get('first_output_s')}s "
+              f"end={t.get('finished_s')}s items={t['items']}")
+    print(f"Code units: {report['code']['generated']}/{report['code']['units']}  "
+          f"debugged files: {report['debug']['succeeded']}/{report['debug']['files']}")
+    if report["code"]["failed"] or report["debug"]["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
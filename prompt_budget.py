@@ -0,0 +1,192 @@
+"""
+Token-budget-aware assembly of input JSON for prompts.
+
+Instead of fixed slices and a character cut, inputs are split into small items (list
+elements, model definitions, scalar fields), de-duplicated, ranked by relevance to the
+ui_spec sections being requested, and packed greedily until a target token budget is
+reached. The selected items are re-nested under their original paths and emitted as
+compact JSON, with a note of how much was left out, so nothing is cut mid-structure.
+
+Token counts are estimates (PROMPT_CHARS_PER_TOKEN characters per token, default 4).
+"""
+import os
+import re
+import json
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+ITEM_MAX_CHARS = 400
+
+# Bookkeeping keys of the upstream agents' envelope ({"status", "output", "metadata"}).
+# Only dropped at a document's root and its "output" payload: deeper down, e.g. a data model's
+# "status" field, they are real content.
+NOISE_KEYS = {"status", "metadata", "saved_file_path", "agent", "version", "timestamp"}
+ENVELOPE_KEY = "output"
+
+ALWAYS_RELEVANT = {"features", "pages", "requirements"}
+
+SECTION_KEYWORDS: Dict[str, set] = {
+    "project": {"features", "pages", "user_roles", "tech_stack"},
+    "inferred_domain": {"features", "pages", "data_models"},
+    "purpose": {"features", "user_roles"},
+    "assumptions": {"features", "user_roles", "crud_operations", "security"},
+    "source_files": set(),
+    "generated_at": set(),
+    "next_steps": {"features", "tech_stack"},
+    "pages": {"pages", "features", "user_roles", "crud_operations", "api_endpoints", "path", "method", "route"},
+    "flows": {"features", "pages", "crud_operations", "user_roles", "api_endpoints"},
+    "components": {"components", "component_architecture", "frontend", "features", "pages"},
+    "admin_components": {"admin", "crud_operations", "components", "user_roles"},
+    "data_models": {"data_models", "database_schema", "models", "fields", "schema", "crud_operations"},
+    "implementation_notes": {"tech_stack", "security", "security_considerations", "api_endpoints", "frontend", "backend"},
+    "accessibility_summary": {"pages", "features", "design", "frontend"},
+    "i18n_keys_sample": {"pages", "features"},
+    "performance_tips": {"tech_stack", "infrastructure", "frontend", "database"},
+    "monitoring_and_metrics": {"infrastructure", "api_endpoints", "backend"},
+    "testing_plan": {"features", "crud_operations", "api_endpoints", "frontend"},
+    "deployment_plan": {"infrastructure", "tech_stack", "database", "backend"},
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN + 0.999)
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _items(node: Any, path: Tuple, out: List[Tuple[Tuple, Any, str]]):
+    """Split node into items of at most ITEM_MAX_CHARS (or indivisible scalars) to rank individually."""
+    if isinstance(node, dict) and (len(path) == 1 or path[1:] == (ENVELOPE_KEY,)):
+        node = {k: v for k, v in node.items() if k not in NOISE_KEYS}
+    text = compact_json(node)
+    if len(text) > ITEM_MAX_CHARS and node and isinstance(node, (dict, list)):
+        # Not kept while recursing: on large inputs every level's text would stay alive at once.
+        del text
+        children = node.items() if isinstance(node, dict) else enumerate(node)
+        for k, v in children:
+            _items(v, path + (k,), out)
+        return
+    out.append((path, node, text))
+
+
+def _keywords(sections: List[str]) -> set:
+    words = set(ALWAYS_RELEVANT)
+    for s in sections:
+        words |= SECTION_KEYWORDS.get(s, set())
+        words.add(s)
+    expanded = set()
+    for w in words:
+        expanded.update(w.split("_"))
+    return words | expanded
+
+
+def _score(path: Tuple, text: str, keywords: set, source_weight: float) -> float:
+    path_words = set()
+    for p in path:
+        if isinstance(p, str):
+            path_words.add(p.lower())
+            path_words.update(_WORD_RE.findall(p.lower()))
+    value_words = set(_WORD_RE.findall(text[:300].lower()))
+    score = 3.0 * len(path_words & keywords) + 0.5 * len(value_words & keywords)
+    depth = sum(1 for p in path if isinstance(p, str))
+    position = next((p for p in reversed(path) if isinstance(p, int)), 0)
+    return (score + 1.0 / (1 + depth)) * source_weight - 0.01 * position
+
+
+def _set_path(root: Dict, path: Tuple, value: Any):
+    cur = root
+    for p in path[:-1]:
+        cur = cur.setdefault(p, {})
+    cur[path[-1]] = value
+
+
+def _listify(node: Any) -> Any:
+    """Nodes built with integer keys were lists; turn them back into lists in order."""
+    if isinstance(node, dict):
+        if node and all(isinstance(k, int) for k in node):
+            return [_listify(node[k]) for k in sorted(node)]
+        return {k: _listify(v) for k, v in node.items()}
+    return node
+
+
+def assemble_inputs(sources: Dict[str, Any], sections: Optional[List[str]], token_budget: int,
+                    weights: Optional[Dict[str, float]] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Pack the most relevant parts of `sources` ({"requirements": ..., "system": ...}) into
+    at most token_budget estimated tokens of compact JSON.
+    Returns (json_text, report) where report has estimated_tokens, items_total,
+    items_included and omitted_paths (a sample of what was left out).
+    """
+    weights = weights or {"requirements": 1.5}
+    keywords = _keywords(sections or list(SECTION_KEYWORDS))
+    candidates = []
+    seen = set()
+    for source, data in sources.items():
+        items: List[Tuple[Tuple, Any, str]] = []
+        _items(data, (source,), items)
+        for path, value, text in items:
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            if digest in seen or text in ("null", '""', "[]", "{}"):
+                continue
+            seen.add(digest)
+            score = _score(path, text, keywords, weights.get(source, 1.0))
+            candidates.append((score, len(candidates), path, value, text))
+
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    char_budget = token_budget * CHARS_PER_TOKEN
+    used = 0
+    chosen = []
+    omitted = []
+    for score, order, path, value, text in candidates:
+        cost = len(text) + sum(len(str(p)) + 4 for p in path)
+        if used + cost <= char_budget:
+            chosen.append((order, path, value))
+            used += cost
+        else:
+            omitted.append(path)
+
+    root: Dict = {}
+    for _, path, value in sorted(chosen, key=lambda c: c[0]):
+        _set_path(root, path, value)
+    root = _listify(root)
+    text = compact_json(root)
+    report = {
+        "estimated_tokens": estimate_tokens(text),
+        "token_budget": token_budget,
+        "items_total": len(candidates),
+        "items_included": len(chosen),
+        "omitted_paths": ["/".join(str(p) for p in path) for path in omitted[:20]],
+    }
+    return text, report
+
+
+def inputs_block(system_json: Dict, req_json: Dict, sections: Optional[List[str]], token_budget: int,
+                 force_full: bool = False) -> Tuple[str, Dict[str, Any]]:
+    """
+    Input section for a prompt: the full inputs as compact JSON when they fit the budget
+    (or force_full), otherwise the relevance-ranked selection from assemble_inputs.
+    """
+    full = compact_json({"requirements": req_json, "system": system_json})
+    tokens = estimate_tokens(full)
+    if force_full or tokens <= token_budget:
+        return "INPUTS_JSON:\n" + full, {"estimated_tokens": tokens, "token_budget": token_budget, "mode": "full"}
+    del full
+    text, report = assemble_inputs({"requirements": req_json, "system": system_json}, sections, token_budget)
+    report["mode"] = "ranked"
+    omitted = report["items_total"] - report["items_included"]
+    note = f"\n(Note: {omitted} lower-relevance input items were omitted to fit the token budget.)" if omitted else ""
+    return "INPUTS_JSON (most relevant parts):\n" + text + note, report
+
+
+def fit_context(context: Dict[str, Any], sections: Optional[List[str]], token_budget: int) -> str:
+    """Compact JSON of an already-selected context, ranked down only if it exceeds the budget."""
+    text = compact_json(context)
+    if estimate_tokens(text) <= token_budget:
+        return text
+    text, _ = assemble_inputs(context, sections, token_budget)
+    return text
@@ -0,0 +1,239 @@
+"""
+Persistent, content-addressed cache for model responses.
+
+Entries are keyed on sha256(model name, temperature, prompt text) and stored as one JSON
+file each under LLM_CACHE_DIR/<key[:2]>/<key>.json. Expired entries (LLM_CACHE_TTL
+seconds) are dropped on read, and least-recently-used entries are evicted once the cache
+exceeds LLM_CACHE_MAX_ENTRIES or LLM_CACHE_MAX_MB.
+
+Settings:
+    LLM_CACHE             "0" disables the cache entirely (default "1")
+    LLM_CACHE_BYPASS      "1" skips lookups but still stores fresh responses (default "0")
+    LLM_CACHE_DIR         cache directory (default .llm_cache)
+    LLM_CACHE_TTL         entry lifetime in seconds, 0 = forever (default 604800, 7 days)
+    LLM_CACHE_MAX_ENTRIES max number of entries (default 10000)
+    LLM_CACHE_MAX_MB      max total size in MB (default 512)
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import metrics
+from llm_backend import LLMBackend, cache_text
+
+logger = logging.getLogger("llm-cache")
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes")
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: Path, ttl: float = 0, max_entries: int = 0, max_bytes: int = 0):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Tuple[float, int]]] = None
+
+    @staticmethod
+    def make_key(prompt: Any, model_name: str, temperature: Optional[float]) -> str:
+        material = json.dumps([model_name, temperature, cache_text(prompt)], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> Dict[str, Tuple[float, int]]:
+        """Scan the cache directory once; afterwards the index is maintained in memory."""
+        if self._index is None:
+            index = {}
+            if self.cache_dir.exists():
+                for f in self.cache_dir.glob("*/*.json"):
+                    try:
+                        st = f.stat()
+                    except OSError:
+                        continue
+                    index[f.stem] = (st.st_mtime, st.st_size)
+            self._index = index
+        return self._index
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        if self.ttl and now - entry.get("created", 0) > self.ttl:
+            self.discard(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            index = self._load_index()
+            if key in index:
+                index[key] = (now, index[key][1])
+        return entry.get("response")
+
+    def put(self, key: str, response: str, **meta):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(dict(meta, created=time.time(), response=response), ensure_ascii=False)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{key[:8]}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self.stores += 1
+            self._load_index()[key] = (time.time(), len(data.encode("utf-8")))
+            self._evict_locked()
+
+    def discard(self, key: str):
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+        with self._lock:
+            self._load_index().pop(key, None)
+
+    def _evict_locked(self):
+        index = self._load_index()
+        total = sum(size for _, size in index.values())
+        if (not self.max_entries or len(index) <= self.max_entries) and (not self.max_bytes or total <= self.max_bytes):
+            return
+        for key, (_, size) in sorted(index.items(), key=lambda kv: kv[1][0]):
+            if (not self.max_entries or len(index) <= self.max_entries) and (not self.max_bytes or total <= self.max_bytes):
+                break
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+            index.pop(key, None)
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+class CachedBackend(LLMBackend):
+    """Serves responses from a ResponseCache before calling the wrapped backend."""
+
+    def __init__(self, inner: LLMBackend, cache: ResponseCache, bypass: bool = False):
+        super().__init__(inner.model_name, inner.temperature)
+        self.inner = inner
+        self.name = inner.name
+        self.cache = cache
+        self.bypass = bypass
+
+    def _key(self, prompt: Any) -> str:
+        return self.cache.make_key(prompt, self.model_name, self.temperature)
+
+    def invoke(self, prompt: Any) -> str:
+        key = self._key(prompt)
+        if not self.bypass:
+            hit = self.cache.get(key)
+            if hit is not None:
+                metrics.count("cache_hits")
+                return hit
+        metrics.count("cache_misses")
+        text = self.inner.invoke(prompt)
+        self.cache.put(key, text, model=self.model_name, temperature=self.temperature)
+        return text
+
+    async def ainvoke(self, prompt: Any) -> str:
+        key = self._key(prompt)
+        if not self.bypass:
+            hit = self.cache.get(key)
+            if hit is not None:
+                metrics.count("cache_hits")
+                return hit
+        metrics.count("cache_misses")
+        text = await self.inner.ainvoke(prompt)
+        self.cache.put(key, text, model=self.model_name, temperature=self.temperature)
+        return text
+
+    async def astream(self, prompt: Any) -> AsyncIterator[str]:
+        """A hit is yielded whole; a miss is stored only if the stream was consumed to the end."""
+        key = self._key(prompt)
+        if not self.bypass:
+            hit = self.cache.get(key)
+            if hit is not None:
+                metrics.count("cache_hits")
+                yield hit
+                return
+        metrics.count("cache_misses")
+        chunks = []
+        async for chunk in self.inner.astream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, "".join(chunks), model=self.model_name, temperature=self.temperature)
+
+    def invalidate(self, prompt: Any):
+        self.cache.discard(self._key(prompt))
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+    def register_prefix(self, prefix: str) -> bool:
+        return self.inner.register_prefix(prefix)
+
+
+_default_cache: Optional[ResponseCache] = None
+
+
+def default_cache() -> Optional[ResponseCache]:
+    """Process-wide cache configured from the environment, or None when LLM_CACHE=0."""
+    global _default_cache
+    if not _env_flag("LLM_CACHE", "1"):
+        return None
+    if _default_cache is None:
+        _default_cache = ResponseCache(
+            Path(os.getenv("LLM_CACHE_DIR", ".llm_cache")),
+            ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+            max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024),
+        )
+    return _default_cache
+
+
+def with_cache(backend: LLMBackend) -> LLMBackend:
+    cache = default_cache()
+    if cache is None:
+        return backend
+    return CachedBackend(backend, cache, bypass=_env_flag("LLM_CACHE_BYPASS", "0"))
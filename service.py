@@ -0,0 +1,418 @@
+"""
+Long-running generation service: a local HTTP API over asyncio (TCP or a Unix socket)
+that queues ui_spec, code and debug jobs in SQLite and runs them with model clients and
+caches kept warm across jobs.
+
+Jobs are checkpointed into the queue as they progress: generate_ui_spec's retry state
+after every failed attempt, debug_batch's finished files, and content_to_code's record
+of finished units (in the output directory). Jobs still marked running when the service
+starts, because it crashed or was stopped, are queued again and resume from their
+checkpoint.
+
+Endpoints:
+    POST /jobs        {"kind": "ui_spec" | "code" | "debug", "params": {...}} -> the queued job
+    GET  /jobs        recent jobs, optionally ?status=queued|running|done|failed&limit=N
+    GET  /jobs/<id>   one job with its result or error
+    GET  /metrics     Prometheus text: the metrics module totals plus queue gauges
+    GET  /health
+
+Job params:
+    ui_spec   system, requirements: input JSON paths
+    code      spec: path of a generated_ui_spec.json; profile: optional profile JSON path
+    debug     paths: list of files or directories to review
+    all       output_dir (default SERVICE_ROOT/<job id>)
+
+Settings:
+    SERVICE_DB       SQLite queue (default service_data/jobs.sqlite3)
+    SERVICE_ROOT     default job output root (default service_data/jobs)
+    SERVICE_WORKERS  jobs run at once (default 2)
+    SERVICE_HOST     (default 127.0.0.1)
+    SERVICE_PORT     (default 8765)
+    SERVICE_SOCKET   Unix socket path; when set the service listens there instead of TCP
+
+Usage:
+    python service.py
+    curl -s localhost:8765/jobs -d '{"kind": "ui_spec", "params": {"system": "json_file/ecommerse_system_design.json", "requirements": "json_file/ecommerse.json"}}'
+    curl -s localhost:8765/jobs/<id>
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger("ui-service")
+
+SERVICE_DB = Path(os.getenv("SERVICE_DB", "service_data/jobs.sqlite3"))
+SERVICE_ROOT = Path(os.getenv("SERVICE_ROOT", "service_data/jobs"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8765"))
+SERVICE_SOCKET = os.getenv("SERVICE_SOCKET")
+
+JOB_KINDS = ("ui_spec", "code", "debug")
+MAX_BODY_BYTES = 1 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    runs INTEGER NOT NULL DEFAULT 0,
+    checkpoint TEXT,
+    checkpointed REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+
+class JobError(ValueError):
+    """A job request that can't be queued (unknown kind, missing params)."""
+
+
+class JobStore:
+    """The durable job queue: one SQLite row per job, updated as it runs."""
+
+    def __init__(self, path: Path = SERVICE_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("params", "checkpoint", "result"):
+            job[key] = json.loads(job[key]) if job[key] is not None else None
+        return job
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            self._db.execute("INSERT INTO jobs (id, kind, params, status, created) VALUES (?, ?, ?, 'queued', ?)",
+                             (job_id, kind, json.dumps(params), time.time()))
+        return self.get(job_id)
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the oldest queued job running and return it (None when the queue is empty)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE jobs SET status = 'running', started = ?, runs = runs + 1 WHERE id = ?",
+                                     (time.time(), row["id"]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def requeue_running(self) -> int:
+        """Queue jobs left running by a previous process again; they resume from their checkpoint."""
+        with self._lock:
+            return self._db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+
+    def checkpoint(self, job_id: str, state: Dict[str, Any]):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET checkpoint = ?, checkpointed = ? WHERE id = ?",
+                             (json.dumps(state, ensure_ascii=False, default=str), time.time(), job_id))
+
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?",
+                             (status, time.time(), json.dumps(result, default=str) if result is not None else None,
+                              error, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._job(self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = "SELECT id, kind, status, created, started, finished, runs, error FROM jobs"
+        args: Tuple = ()
+        if status:
+            query, args = query + " WHERE status = ?", (status,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY created DESC LIMIT ?", args + (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+
+def validate_params(kind: str, params: Dict[str, Any]):
+    required = {"ui_spec": ("system", "requirements"), "code": ("spec",), "debug": ("paths",)}
+    if kind not in JOB_KINDS:
+        raise JobError(f"unknown job kind {kind!r}; expected one of {', '.join(JOB_KINDS)}")
+    if not isinstance(params, dict):
+        raise JobError("params must be an object")
+    missing = [k for k in required[kind] if not params.get(k)]
+    if missing:
+        raise JobError(f"{kind} jobs need {', '.join(missing)}")
+
+
+class JobRunner:
+    """Runs claimed jobs; the model clients are created once and shared by every job."""
+
+    def __init__(self, store: JobStore, root: Path = SERVICE_ROOT):
+        self.store = store
+        self.root = Path(root)
+        self._clients: Dict[str, Any] = {}
+        self.started = time.time()
+        self.completed: Dict[str, int] = {}
+
+    def client(self, kind: str):
+        if kind not in self._clients:
+            if kind == "ui_spec":
+                from content_writer01 import create_model
+                self._clients[kind] = create_model()
+            elif kind == "code":
+                import content_to_code
+                self._clients[kind] = content_to_code.get_llm()
+            else:
+                import debug_code
+                self._clients[kind] = debug_code.get_llm()
+        return self._clients[kind]
+
+    async def run(self, job: Dict[str, Any]):
+        job_id, kind, params = job["id"], job["kind"], job["params"]
+        output_dir = Path(params.get("output_dir") or self.root / job_id)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        logger.info("Job %s (%s) started, run %d%s", job_id, kind, job["runs"],
+                    " from checkpoint" if job["checkpoint"] else "")
+        try:
+            handler = getattr(self, f"run_{kind}")
+            result = await handler(job, params, output_dir, lambda state: self.store.checkpoint(job_id, state))
+        except asyncio.CancelledError:
+            # Left "running": the next start queues it again and it resumes.
+            logger.info("Job %s interrupted; it will resume on restart", job_id)
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed: %s", job_id, kind, e)
+            self.store.finish(job_id, "failed", {"output_dir": str(output_dir)}, f"{type(e).__name__}: {e}")
+            self.completed["failed"] = self.completed.get("failed", 0) + 1
+            return
+        self.store.finish(job_id, "done", dict(result, output_dir=str(output_dir)))
+        self.completed["done"] = self.completed.get("done", 0) + 1
+        logger.info("Job %s (%s) done", job_id, kind)
+
+    async def run_ui_spec(self, job: Dict[str, Any], params: Dict[str, Any], output_dir: Path,
+                          checkpoint: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        from content_writer01 import generate_ui_spec
+        path = await generate_ui_spec(params["system"], params["requirements"], output_dir,
+                                      model=self.client("ui_spec"), stream=params.get("stream"),
+                                      best_of=params.get("best_of"), checkpoint=checkpoint, resume=job["checkpoint"])
+        return {"ui_spec": str(path)}
+
+    async def run_code(self, job: Dict[str, Any], params: Dict[str, Any], output_dir: Path,
+                       checkpoint: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        import content_to_code
+        spec = content_to_code.read_json(params["spec"])
+        profile = content_to_code.load_profile(params.get("profile"))
+        # Chunked and incremental: the record of finished units in output_dir is the checkpoint.
+        record_path = await content_to_code.agenerate_ui_from_json(spec, output_dir, profile, chunked=True,
+                                                                   llm=self.client("code"))
+        record = content_to_code.load_record(output_dir)
+        return {"record": str(record_path), "units": len(record.get("units", {}))}
+
+    async def run_debug(self, job: Dict[str, Any], params: Dict[str, Any], output_dir: Path,
+                        checkpoint: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        import debug_code
+        paths = params["paths"] if isinstance(params["paths"], list) else [params["paths"]]
+        items = debug_code.collect_source_files(paths)
+        done = [e for e in (job["checkpoint"] or {}).get("entries", []) if e.get("status") == "ok"]
+        finished = {e["file"] for e in done}
+        entries = list(done)
+
+        def on_entry(entry: Dict[str, Any]):
+            entries.append(entry)
+            checkpoint({"entries": entries})
+
+        report = await debug_code.debug_batch([(n, c) for n, c in items if n not in finished], output_dir,
+                                              llm=self.client("debug"), done=done, on_entry=on_entry)
+        return {k: report[k] for k in ("files", "succeeded", "failed", "wall_s")}
+
+
+class Service:
+    """HTTP front end plus SERVICE_WORKERS worker tasks draining the queue."""
+
+    def __init__(self, store: JobStore, workers: int = SERVICE_WORKERS, root: Path = SERVICE_ROOT):
+        self.store = store
+        self.runner = JobRunner(store, root)
+        self.workers = max(1, workers)
+        self.wakeup = asyncio.Event()
+        self.running: Dict[str, asyncio.Task] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        resumed = self.store.requeue_running()
+        if resumed:
+            logger.info("Re-queued %d interrupted job(s)", resumed)
+        self._tasks = [asyncio.ensure_future(self.worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def worker(self, n: int):
+        while True:
+            job = self.store.claim()
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.ensure_future(self.runner.run(job))
+            self.running[job["id"]] = task
+            try:
+                await task
+            finally:
+                self.running.pop(job["id"], None)
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        validate_params(kind, params)
+        job = self.store.submit(kind, params)
+        self.wakeup.set()
+        return job
+
+    def metrics_text(self) -> str:
+        counts = self.store.counts()
+        lines = [metrics.prometheus_text().rstrip("\n"), f"# TYPE {metrics.PROM_PREFIX}_jobs gauge"]
+        for status in ("queued", "running", "done", "failed"):
+            lines.append(f'{metrics.PROM_PREFIX}_jobs{{status="{status}"}} {counts.get(status, 0)}')
+        lines.append(f"# TYPE {metrics.PROM_PREFIX}_service_uptime_seconds gauge")
+        lines.append(f"{metrics.PROM_PREFIX}_service_uptime_seconds {time.time() - self.runner.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def route(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if method == "GET" and parts == ["health"]:
+            return 200, {"ok": True, "workers": self.workers, "running": sorted(self.running)}
+        if method == "GET" and parts == ["metrics"]:
+            return 200, self.metrics_text()
+        if parts[:1] == ["jobs"]:
+            if method == "POST" and len(parts) == 1:
+                try:
+                    request = json.loads(body or b"{}")
+                    return 202, self.submit(request.get("kind"), request.get("params") or {})
+                except (ValueError, AttributeError) as e:
+                    return 400, {"error": str(e)}
+            if method == "GET" and len(parts) == 1:
+                return 200, self.store.list(query.get("status"), int(query.get("limit", 50)))
+            if method == "GET" and len(parts) == 2:
+                job = self.store.get(parts[1])
+                return (200, job) if job else (404, {"error": "no such job"})
+        return 404, {"error": f"no route for {method} {url.path}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One HTTP/1.1 request per connection."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers: Dict[str, str] = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                status, payload = 400, {"error": "bad request line"}
+            else:
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "request body too large"}
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = self.route(request_line[0].upper(), request_line[1], body)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, {"error": str(e)}
+        if isinstance(payload, str):
+            data, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(payload, indent=2, default=str).encode("utf-8"), "application/json"
+        reason = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large"}
+        writer.write(f"HTTP/1.1 {status} {reason.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, socket_path: Optional[str] = SERVICE_SOCKET,
+                db: Path = SERVICE_DB, workers: int = SERVICE_WORKERS, root: Path = SERVICE_ROOT,
+                ready: Optional[Callable[[str], None]] = None):
+    """Run the service until cancelled."""
+    store = JobStore(db)
+    service = Service(store, workers, root)
+    if socket_path:
+        server = await asyncio.start_unix_server(service.handle, path=socket_path)
+        address = f"unix:{socket_path}"
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        address = "http://%s:%d" % server.sockets[0].getsockname()[:2]
+    await service.start()
+    logger.info("Serving on %s (%d workers, queue %s)", address, service.workers, db)
+    if ready is not None:
+        ready(address)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+        store.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Queue and run ui_spec / code / debug jobs as a local service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--socket", default=SERVICE_SOCKET, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--db", type=Path, default=SERVICE_DB)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    parser.add_argument("--root", type=Path, default=SERVICE_ROOT, help="default output root for jobs")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket, args.db, args.workers, args.root))
+    except KeyboardInterrupt:
+        logger.info("Stopped; running jobs resume on the next start.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
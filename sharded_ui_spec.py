@@ -0,0 +1,296 @@
+"""
+Section-sharded ui_spec generation.
+
+Instead of one giant build_master_prompt call, the ui_spec sections are split into shards
+(SECTION_SHARDS) that are generated as independent concurrent requests, each given only
+the slice of the system/requirements inputs it needs (SHARD_CONTEXT). Shards retry on
+their own, and the merged result is validated against UI_SPEC_JSON_SCHEMA as a whole, so
+wall-clock latency is set by the slowest shard rather than the sum.
+
+Usage:
+    SHARDED=1 python content_writer01.py
+    python batch_ui_spec.py --input-dir json_file --sharded
+"""
+import json
+import time
+import asyncio
+import inspect
+import functools
+import logging
+import textwrap
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from artifact_store import open_run
+from prompt_budget import fit_context
+from example_index import record_example
+from content_writer01 import (
+    UI_SPEC_JSON_SCHEMA,
+    MAX_ATTEMPTS,
+    PROMPT_TOKEN_BUDGET,
+    GEMINI_MODEL,
+    TEMPERATURE,
+    INPUT_SYSTEM_FILE,
+    INPUT_REQUIRE_FILE,
+    OUTPUT_DIR,
+    UISpecGenerationError,
+    atomic_write_json,
+    create_model,
+    extract_json_from_text,
+    output_paths,
+    read_input_json,
+    save_raw_output,
+    validate_ui_spec,
+)
+
+logger = logging.getLogger("ui-generator-sharded")
+
+SECTION_SHARDS: Dict[str, List[str]] = {
+    "overview": ["project", "inferred_domain", "generated_at", "source_files", "purpose", "assumptions", "next_steps"],
+    "pages": ["pages", "flows"],
+    "components": ["components", "admin_components"],
+    "data_models": ["data_models"],
+    "implementation": ["implementation_notes", "accessibility_summary", "i18n_keys_sample", "performance_tips"],
+    "operations": ["monitoring_and_metrics", "testing_plan", "deployment_plan"],
+}
+
+# (input, key) pairs each shard receives; keys are looked up by find_input_section.
+SHARD_CONTEXT: Dict[str, List[Tuple[str, str]]] = {
+    "overview": [("requirements", "features"), ("requirements", "user_roles"), ("requirements", "pages"),
+                 ("system", "tech_stack")],
+    "pages": [("requirements", "features"), ("requirements", "user_roles"), ("requirements", "pages"),
+              ("requirements", "crud_operations"), ("system", "api_endpoints")],
+    "components": [("requirements", "features"), ("requirements", "pages"), ("system", "component_architecture"),
+                   ("system", "components"), ("system", "api_endpoints")],
+    "data_models": [("requirements", "data_models"), ("system", "database_schema"), ("system", "api_endpoints")],
+    "implementation": [("requirements", "features"), ("requirements", "pages"), ("system", "tech_stack"),
+                       ("system", "security_considerations"), ("system", "security")],
+    "operations": [("requirements", "features"), ("system", "tech_stack"), ("system", "api_endpoints"),
+                   ("system", "security_considerations")],
+}
+
+SECTION_GUIDANCE: Dict[str, str] = {
+    "project": "string, project name",
+    "inferred_domain": "string",
+    "generated_at": "ISO8601 timestamp string",
+    "source_files": "object naming the system design and requirements inputs",
+    "purpose": "string",
+    "assumptions": "array of assumptions made where requirements were ambiguous",
+    "next_steps": "array of 5 prioritized tasks for the engineering team",
+    "pages": ("array; for each page: name, purpose (1 sentence), props (schema + example), content: 5-12 blocks "
+              "(type, microcopy, purpose, developer_instructions with API method + path + sample request/response, "
+              "a11y_notes, mobile_notes, loading_state/empty_state/error_state), explanations_for_junior"),
+    "flows": "array of user flows (name, steps, pages involved, success/error outcomes)",
+    "components": ("array; for each component: name, type=\"Component\", props schema, sample props, microcopy, "
+                   "validation_rules with error messages, developer_instructions, accessibility notes, "
+                   "explanations_for_junior"),
+    "admin_components": "array of admin-only components in the same shape as components",
+    "data_models": ("object; normalized models with fields, types, required, relationships, sample record JSON, "
+                    "indexes, storage recommendation (SQL vs NoSQL)"),
+    "implementation_notes": "object; auth strategy, token lifecycle, CSRF/XSS/SQLi prevention, state management, APIs",
+    "accessibility_summary": "object; ARIA, screen reader labels, keyboard nav, focus management, contrast numbers",
+    "i18n_keys_sample": "object; sample UI string keys with English and one other translation, RTL notes if needed",
+    "performance_tips": "object; LCP/FID/CLS targets and concrete steps (caching, CDN, images, fonts, code splitting)",
+    "monitoring_and_metrics": "object; events to log with sample payloads, metrics, alert thresholds",
+    "testing_plan": "object; unit, integration and E2E (Cypress/Playwright) scenarios with sample specs",
+    "deployment_plan": "object; environments, CI/CD steps (lint, test, build, canary), infra, rollback",
+}
+
+
+def find_input_section(j: Dict, key: str) -> Any:
+    for path in (("output", "requirements", key), ("requirements", key), ("output", "architecture_spec", key),
+                 ("architecture_spec", key), ("output", key), (key,)):
+        cur: Any = j
+        for p in path:
+            if isinstance(cur, dict) and p in cur:
+                cur = cur[p]
+            else:
+                cur = None
+                break
+        if cur is not None:
+            return cur
+    return None
+
+
+def shard_context(shard: str, system_json: Dict, req_json: Dict) -> Dict[str, Any]:
+    inputs = {"system": system_json, "requirements": req_json}
+    context: Dict[str, Any] = {}
+    for source, key in SHARD_CONTEXT[shard]:
+        value = find_input_section(inputs[source], key)
+        if value is not None:
+            context.setdefault(source, {})[key] = value
+    return context
+
+
+@functools.lru_cache(maxsize=None)
+def shard_schema(shard: str) -> Dict[str, Any]:
+    """Sub-schema for one shard (cached, so its validator is compiled once)."""
+    keys = SECTION_SHARDS[shard]
+    props = UI_SPEC_JSON_SCHEMA["properties"]
+    return {"type": "object", "required": list(keys), "properties": {k: props[k] for k in keys if k in props}}
+
+
+def build_shard_prompt(shard: str, context: Dict[str, Any], feedback: Optional[str] = None) -> str:
+    keys = SECTION_SHARDS[shard]
+    sections = "\n".join(f"- {k}: {SECTION_GUIDANCE.get(k, '')}" for k in keys)
+    feedback_block = f"\nYOUR PREVIOUS ANSWER WAS REJECTED: {feedback[:1000]}\nFix it.\n" if feedback else ""
+    return textwrap.dedent("""
+    You are an AI Senior Product Designer, UX Writer, and Full-Stack Architect.
+    You are writing ONE PART of a production-ready "ui_spec"; other parts are generated separately and merged.
+
+    RULES:
+    1) Output ONLY valid JSON (no markdown/text outside JSON).
+    2) Output a single JSON object whose top-level keys are exactly: {keys}
+    3) If System and Requirements contradict, treat Requirements as source of truth.
+    4) Make reasonable assumptions where needed and keep all explanations INSIDE the JSON.
+    5) Use the page, feature and model names from the inputs verbatim so the parts line up.
+
+    SECTIONS:
+    {sections}
+    {feedback}
+    INPUTS (JSON):
+    {context}
+
+    Produce JSON now.
+    """).format(
+        keys=json.dumps(keys),
+        sections=sections,
+        feedback=feedback_block,
+        context=fit_context(context, keys, PROMPT_TOKEN_BUDGET),
+    )
+
+
+def pick_sections(parsed: Any, keys: List[str]) -> Optional[Dict[str, Any]]:
+    """Accept either the bare sections or a {"ui_spec": {...}} wrapper from the model."""
+    if not isinstance(parsed, dict):
+        return None
+    if "ui_spec" in parsed and isinstance(parsed["ui_spec"], dict) and "ui_spec" not in keys:
+        parsed = parsed["ui_spec"]
+    return {k: parsed[k] for k in keys if k in parsed}
+
+
+async def generate_shard(shard: str, system_json: Dict, req_json: Dict, model, output_dir: Path,
+                         max_attempts: int = MAX_ATTEMPTS) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """Generate one shard, retrying only this shard; returns (shard, sections, stats)."""
+    keys = SECTION_SHARDS[shard]
+    schema = shard_schema(shard)
+    context = shard_context(shard, system_json, req_json)
+    feedback = None
+    started = time.perf_counter()
+    run = metrics.current_run()
+    for attempt in range(1, max_attempts + 1):
+        prompt = build_shard_prompt(shard, context, feedback)
+        if run is not None:
+            run.count("attempts")
+            run.prompt(prompt)
+        with metrics.timer("model"):
+            raw_text = await model.ainvoke(prompt)
+        if run is not None:
+            run.response(raw_text)
+        save_raw_output(output_dir / f"generated_ui_spec_raw.{shard}.txt", raw_text)
+        with metrics.timer("parse"):
+            sections = pick_sections(extract_json_from_text(raw_text), keys)
+        if sections is None:
+            feedback = "the output was not a parseable JSON object"
+            metrics.count("parse_failures")
+        else:
+            with metrics.timer("validate"):
+                feedback = validate_ui_spec(sections, schema)
+            if feedback is None:
+                stats = {"attempts": attempt, "latency_s": round(time.perf_counter() - started, 3),
+                         "prompt_chars": len(prompt)}
+                logger.info("Shard %s done in %.2fs (attempt %d)", shard, stats["latency_s"], attempt)
+                metrics.observe("shard_latency_s", stats["latency_s"])
+                return shard, sections, stats
+            metrics.count("validation_failures")
+        model.invalidate(prompt)
+        logger.warning("Shard %s attempt %d/%d rejected: %s", shard, attempt, max_attempts, feedback)
+    raise UISpecGenerationError(f"Shard {shard} failed after {max_attempts} attempts",
+                                output_dir / f"generated_ui_spec_raw.{shard}.txt")
+
+
+async def generate_ui_spec_sharded(
+    system_file: Optional[str] = None,
+    require_file: Optional[str] = None,
+    output_dir: Optional[Path] = None,
+    model=None,
+    on_section: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+) -> Path:
+    """
+    Sharded counterpart of content_writer01.generate_ui_spec (same arguments and result).
+    on_section(shard, sections) is called (and awaited if it returns an awaitable) as each
+    shard validates, so downstream stages can start before the whole spec is ready.
+    """
+    system_file = system_file or INPUT_SYSTEM_FILE
+    require_file = require_file or INPUT_REQUIRE_FILE
+    output_dir = Path(output_dir) if output_dir is not None else OUTPUT_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    _, generated_json_path, failed_json_path = output_paths(output_dir)
+
+    system_json = read_input_json(system_file)
+    req_json = read_input_json(require_file)
+    if model is None:
+        model = create_model()
+    logger.info("Sharded generation: %d shards, model %s (temperature=%s)", len(SECTION_SHARDS), GEMINI_MODEL, TEMPERATURE)
+
+    # Opened before the shard tasks start, so their metrics and raw outputs land in these runs.
+    run = metrics.RunMetrics("generate_ui_spec_sharded", model=GEMINI_MODEL, shards=len(SECTION_SHARDS),
+                             output_dir=str(output_dir))
+    artifacts = None
+    try:
+        artifacts = open_run("generate_ui_spec_sharded", run_id=run.run_id, base_dir=output_dir, model=GEMINI_MODEL)
+        started = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(generate_shard(shard, system_json, req_json, model, output_dir))
+            for shard in SECTION_SHARDS
+        ]
+        merged: Dict[str, Any] = {}
+        shard_stats: Dict[str, Dict[str, Any]] = {}
+        try:
+            for fut in asyncio.as_completed(tasks):
+                shard, sections, stats = await fut
+                merged.update(sections)
+                shard_stats[shard] = stats
+                if on_section is not None:
+                    result = on_section(shard, sections)
+                    if inspect.isawaitable(result):
+                        await result
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if merged:
+                atomic_write_json(failed_json_path, {"ui_spec": merged})
+            status = "failed" if isinstance(e, UISpecGenerationError) else "error"
+            run.finish(status, shards_done=len(shard_stats), shard_stats=shard_stats)
+            if artifacts is not None:
+                artifacts.close(status)
+            raise
+
+        ui_spec = {k: merged[k] for k in UI_SPEC_JSON_SCHEMA["required"] if k in merged}
+        ui_spec.update((k, v) for k, v in merged.items() if k not in ui_spec)
+        errors = validate_ui_spec(ui_spec)
+        if errors:
+            atomic_write_json(failed_json_path, {"ui_spec": ui_spec})
+            run.finish("failed", shards_done=len(shard_stats), shard_stats=shard_stats)
+            if artifacts is not None:
+                artifacts.close("failed")
+            raise UISpecGenerationError(f"Merged ui_spec failed validation: {errors}", failed_json_path)
+
+        wall = time.perf_counter() - started
+        slowest = max(shard_stats.items(), key=lambda kv: kv[1]["latency_s"])
+        logger.info("Sharded generation done in %.2fs (sum of shards %.2fs, slowest %s %.2fs)",
+                    wall, sum(s["latency_s"] for s in shard_stats.values()), slowest[0], slowest[1]["latency_s"])
+        atomic_write_json(generated_json_path, {"ui_spec": ui_spec})
+        run.finish("ok", shards_done=len(shard_stats), shard_stats=shard_stats)
+        if artifacts is not None:
+            artifacts.close("ok")
+        record_example(system_json, req_json, ui_spec, {"system": str(system_file), "requirements": str(require_file)})
+        return generated_json_path
+    except BaseException as e:
+        # Finishes runs that failed outside the shard loop (writing outputs, record_example, ...).
+        run.finish("error", error=str(e) or type(e).__name__)
+        if artifacts is not None:
+            artifacts.close("error")
+        raise